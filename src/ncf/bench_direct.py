@@ -0,0 +1,95 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .simulate import generate_synthetic_network_data
+from .features import add_saturation_label
+from .config import ForecastConfig
+from .cellstore import CellStore
+from .direct import forecast_xgb_direct, train_xgb_direct
+from .forecast import forecast_xgb_batch
+from .model_xgb import train_xgb_forecast
+
+OUTDIR = "reports/benchmarks"
+STRATEGY_FUNCS = {
+    "autoregressive": (train_xgb_forecast, forecast_xgb_batch),
+    "direct": (train_xgb_direct, forecast_xgb_direct),
+}
+
+def bench_strategy(name: str, store: CellStore, history: list[pd.DataFrame], truth: np.ndarray, train_end: str, backend: str, H7: int) -> dict:
+    """
+    Entraînement des cellules, puis forecast J+30 de toutes les cellules en un appel depuis
+    train_end, comparé aux valeurs réelles (MAE du chemin complet, pas seulement du pas suivant).
+    """
+    train, forecast = STRATEGY_FUNCS[name]
+    horizon = truth.shape[1]
+    kwargs = {"horizon_hours": horizon} if name == "direct" else {}
+
+    t0 = time.perf_counter()
+    fitted = [train(store, cell_id=c, train_end=train_end, **kwargs) for c in store.cell_ids]
+    train_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _, preds = forecast([f[0] for f in fitted], history, fitted[0][1], horizon, backend=backend)
+    forecast_s = time.perf_counter() - t0
+
+    err = np.abs(preds - truth)
+    return {
+        "strategy": name,
+        "train_s": train_s,
+        "forecast_s": forecast_s,
+        "mae_valid_mbps": float(np.mean([f[2] for f in fitted])),
+        "mae_j1_mbps": float(err[:, :24].mean()),
+        "mae_j7_mbps": float(err[:, :H7].mean()),
+        "mae_j30_mbps": float(err.mean()),
+        # erreur sur le pic, celle qui compte pour le risque de saturation
+        "peak_err_j30_mbps": float(np.abs(preds.max(axis=1) - truth.max(axis=1)).mean()),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast auto-régressif vs direct: latence et précision J+1/J+7/J+30.")
+    parser.add_argument("--cells", type=int, default=20)
+    parser.add_argument("--start", default="2025-01-01")
+    parser.add_argument("--train-end", default="2025-07-01")
+    parser.add_argument("--backend", default="compiled", choices=["xgboost", "compiled"])
+    args = parser.parse_args()
+
+    cfg = ForecastConfig()
+    H7, H30 = cfg.horizon_days_short * 24, cfg.horizon_days_long * 24
+    end = pd.to_datetime(args.train_end) + pd.Timedelta(hours=H30)
+    df = add_saturation_label(
+        generate_synthetic_network_data(start=args.start, end=end, n_cells=args.cells),
+        cfg.saturation_threshold_by_zone,
+    )
+    store = CellStore(df)
+
+    # forecast depuis train_end: historique avant, valeurs réelles des H30 heures suivantes après
+    cut = pd.to_datetime(args.train_end)
+    history, truth = [], []
+    for c in store.cell_ids:
+        f = store.frame(c)
+        before = (f["timestamp"] < cut).to_numpy()
+        history.append(f[before])
+        truth.append(f.loc[~before, "traffic_mbps"].to_numpy(dtype=float)[:H30])
+    truth = np.array(truth)
+
+    rows = []
+    for name in STRATEGY_FUNCS:
+        res = bench_strategy(name, store, history, truth, args.train_end, args.backend, H7)
+        rows.append(res)
+        print(
+            f"  {name:>14}  train={res['train_s']:7.2f}s  forecast={res['forecast_s'] * 1000:8.1f}ms"
+            f"  MAE J+1={res['mae_j1_mbps']:6.2f}  J+7={res['mae_j7_mbps']:6.2f}  J+30={res['mae_j30_mbps']:6.2f}"
+        )
+
+    os.makedirs(OUTDIR, exist_ok=True)
+    out = pd.DataFrame(rows)
+    out.to_csv(os.path.join(OUTDIR, "direct.csv"), index=False)
+    print(f"OK ✅ {OUTDIR}/direct.csv")
+    print(out.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
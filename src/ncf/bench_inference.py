@@ -0,0 +1,83 @@
+import argparse
+import copy
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .simulate import generate_synthetic_network_data
+from .features import add_saturation_label
+from .config import ForecastConfig
+from .cellstore import CellStore
+from .model_xgb import split_supervised, train_xgb_forecast
+from .forecast import _model_groups, forecast_xgb_batch
+
+OUTDIR = "reports/benchmarks"
+
+def _step_latency(groups, X: np.ndarray, repeats: int) -> float:
+    """Durée moyenne d'un pas de rollout (tous les predict du pas, toutes cellules)."""
+    out = np.empty(len(X))
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        for predict, idx in groups:
+            if idx is None:
+                out[:] = predict(X)
+            else:
+                out[idx] = predict(X[idx])
+    return (time.perf_counter() - t0) / repeats
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence par pas du rollout: model.predict vs arbres compilés.")
+    parser.add_argument("--cells", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--trained", type=int, default=4, help="modèles réellement entraînés (copiés ensuite)")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--horizon", type=int, default=168, help="pas du rollout complet comparé")
+    args = parser.parse_args()
+
+    cfg = ForecastConfig()
+    df = add_saturation_label(
+        generate_synthetic_network_data(start="2025-03-01", end="2025-08-01", n_cells=args.trained),
+        cfg.saturation_threshold_by_zone,
+    )
+    store = CellStore(df)
+    fitted = [train_xgb_forecast(store, cell_id=c, train_end="2025-07-01") for c in store.cell_ids]
+    feats = fitted[0][1]
+    rows_X = np.array([split_supervised(store, c, "2025-07-01")[1][feats].to_numpy(float)[0] for c in store.cell_ids])
+
+    os.makedirs(OUTDIR, exist_ok=True)
+    rows = []
+    for n in args.cells:
+        # un modèle distinct par cellule (copies des modèles entraînés)
+        models = [copy.deepcopy(fitted[i % len(fitted)][0]) for i in range(n)]
+        frames = [store.frame(store.cell_ids[i % len(fitted)]) for i in range(n)]
+        X = rows_X[np.arange(n) % len(fitted)]  # une vraie ligne de features par cellule
+
+        res = {"n_cells": n}
+        for backend in ("xgboost", "compiled"):
+            t0 = time.perf_counter()
+            groups = _model_groups(models, n, backend=backend)
+            res[f"{backend}_setup_s"] = time.perf_counter() - t0
+            reps = max(1, args.repeats // max(1, n // 100)) if backend == "xgboost" else args.repeats
+            res[f"{backend}_step_ms"] = _step_latency(groups, X, reps) * 1000
+
+            t0 = time.perf_counter()
+            _, preds = forecast_xgb_batch(models, frames, feats, args.horizon, backend=backend)
+            res[f"{backend}_rollout_s"] = time.perf_counter() - t0
+            res[f"_{backend}_preds"] = preds
+
+        res["max_abs_diff"] = float(np.abs(res.pop("_xgboost_preds") - res.pop("_compiled_preds")).max())
+        res["speedup_step"] = res["xgboost_step_ms"] / res["compiled_step_ms"]
+        rows.append(res)
+        print(
+            f"  {n:>5} cellules  step: xgboost={res['xgboost_step_ms']:9.2f}ms  compiled={res['compiled_step_ms']:8.2f}ms"
+            f"  (x{res['speedup_step']:.1f})  max|diff|={res['max_abs_diff']:.2e}"
+        )
+
+    out = pd.DataFrame(rows)
+    out.to_csv(os.path.join(OUTDIR, "inference.csv"), index=False)
+    print(f"OK ✅ {OUTDIR}/inference.csv")
+    print(out.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
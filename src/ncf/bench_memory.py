@@ -0,0 +1,111 @@
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .simulate import write_synthetic_dataset
+from .ingest import read_cells
+from .config import ForecastConfig
+from .features import add_saturation_label
+from .cellstore import CellStore
+from .model_xgb import make_supervised
+from .fleet import TRAIN_END, forecast_trained, train_cell
+from .scenarios import Scenario, evaluate_scenarios
+from .trace import rss_mb
+
+OUTDIR = "reports/benchmarks"
+VARIANTS = ("wide_numeric", "compact")
+# ablation: colonnes numériques en int64 / float64, catégories et chemin de features actuels.
+# Ce n'est pas l'état d'avant le schéma compact (chaînes object, features par copies): pour
+# ce "avant", lancer ce bench sur l'arbre précédent.
+WIDE_NUMERIC_DTYPES = {"event_flag": np.int64, "users": np.int64, "traffic_mbps": np.float64}
+
+def _frame_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1024**2
+
+def _in_fresh_process(fn, *args):
+    # ru_maxrss est hérité au fork / exec: le processus parent doit rester petit
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+def run_variant(variant: str, root: str, train_cells: int) -> dict:
+    """
+    Pipeline complet sur le dataset Parquet root (lecture -> labels -> CellStore -> make_supervised
+    de toutes les cellules -> entraînement de train_cells cellules -> forecast J+30 -> risque),
+    colonnes numériques "wide_numeric" (int64 / float64) ou "compact". Pic de RSS relevé après chaque étape;
+    à lancer dans un processus neuf (ru_maxrss ne redescend jamais).
+    """
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown variant={variant!r} (expected one of {VARIANTS}).")
+    cfg = ForecastConfig()
+    res = {"variant": variant, "rss_start_mb": rss_mb()}
+    t0 = time.perf_counter()
+
+    df = read_cells(root)
+    if variant == "wide_numeric":
+        df = df.astype(WIDE_NUMERIC_DTYPES)
+    res["rss_ingest_mb"] = rss_mb()
+
+    df = add_saturation_label(df, cfg.saturation_threshold_by_zone)
+    store = CellStore(df)
+    del df
+    res["cells"] = len(store)
+    res["rows"] = len(store.df)
+    res["frame_mb"] = _frame_mb(store.df)
+    sup_mb = 0.0
+    for _, frame in store:
+        sup_mb = max(sup_mb, _frame_mb(make_supervised(frame)))
+    res["supervised_cell_mb"] = sup_mb
+    res["rss_features_mb"] = rss_mb()
+
+    cell_ids = store.cell_ids[:train_cells]
+    trained = [train_cell(store.frame(c), cfg, TRAIN_END) for c in cell_ids]
+    res["rss_training_mb"] = rss_mb()
+
+    records = forecast_trained(trained, store.frames(cell_ids), cfg)
+    evaluate_scenarios(records, cfg, [Scenario("baseline", users_multiplier=1.0), Scenario("users_x1.2", users_multiplier=1.2)])
+    res["rss_peak_mb"] = rss_mb()
+    res["seconds"] = time.perf_counter() - t0
+    return res
+
+def main():
+    parser = argparse.ArgumentParser(description="Pic de RSS du pipeline: part des dtypes numériques compacts (int64 / float64 vs schéma compact).")
+    parser.add_argument("--cells", type=int, default=200)
+    parser.add_argument("--start", default="2023-01-01")
+    parser.add_argument("--end", default="2025-12-31")
+    parser.add_argument("--train-cells", type=int, default=4)
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=VARIANTS)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as root:
+        _in_fresh_process(write_synthetic_dataset, root, args.start, args.end, args.cells)
+        for variant in args.variants:
+            # un processus neuf par variante: pics de RSS indépendants
+            res = _in_fresh_process(run_variant, variant, root, args.train_cells)
+            rows.append(res)
+            print(
+                f"  {variant:>12}  rows={res['rows']:,}  frame={res['frame_mb']:8.1f}MB"
+                f"  rss: ingest={res['rss_ingest_mb']:7.1f}MB  features={res['rss_features_mb']:7.1f}MB"
+                f"  peak={res['rss_peak_mb']:7.1f}MB  ({res['seconds']:.1f}s)"
+            )
+
+    os.makedirs(OUTDIR, exist_ok=True)
+    out = pd.DataFrame(rows)
+    out.to_csv(os.path.join(OUTDIR, "memory.csv"), index=False)
+    if {"wide_numeric", "compact"} <= set(out["variant"]):
+        w, c = out.set_index("variant").loc["wide_numeric"], out.set_index("variant").loc["compact"]
+        print(
+            "dtypes numériques compacts seuls: "
+            f"frame {w['frame_mb']:.0f}MB -> {c['frame_mb']:.0f}MB ({1 - c['frame_mb'] / w['frame_mb']:.0%} de moins), "
+            f"pic de RSS {w['rss_peak_mb']:.0f}MB -> {c['rss_peak_mb']:.0f}MB ({1 - c['rss_peak_mb'] / w['rss_peak_mb']:.0%} de moins)"
+        )
+    print(f"OK ✅ {OUTDIR}/memory.csv")
+
+if __name__ == "__main__":
+    main()
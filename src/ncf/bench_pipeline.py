@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import xgboost
+
+from .simulate import generate_synthetic_network_data
+from .config import ForecastConfig
+from .features import add_saturation_label
+from .cellstore import CellStore
+from .model_xgb import make_supervised, train_xgb_forecast, train_xgb_global
+from .forecast import forecast_xgb_batch
+from .risk import estimate_residuals
+from .scenarios import Scenario, evaluate_scenarios
+from .rollups import compute_rollups
+from .trace import rss_mb
+
+OUTDIR = "reports/benchmarks"
+STAGES = ("generation", "features", "training", "rollout", "risk", "report")
+
+def measure(fn, track_memory: bool = True):
+    """
+    Exécute fn() et renvoie (résultat, mesures): durée, pic d'allocations Python/numpy
+    pendant l'étape (tracemalloc) et pic de RSS du processus après l'étape (cumulatif: pic
+    de toutes les étapes jusqu'ici, pas celui de l'étape seule).
+    La mémoire native de XGBoost n'est visible que dans le RSS.
+    """
+    if track_memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        out = fn()
+    finally:
+        seconds = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1] if track_memory else 0
+        if track_memory:
+            tracemalloc.stop()
+    return out, {
+        "seconds": seconds,
+        "peak_alloc_mb": peak / 1e6 if track_memory else None,
+        "cum_peak_rss_mb": rss_mb(),
+    }
+
+def bench_fleet(n_cells: int, args, cfg: ForecastConfig) -> list[dict]:
+    """Une ligne par étape du pipeline pour un parc de n_cells cellules."""
+    H30 = cfg.horizon_days_long * 24
+    rows = []
+
+    def record(stage, fn, measured_cells=n_cells):
+        out, m = measure(fn, track_memory=not args.no_memory)
+        # mode par cellule: coût mesuré sur un échantillon puis extrapolé (linéaire en nb de cellules)
+        m["seconds"] *= n_cells / measured_cells
+        rows.append({"n_cells": n_cells, "stage": stage, "measured_cells": measured_cells, **m})
+        print(f"  {stage:<11} {m['seconds']:8.2f}s  alloc={m['peak_alloc_mb'] or 0:8.1f}MB  rss cumulé={m['cum_peak_rss_mb']:8.1f}MB")
+        return out
+
+    df = record("generation", lambda: add_saturation_label(
+        generate_synthetic_network_data(start=args.start, end=args.end, n_cells=n_cells, seed=args.seed),
+        cfg.saturation_threshold_by_zone,
+    ))
+    store = CellStore(df)
+
+    cells = store.cell_ids if args.mode == "global" else store.cell_ids[:args.per_cell_sample]
+    record("features", lambda: [make_supervised(f) for f in store.frames(store.cell_ids)])
+
+    if args.mode == "global":
+        models, feats, maes, valid_outs = record(
+            "training", lambda: train_xgb_global(store, args.train_end, group_by=args.group_by),
+        )
+    else:
+        def train_sample():
+            out = {}
+            for c in cells:
+                out[c] = train_xgb_forecast(store, cell_id=c, train_end=args.train_end)
+            return out
+        fitted = record("training", train_sample, measured_cells=len(cells))
+        models = {c: fitted[c][0] for c in cells}
+        feats = fitted[cells[0]][1]
+        maes = {c: fitted[c][2] for c in cells}
+        valid_outs = {c: fitted[c][3] for c in cells}
+
+    cells = [c for c in cells if c in models]
+    _, preds = record(
+        "rollout",
+        lambda: forecast_xgb_batch([models[c] for c in cells], store.frames(cells), feats, H30, backend=args.backend),
+        measured_cells=len(cells) if args.mode == "per_cell" else n_cells,
+    )
+
+    meta = store.meta().set_index("cell_id")
+    records = [{
+        "cell_id": c,
+        "region": meta.loc[c, "region"],
+        "zone_type": meta.loc[c, "zone_type"],
+        "mae": maes[c],
+        "residuals": estimate_residuals(valid_outs[c]["y_true"].values, valid_outs[c]["y_pred"].values),
+        "y_pred": preds[i],
+    } for i, c in enumerate(cells)]
+    scenarios = [Scenario("baseline", 1.0), Scenario("users_x1.2", 1.2)]
+    long = record("risk", lambda: evaluate_scenarios(records, cfg, scenarios), measured_cells=len(cells))
+
+    record("report", lambda: compute_rollups(long), measured_cells=len(cells))
+    return rows
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float, min_seconds: float = 0.05) -> pd.DataFrame:
+    """
+    Compare deux runs étape par étape (même n_cells, même stage).
+    Régression: durée (ou pic d'allocations) > baseline × (1 + tolerance).
+    Les étapes de moins de min_seconds dans la baseline sont ignorées pour le temps (bruit).
+    """
+    cur = pd.DataFrame(results).set_index(["n_cells", "stage"])
+    ref = pd.DataFrame(baseline).set_index(["n_cells", "stage"])
+    m = cur.join(ref, how="inner", lsuffix="", rsuffix="_baseline")
+
+    m["time_ratio"] = m["seconds"] / m["seconds_baseline"]
+    m["mem_ratio"] = m["peak_alloc_mb"].astype(float) / m["peak_alloc_mb_baseline"].astype(float)
+    slow = (m["time_ratio"] > 1 + tolerance) & (m["seconds_baseline"] >= min_seconds)
+    fat = m["mem_ratio"] > 1 + tolerance
+    m["regression"] = np.where(slow & fat, "time+memory", np.where(slow, "time", np.where(fat, "memory", "")))
+    cols = ["seconds_baseline", "seconds", "time_ratio", "peak_alloc_mb_baseline", "peak_alloc_mb", "mem_ratio", "regression"]
+    return m[cols].reset_index()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline complet (temps + mémoire par étape) à l'échelle du parc.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--start", default="2025-03-01")
+    parser.add_argument("--end", default="2025-08-01")
+    parser.add_argument("--train-end", default="2025-07-01")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mode", choices=["global", "per_cell"], default="global")
+    parser.add_argument("--group-by", default="zone_type")
+    parser.add_argument("--per-cell-sample", type=int, default=20)
+    parser.add_argument("--backend", choices=["compiled", "xgboost"], default="compiled")
+    parser.add_argument("--no-memory", action="store_true", help="sans tracemalloc (temps plus fidèles)")
+    parser.add_argument("--out", default=os.path.join(OUTDIR, "pipeline.json"))
+    parser.add_argument("--compare", default=None, help="JSON de référence: signale les régressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    cfg = ForecastConfig()
+    results = []
+    for n_cells in args.sizes:
+        print(f"== {n_cells} cellules ({args.mode})")
+        results.extend(bench_fleet(n_cells, args, cfg))
+
+    report = {
+        "meta": {
+            "created": pd.Timestamp.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "xgboost": xgboost.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"OK ✅ {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        cmp = compare(results, baseline, args.tolerance)
+        print(cmp.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+        n_reg = int((cmp["regression"] != "").sum())
+        if n_reg:
+            print(f"⚠️  {n_reg} régression(s) au-delà de +{args.tolerance:.0%}")
+            sys.exit(1)
+        print("OK ✅ aucune régression")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .simulate import generate_synthetic_network_data
+from .cellstore import CellStore
+from .model_xgb import train_xgb_forecast, train_xgb_global
+
+OUTDIR = "reports/benchmarks"
+
+def bench_per_cell(store: CellStore, train_end: str, sample: int) -> dict:
+    """
+    Temps et MAE du mode par cellule, mesurés sur un échantillon de cellules puis
+    extrapolés linéairement au parc (le coût est strictement proportionnel au nb de cellules).
+    """
+    cells = store.cell_ids[:sample]
+    maes = []
+    t0 = time.perf_counter()
+    for cell_id in cells:
+        _, _, mae, _ = train_xgb_forecast(store, cell_id=cell_id, train_end=train_end)
+        maes.append(mae)
+    elapsed = time.perf_counter() - t0
+    return {
+        "mode": "per_cell",
+        "train_s": elapsed * len(store) / len(cells),
+        "measured_cells": len(cells),
+        "mae_valid_mbps": float(np.mean(maes)),
+    }
+
+def bench_global(store: CellStore, train_end: str, group_by: str | None) -> dict:
+    t0 = time.perf_counter()
+    _, _, maes, _ = train_xgb_global(store, train_end=train_end, group_by=group_by)
+    elapsed = time.perf_counter() - t0
+    return {
+        "mode": "global" if group_by is None else f"global_by_{group_by}",
+        "train_s": elapsed,
+        "measured_cells": len(store),
+        "mae_valid_mbps": float(np.mean(list(maes.values()))),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-cell vs global training (wall-clock + validation MAE).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--start", default="2025-03-01")
+    parser.add_argument("--end", default="2025-08-01")
+    parser.add_argument("--train-end", default="2025-07-01")
+    parser.add_argument("--per-cell-sample", type=int, default=20)
+    parser.add_argument("--group-by", default="zone_type")
+    args = parser.parse_args()
+
+    os.makedirs(OUTDIR, exist_ok=True)
+    rows = []
+    for n_cells in args.sizes:
+        print(f"== {n_cells} cellules")
+        df = generate_synthetic_network_data(start=args.start, end=args.end, n_cells=n_cells)
+        store = CellStore(df)
+        for res in (
+            bench_per_cell(store, args.train_end, args.per_cell_sample),
+            bench_global(store, args.train_end, None),
+            bench_global(store, args.train_end, args.group_by),
+        ):
+            res["n_cells"] = n_cells
+            rows.append(res)
+            print(f"  {res['mode']:<22} train={res['train_s']:.1f}s  mae={res['mae_valid_mbps']:.2f}")
+
+    out = pd.DataFrame(rows)[["n_cells", "mode", "train_s", "measured_cells", "mae_valid_mbps"]]
+    out.to_csv(os.path.join(OUTDIR, "training_modes.csv"), index=False)
+    print(f"OK ✅ {OUTDIR}/training_modes.csv")
+    print(out.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+def _cell_codes(cell: pd.Series) -> tuple[np.ndarray, pd.Index]:
+    """
+    Codes des cellules dans l'ordre trié des cell_id. Sur une colonne category, les codes
+    existants sont renumérotés: pas de chaîne matérialisée par ligne.
+    """
+    if not isinstance(cell.dtype, pd.CategoricalDtype):
+        return pd.factorize(cell.to_numpy(), sort=True)
+    cell = cell.cat.remove_unused_categories()
+    uniques = cell.cat.categories.sort_values()
+    return uniques.get_indexer(cell.cat.categories)[cell.cat.codes.to_numpy()], uniques
+
+class CellStore:
+    """
+    Données horaires partitionnées par cellule, construites une seule fois.
+    Le frame est trié (cell_id, timestamp) et chaque cellule occupe une plage
+    contiguë [start, stop) : l'accès à l'historique d'une cellule est un lookup
+    dans un dict + un slice (vue, sans copie ni scan du frame complet).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        ts = pd.to_datetime(df["timestamp"]).to_numpy()
+        codes, uniques = _cell_codes(df["cell_id"])
+
+        # tri seulement si nécessaire (les sorties du simulateur sont déjà cell-major)
+        same = codes[1:] == codes[:-1]
+        is_sorted = bool(np.all(codes[1:] >= codes[:-1]) and np.all(ts[1:][same] >= ts[:-1][same]))
+        if not is_sorted:
+            order = np.lexsort((ts, codes))
+            df = df.iloc[order]
+            codes = codes[order]
+        self._df = df.reset_index(drop=True)
+        self._columns = {}
+
+        counts = np.bincount(codes, minlength=len(uniques))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.cell_ids = [str(c) for c in uniques]
+        self._index = {c: i for i, c in enumerate(self.cell_ids)}
+
+    def __len__(self) -> int:
+        return len(self.cell_ids)
+
+    def __contains__(self, cell_id) -> bool:
+        return cell_id in self._index
+
+    def __iter__(self):
+        for cell_id in self.cell_ids:
+            yield cell_id, self.frame(cell_id)
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self._df
+
+    def bounds(self, cell_id) -> tuple[int, int]:
+        i = self._index[cell_id]
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def frame(self, cell_id) -> pd.DataFrame:
+        """Historique trié d'une cellule (slice positionnel du frame partitionné)."""
+        start, stop = self.bounds(cell_id)
+        return self._df.iloc[start:stop]
+
+    def arrays(self, cell_id, columns=("timestamp", "traffic_mbps", "users")) -> dict:
+        """Colonnes d'une cellule en tableaux numpy (vues quand la colonne est homogène)."""
+        start, stop = self.bounds(cell_id)
+        return {c: self.column(c)[start:stop] for c in columns}
+
+    def column(self, name) -> np.ndarray:
+        """Colonne complète en numpy, convertie une seule fois puis mise en cache."""
+        if name not in self._columns:
+            self._columns[name] = self._df[name].to_numpy()
+        return self._columns[name]
+
+    def frames(self, cell_ids) -> list[pd.DataFrame]:
+        return [self.frame(c) for c in cell_ids]
+
+    def meta(self) -> pd.DataFrame:
+        """Une ligne par cellule: cell_id, region, zone_type (première ligne de chaque plage)."""
+        cols = [c for c in ("cell_id", "region", "zone_type") if c in self._df.columns]
+        return self._df.iloc[self.offsets[:-1]][cols].reset_index(drop=True)
+
+def as_cell_store(source) -> CellStore:
+    return source if isinstance(source, CellStore) else CellStore(source)
+
+def cell_frame(source, cell_id) -> pd.DataFrame:
+    """Historique d'une cellule depuis un CellStore (O(1)) ou un DataFrame brut (filtre)."""
+    if isinstance(source, CellStore):
+        return source.frame(cell_id)
+    return source[source["cell_id"] == cell_id]
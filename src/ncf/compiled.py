@@ -0,0 +1,188 @@
+import json
+
+import numpy as np
+
+_CACHE_ATTR = "_ncf_compiled"
+
+def _iteration_limit(model) -> int | None:
+    """Nb d'arbres utilisés par model.predict (best_iteration + 1 après early stopping)."""
+    try:
+        best = model.best_iteration
+    except AttributeError:
+        return None
+    return None if best is None else int(best) + 1
+
+def compile_booster(model) -> dict:
+    """
+    Exporte un booster XGBoost (régression, splits numériques) en tableaux plats:
+    feature, threshold, left, right, default_left, value par nœud (indices locaux),
+    roots (un nœud racine par arbre), base (base_score) et depth (profondeur max).
+    Les feuilles pointent sur elles-mêmes: le parcours fait toujours `depth` pas.
+    Le résultat est mis en cache sur le modèle.
+    """
+    cached = getattr(model, _CACHE_ATTR, None)
+    if cached is not None:
+        return cached
+
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    raw = json.loads(booster.save_raw("json"))
+    learner = raw["learner"]
+    if learner["gradient_booster"]["name"] != "gbtree":
+        raise ValueError(f"Unsupported booster {learner['gradient_booster']['name']!r} (expected gbtree).")
+    if not learner["objective"]["name"].startswith("reg:squarederror"):
+        raise ValueError(f"Unsupported objective {learner['objective']['name']!r}.")
+
+    trees = learner["gradient_booster"]["model"]["trees"]
+    limit = _iteration_limit(model)
+    if limit is not None:
+        trees = trees[:limit]
+
+    feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+    depth = 0
+    offset = 0
+    for t in trees:
+        if any(t["split_type"]):
+            raise ValueError("Categorical splits are not supported by the compiled backend.")
+        lc = np.asarray(t["left_children"], dtype=np.int64)
+        rc = np.asarray(t["right_children"], dtype=np.int64)
+        leaf = lc < 0
+        idx = np.arange(len(lc))
+        feature.append(np.where(leaf, 0, t["split_indices"]))
+        threshold.append(np.asarray(t["split_conditions"], dtype=np.float32))
+        left.append(np.where(leaf, idx, lc) + offset)
+        right.append(np.where(leaf, idx, rc) + offset)
+        default_left.append(np.asarray(t["default_left"], dtype=bool))
+        value.append(np.where(leaf, np.asarray(t["split_conditions"], dtype=np.float32), 0).astype(np.float32))
+        roots.append(offset)
+
+        # profondeur: descente depuis la racine
+        d = np.zeros(len(lc), dtype=np.int64)
+        for i in range(len(lc)):
+            if not leaf[i]:
+                d[lc[i]] = d[rc[i]] = d[i] + 1
+        depth = max(depth, int(d.max(initial=0)))
+        offset += len(lc)
+
+    base = float(learner["learner_model_param"]["base_score"].strip("[]"))
+    out = {
+        "feature": np.concatenate(feature).astype(np.int64) if trees else np.zeros(0, np.int64),
+        "threshold": np.concatenate(threshold) if trees else np.zeros(0, np.float32),
+        "left": np.concatenate(left).astype(np.int64) if trees else np.zeros(0, np.int64),
+        "right": np.concatenate(right).astype(np.int64) if trees else np.zeros(0, np.int64),
+        "default_left": np.concatenate(default_left) if trees else np.zeros(0, bool),
+        "value": np.concatenate(value) if trees else np.zeros(0, np.float32),
+        "roots": np.asarray(roots, dtype=np.int64),
+        "base": base,
+        "depth": depth,
+        "n_features": int(learner["learner_model_param"]["num_feature"]),
+    }
+    try:
+        setattr(model, _CACHE_ATTR, out)
+    except AttributeError:
+        pass
+    return out
+
+def supports_compiled(model) -> bool:
+    try:
+        compile_booster(model)
+    except (ValueError, AttributeError, KeyError):
+        return False
+    return True
+
+class CompiledForest:
+    """
+    Plusieurs boosters (un par cellule) aplatis dans les mêmes tableaux de nœuds.
+    predict(X) évalue la ligne i avec le modèle i (ou un modèle unique pour toutes les
+    lignes): les arbres de toutes les lignes descendent ensemble, un niveau par passe
+    numpy (gathers sur une matrice n_lignes × n_arbres). Les tampons de travail sont
+    alloués au premier appel pour un nombre de lignes donné, puis réutilisés.
+    """
+
+    def __init__(self, models):
+        parts = [compile_booster(m) for m in models]
+        n_trees = max((len(p["roots"]) for p in parts), default=0)
+
+        # nœud 0: feuille neutre (valeur 0) pour compléter les modèles ayant moins d'arbres
+        offsets = np.cumsum([1] + [len(p["feature"]) for p in parts])
+        cat = lambda k, first: np.concatenate([first] + [p[k] for p in parts])
+        self.feature = cat("feature", np.zeros(1, np.int64))
+        self.threshold = cat("threshold", np.zeros(1, np.float32))
+        self.left = np.concatenate([np.zeros(1, np.int64)] + [p["left"] + o for p, o in zip(parts, offsets)])
+        self.right = np.concatenate([np.zeros(1, np.int64)] + [p["right"] + o for p, o in zip(parts, offsets)])
+        self.default_left = cat("default_left", np.zeros(1, bool))
+        self.value = cat("value", np.zeros(1, np.float32))
+
+        self.roots = np.zeros((len(parts), n_trees), dtype=np.int64)
+        for m, (p, o) in enumerate(zip(parts, offsets)):
+            self.roots[m, :len(p["roots"])] = p["roots"] + o
+        self.base = np.array([p["base"] for p in parts], dtype=np.float64)
+        self.depth = max((p["depth"] for p in parts), default=0)
+        self.n_features = max((p["n_features"] for p in parts), default=0)
+        self._buffers = {}
+
+    @property
+    def n_models(self) -> int:
+        return len(self.roots)
+
+    def _buffers_for(self, n: int, shared: bool) -> dict:
+        key = (n, shared)
+        if key not in self._buffers:
+            T = self.roots.shape[1]
+            self._buffers[key] = {
+                "X": np.empty((n, self.n_features), dtype=np.float32),
+                "node": np.empty((n, T), dtype=np.int64),
+                "next": np.empty((n, T), dtype=np.int64),
+                "alt": np.empty((n, T), dtype=np.int64),
+                "idx": np.empty((n, T), dtype=np.int64),
+                "x": np.empty((n, T), dtype=np.float32),
+                "thr": np.empty((n, T), dtype=np.float32),
+                "go_left": np.empty((n, T), dtype=bool),
+                "nan": np.empty((n, T), dtype=bool),
+                "vals": np.empty((n, T), dtype=np.float32),
+                "leaf": np.empty((n, T + 1), dtype=np.float32),
+                "csum": np.empty((n, T + 1), dtype=np.float32),
+                "row_offset": (np.arange(n, dtype=np.int64) * self.n_features)[:, None],
+            }
+        return self._buffers[key]
+
+    def predict(self, X) -> np.ndarray:
+        """
+        X: (n, n_features). Avec un seul modèle, toutes les lignes l'utilisent;
+        sinon n doit être égal au nombre de modèles (ligne i -> modèle i).
+        Renvoie un tableau float32 (n,), comme XGBRegressor.predict.
+        """
+        X = np.asarray(X)
+        n = len(X)
+        shared = self.n_models == 1
+        if not shared and n != self.n_models:
+            raise ValueError(f"Expected {self.n_models} rows (one per model), got {n}.")
+        b = self._buffers_for(n, shared)
+
+        np.copyto(b["X"], X, casting="unsafe")
+        Xf = b["X"].reshape(-1)
+        node, nxt = b["node"], b["next"]
+        node[:] = self.roots[0] if shared else self.roots
+
+        for _ in range(self.depth):
+            np.take(self.feature, node, out=b["idx"])
+            b["idx"] += b["row_offset"]
+            np.take(Xf, b["idx"], out=b["x"])
+            np.take(self.threshold, node, out=b["thr"])
+            np.less(b["x"], b["thr"], out=b["go_left"])
+            # valeurs manquantes: direction par défaut du nœud
+            np.isnan(b["x"], out=b["nan"])
+            if b["nan"].any():
+                b["nan"] &= np.take(self.default_left, node)
+                b["go_left"] |= b["nan"]
+            np.take(self.right, node, out=nxt)
+            np.take(self.left, node, out=b["alt"])
+            np.copyto(nxt, b["alt"], where=b["go_left"])
+            node, nxt = nxt, node
+        b["node"], b["next"] = node, nxt
+
+        # somme float32 séquentielle depuis base_score, dans l'ordre des arbres (comme XGBoost)
+        b["leaf"][:, 0] = self.base[0] if shared else self.base
+        np.take(self.value, node, out=b["vals"])
+        b["leaf"][:, 1:] = b["vals"]
+        np.cumsum(b["leaf"], axis=1, out=b["csum"])
+        return b["csum"][:, -1].copy()
@@ -6,9 +6,28 @@ class ForecastConfig:
     horizon_days_long: int = 30
     freq: str = "h"
 
+    # Probabilité de saturation: "exact" (CDF empirique, sans tirage) ou "mc" (chemins bootstrap)
+    risk_method: str = "exact"
+
+    # Inférence du rollout: "compiled" (arbres aplatis en numpy, mêmes valeurs) ou "xgboost" (model.predict)
+    inference_backend: str = "compiled"
+
+    # Stratégie de forecast: "autoregressive" (rollout pas à pas, prédictions réinjectées)
+    # ou "direct" (échéance en feature, tout l'horizon en un predict, voir ncf.direct)
+    forecast_strategy: str = "autoregressive"
+
+    # Hyperparamètres choisis par ncf.tuning (load_tuning), appliqués à l'entraînement par cellule
+    # (stratégie auto-régressive); None = XGB_PARAMS
+    tuned_params: dict = None
+
     # Seuils "capacité" par type de zone (MVP réaliste)
     saturation_threshold_by_zone: dict = None
 
+    # Capacité agrégée (backhaul) par groupe de hierarchy_risk ("IDF", "urban", "IDF/urban", "all"),
+    # par défaut aggregate_capacity_factor × somme des seuils des cellules du groupe
+    aggregate_capacity_mbps: dict = None
+    aggregate_capacity_factor: float = 0.85
+
     def __post_init__(self):
         if self.saturation_threshold_by_zone is None:
             object.__setattr__(self, "saturation_threshold_by_zone", {
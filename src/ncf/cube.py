@@ -0,0 +1,176 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .config import ForecastConfig
+from .scenarios import Scenario, _scenario_arrays
+
+CUBE_DIR = "reports/forecast_cube"
+ONE_HOUR = np.timedelta64(1, "h")
+
+class ForecastCube:
+    """
+    Forecasts horaires complets sur disque: cube.npy (n_cells × hours × n_scenarios, float32),
+    ouvert en memmap, et index.npz (cell_ids, region, zone_type, forecast_start par cellule,
+    noms de scénarios, seuils de saturation par cellule et scénario).
+    Les lectures sont des vues numpy du memmap (aucune copie, seules les pages touchées sont
+    lues): cube.cell(c) est contigu; cube.scenario(s) est une vue à pas (n_cells × hours).
+    Les analyses sur tout le parc passent par iter_blocks (mémoire bornée par bloc de cellules).
+    """
+
+    def __init__(self, root: str = CUBE_DIR, mode: str = "r"):
+        self.root = root
+        with np.load(os.path.join(root, "index.npz")) as z:
+            self.cell_ids = z["cell_ids"].astype(str)
+            self.regions = z["regions"].astype(str)
+            self.zones = z["zones"].astype(str)
+            self.scenarios = [str(s) for s in z["scenarios"]]
+            self.forecast_start = z["forecast_start"]
+            self.thresholds = z["thresholds"]
+        self.data = np.load(os.path.join(root, "cube.npy"), mmap_mode=mode)
+        self._rows = {c: i for i, c in enumerate(self.cell_ids)}
+
+    @classmethod
+    def create(
+        cls,
+        root: str,
+        cell_ids,
+        scenarios: list[str],
+        hours: int,
+        regions=None,
+        zones=None,
+        thresholds: np.ndarray | None = None,
+    ) -> "ForecastCube":
+        """Cube prêt à être rempli par write(); le fichier est alloué sur disque, jamais chargé en mémoire."""
+        os.makedirs(root, exist_ok=True)
+        n = len(cell_ids)
+        np.savez(
+            os.path.join(root, "index.npz"),
+            cell_ids=np.asarray(cell_ids, dtype=str),
+            regions=np.asarray(regions if regions is not None else [""] * n, dtype=str),
+            zones=np.asarray(zones if zones is not None else [""] * n, dtype=str),
+            scenarios=np.asarray(scenarios, dtype=str),
+            forecast_start=np.full(n, np.datetime64("NaT"), dtype="datetime64[s]"),
+            thresholds=(np.full((n, len(scenarios)), np.nan) if thresholds is None else np.asarray(thresholds)).astype(np.float32),
+        )
+        data = np.lib.format.open_memmap(os.path.join(root, "cube.npy"), mode="w+", dtype=np.float32, shape=(n, hours, len(scenarios)))
+        del data  # fichier creux: seules les pages écrites par write() occupent le disque
+        return cls(root, mode="r+")
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self.data.shape
+
+    @property
+    def hours(self) -> int:
+        return self.data.shape[1]
+
+    def rows(self, cell_ids) -> np.ndarray:
+        return np.array([self._rows[str(c)] for c in cell_ids], dtype=np.int64)
+
+    def scenario_index(self, name: str) -> int:
+        if name not in self.scenarios:
+            raise ValueError(f"Unknown scenario {name!r} (available: {self.scenarios}).")
+        return self.scenarios.index(name)
+
+    def cell(self, cell_id) -> np.ndarray:
+        """Vue (hours × n_scenarios) d'une cellule."""
+        return self.data[self._rows[str(cell_id)]]
+
+    def scenario(self, name: str) -> np.ndarray:
+        """Vue (n_cells × hours) d'un scénario."""
+        return self.data[:, :, self.scenario_index(name)]
+
+    def timestamps(self, cell_id) -> np.ndarray:
+        """Horodatages des heures prévues d'une cellule."""
+        return self.forecast_start[self._rows[str(cell_id)]] + np.arange(self.hours) * ONE_HOUR
+
+    def write(self, cell_ids, paths: np.ndarray, forecast_start=None):
+        """paths: (n, hours, n_scenarios) pour les cellules cell_ids (dans un ordre quelconque)."""
+        rows = self.rows(cell_ids)
+        self.data[rows] = paths
+        if forecast_start is not None:
+            self.forecast_start[rows] = np.asarray(forecast_start, dtype="datetime64[s]")
+
+    def flush(self):
+        """Écrit les données et l'index (forecast_start mis à jour par write)."""
+        self.data.flush()
+        index = os.path.join(self.root, "index.npz")
+        with np.load(index) as z:
+            arrays = dict(z)
+        arrays["forecast_start"] = self.forecast_start
+        np.savez(index + ".tmp.npz", **arrays)
+        os.replace(index + ".tmp.npz", index)
+
+    def iter_blocks(self, block_cells: int = 2048, scenario: str | None = None):
+        """(slice de lignes, vue du bloc): n_cells × hours × n_scenarios, ou n_cells × hours si scenario."""
+        k = None if scenario is None else self.scenario_index(scenario)
+        for start in range(0, len(self.cell_ids), block_cells):
+            sl = slice(start, min(start + block_cells, len(self.cell_ids)))
+            yield sl, (self.data[sl] if k is None else self.data[sl, :, k])
+
+def write_forecast_cube(
+    records: list[dict],
+    cfg: ForecastConfig,
+    scenarios: list[Scenario],
+    root: str = CUBE_DIR,
+    block_cells: int = 2048,
+) -> ForecastCube:
+    """
+    Cube des forecasts J+30 de chaque scénario (forecast de base × multiplicateur de charge du
+    scénario), écrit par blocs de block_cells cellules. Les cellules en erreur restent à NaN.
+    """
+    H30 = cfg.horizon_days_long * 24
+    cell_ids = [str(r["cell_id"]) for r in records]
+    regions = np.array([str(r["region"]) for r in records], dtype=object)
+    zones = np.array([str(r["zone_type"]) for r in records], dtype=object)
+    params = [_scenario_arrays(sc, cfg, regions, zones) for sc in scenarios]
+    mults = np.stack([m for m, _ in params], axis=1).reshape(len(records), len(scenarios))
+    thresholds = np.stack([t for _, t in params], axis=1).reshape(len(records), len(scenarios))
+
+    cube = ForecastCube.create(root, cell_ids, [sc.name for sc in scenarios], H30, regions, zones, thresholds)
+    failed = [c for c, r in zip(cell_ids, records) if "error" in r]
+    if failed:
+        cube.write(failed, np.nan)
+    ok = [i for i, r in enumerate(records) if "error" not in r]
+    for start in range(0, len(ok), block_cells):
+        idx = ok[start:start + block_cells]
+        Y = np.array([np.asarray(records[i]["y_pred"], dtype=np.float32)[:H30] for i in idx])
+        cube.write(
+            [cell_ids[i] for i in idx],
+            Y[:, :, None] * mults[idx, None, :].astype(np.float32),
+            [records[i].get("forecast_start", np.datetime64("NaT")) for i in idx],
+        )
+    cube.flush()
+    return cube
+
+def peak_hours(cube: ForecastCube, scenario: str, block_cells: int = 2048) -> pd.DataFrame:
+    """Par cellule: heure du pic prévu (horodatage et heure de la journée) et valeur du pic."""
+    out = []
+    for sl, block in cube.iter_blocks(block_cells, scenario):
+        valid = ~np.isnan(block).all(axis=1)
+        h = np.where(valid, np.nanargmax(np.where(np.isnan(block), -np.inf, block), axis=1), 0)
+        ts = cube.forecast_start[sl] + h * ONE_HOUR
+        out.append(pd.DataFrame({
+            "cell_id": cube.cell_ids[sl],
+            "peak_timestamp": np.where(valid, ts, np.datetime64("NaT")),
+            "peak_hour_of_day": np.where(valid, ts.astype("datetime64[h]").astype(np.int64) % 24, -1),
+            "peak_mbps": np.where(valid, block[np.arange(len(h)), h], np.nan),
+        }))
+    return pd.concat(out, ignore_index=True)
+
+def first_exceedances(cube: ForecastCube, scenario: str, block_cells: int = 2048) -> pd.DataFrame:
+    """Par cellule: première heure où le forecast (point) dépasse le seuil du scénario (NaT sinon)."""
+    k = cube.scenario_index(scenario)
+    out = []
+    for sl, block in cube.iter_blocks(block_cells, scenario):
+        above = block > cube.thresholds[sl, k][:, None]
+        hit = above.any(axis=1)
+        h = above.argmax(axis=1)
+        out.append(pd.DataFrame({
+            "cell_id": cube.cell_ids[sl],
+            "first_exceedance": np.where(hit, cube.forecast_start[sl] + h * ONE_HOUR, np.datetime64("NaT")),
+            "hours_above": above.sum(axis=1),
+        }))
+    return pd.concat(out, ignore_index=True)
@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error
+from xgboost import XGBRegressor
+
+from .cellstore import cell_frame
+from .features import CALENDAR_FEATURES, calendar_arrays
+from .forecast import DEFAULT_LAGS
+from .model_xgb import XGB_PARAMS
+from .trace import get_tracer
+
+STRATEGIES = ("autoregressive", "direct")
+# trafic à la même heure du dernier jour / de la dernière semaine observés avant l'origine
+SEASONAL_FEATURES = ("same_hour_d1", "same_hour_w1")
+
+def direct_feats(lags=DEFAULT_LAGS) -> list[str]:
+    """Features du modèle direct: lags vus depuis l'origine, échéance, saisonniers, calendrier de l'heure visée."""
+    return [f"{p}_{l}" for l in lags for p in ("lag", "ulag")] + ["lead", *SEASONAL_FEATURES, *CALENDAR_FEATURES]
+
+def _series(df_cell: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    d = df_cell if df_cell["timestamp"].is_monotonic_increasing else df_cell.sort_values("timestamp")
+    return (
+        d["traffic_mbps"].to_numpy(dtype=float),
+        d["users"].to_numpy(dtype=float),
+        d["timestamp"].to_numpy(dtype="datetime64[ns]"),
+    )
+
+def direct_design(
+    traffic: np.ndarray,
+    users: np.ndarray,
+    timestamps: np.ndarray,
+    origins: np.ndarray,
+    leads: np.ndarray,
+    lags=DEFAULT_LAGS,
+) -> np.ndarray:
+    """
+    Matrice (n_lignes × direct_feats) d'une série horaire triée, une ligne par couple
+    (origine, échéance): origins = index de la dernière heure observée, leads = échéance
+    en heures (>= 1). Seules des heures <= origine sont lues: pas de valeur prédite réinjectée.
+    """
+    origins = np.asarray(origins, dtype=np.int64)
+    leads = np.asarray(leads, dtype=np.int64)
+    cols = []
+    for l in lags:
+        cols.append(traffic[origins + 1 - l])
+        cols.append(users[origins + 1 - l])
+    cols.append(leads)
+    cols.append(traffic[origins + leads - 24 * ((leads + 23) // 24)])
+    cols.append(traffic[origins + leads - 168 * ((leads + 167) // 168)])
+    cal = calendar_arrays(timestamps[origins] + leads.astype("timedelta64[h]"))
+    cols.extend(cal[name] for name in CALENDAR_FEATURES)
+    return np.column_stack(cols).astype(float)
+
+def _sample_pairs(targets: np.ndarray, horizon_hours: int, min_origin: int, per_target: int, rng) -> tuple[np.ndarray, np.ndarray]:
+    """per_target échéances tirées dans [1, horizon_hours] par heure cible (origine = cible - échéance)."""
+    j = np.repeat(targets, per_target)
+    leads = rng.integers(1, horizon_hours + 1, size=j.size)
+    origins = j - leads
+    keep = origins >= min_origin
+    return origins[keep], leads[keep]
+
+def train_xgb_direct(
+    df,
+    cell_id: str,
+    train_end: str,
+    horizon_hours: int = 720,
+    lags=DEFAULT_LAGS,
+    params: dict | None = None,
+    leads_per_target: int = 8,
+    seed: int = 42,
+):
+    """
+    Modèle direct multi-horizon d'une cellule: un XGBRegressor avec l'échéance en feature
+    ("lead"), entraîné sur des couples (origine, échéance) tirés au hasard, leads_per_target
+    par heure cible avant train_end. Validation: une échéance tirée par heure après train_end,
+    les résidus couvrent donc tout l'horizon (et pas seulement le pas suivant).
+    Même contrat que train_xgb_forecast. Renvoie: model, feats, mae, valid_df
+    """
+    traffic, users, ts = _series(cell_frame(df, cell_id))
+    min_origin = max(lags) - 1
+    if len(traffic) < max(lags) + 2:
+        raise ValueError(f"Not enough history for max_lag={max(lags)}. Need at least {max(lags)+2} rows.")
+    split = int(np.searchsorted(ts, pd.to_datetime(train_end).to_datetime64()))
+    rng = np.random.default_rng(seed)
+
+    o_tr, h_tr = _sample_pairs(np.arange(min_origin + 1, split), horizon_hours, min_origin, leads_per_target, rng)
+    o_va, h_va = _sample_pairs(np.arange(split, len(traffic)), horizon_hours, min_origin, 1, rng)
+    if not len(o_tr) or not len(o_va):
+        raise ValueError(f"No training or validation rows around train_end={train_end}.")
+
+    model = XGBRegressor(**dict(XGB_PARAMS, **(params or {})))
+    model.fit(direct_design(traffic, users, ts, o_tr, h_tr, lags), traffic[o_tr + h_tr])
+
+    y_true = traffic[o_va + h_va]
+    y_pred = model.predict(direct_design(traffic, users, ts, o_va, h_va, lags))
+    valid_out = pd.DataFrame({"timestamp": ts[o_va + h_va], "y_true": y_true, "y_pred": y_pred})
+    return model, direct_feats(lags), mean_absolute_error(y_true, y_pred), valid_out
+
+def forecast_xgb_direct(
+    models,
+    df_cells: list[pd.DataFrame],
+    feats: list[str],
+    horizon_hours: int,
+    lags=DEFAULT_LAGS,
+    backend: str = "xgboost",
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Forecast direct: toutes les échéances 1..horizon_hours de chaque cellule sont des lignes
+    indépendantes d'une même matrice (horizons × features), prédites en un predict par modèle,
+    sans dépendance d'un pas au suivant. Même contrat que forecast_xgb_batch; backend est
+    accepté mais model.predict est toujours utilisé: sur un lot de n × horizon lignes, le
+    predict natif est plus rapide que les arbres compilés (faits pour une ligne par modèle).
+    Renvoie (timestamps, y_pred), deux tableaux (n_cells × horizon_hours).
+    """
+    if backend not in ("xgboost", "compiled"):
+        raise ValueError(f"Unknown backend={backend!r} (expected 'xgboost' or 'compiled').")
+    if list(feats) != direct_feats(lags):
+        raise ValueError("feats do not match direct_feats(lags): model was not trained with train_xgb_direct.")
+    n = len(df_cells)
+    leads = np.arange(1, horizon_hours + 1)
+    X = np.empty((n, horizon_hours, len(feats)))
+    last_ts = np.empty(n, dtype="datetime64[ns]")
+    for i, df_cell in enumerate(df_cells):
+        traffic, users, ts = _series(df_cell)
+        if len(traffic) < max(lags) + 2:
+            raise ValueError(f"Not enough history for max_lag={max(lags)}. Need at least {max(lags)+2} rows.")
+        X[i] = direct_design(traffic, users, ts, np.full(horizon_hours, len(traffic) - 1), leads, lags)
+        last_ts[i] = ts[-1]
+
+    timestamps = last_ts.reshape(-1, 1) + leads.astype("timedelta64[h]").reshape(1, -1)
+    return timestamps, _predict_by_model(models, X)
+
+def forecast_direct_ring(models, ring, feats: list[str], horizon_hours: int, lags=DEFAULT_LAGS) -> np.ndarray:
+    """
+    Forecast direct depuis un LagRingBuffer (état en ligne: max(lags) dernières heures, seules
+    lues par direct_design): mêmes lignes que forecast_xgb_direct sur l'historique complet.
+    Renvoie y_pred (n_cells × horizon_hours).
+    """
+    if list(feats) != direct_feats(lags):
+        raise ValueError("feats do not match direct_feats(lags): model was not trained with train_xgb_direct.")
+    if ring.size < max(lags):
+        raise ValueError(f"Ring holds {ring.size} hours, direct features need max_lag={max(lags)}.")
+    # plus ancienne heure en premier; heure k du ring = last_ts - (size - 1 - k) h
+    traffic = np.roll(ring.traffic, -ring.head, axis=1)
+    users = np.roll(ring.users, -ring.head, axis=1)
+    offsets = (np.arange(ring.size) - (ring.size - 1)).astype("timedelta64[h]")
+    origins = np.full(horizon_hours, ring.size - 1)
+    leads = np.arange(1, horizon_hours + 1)
+    X = np.stack([
+        direct_design(traffic[i], users[i], ring.last_ts[i] + offsets, origins, leads, lags)
+        for i in range(ring.n_cells)
+    ])
+    return _predict_by_model(models, X)
+
+def _predict_by_model(models, X: np.ndarray) -> np.ndarray:
+    """X (n_cells × horizon × features) -> (n_cells × horizon), un predict par modèle distinct."""
+    n, horizon, k = X.shape
+    # cellules regroupées par modèle: un modèle partagé => un seul predict sur n × horizon lignes
+    if not isinstance(models, (list, tuple)):
+        models = [models] * n
+    if len(models) != n:
+        raise ValueError(f"Expected {n} models, got {len(models)}.")
+    groups = {}
+    for i, m in enumerate(models):
+        groups.setdefault(id(m), []).append(i)
+
+    preds = np.empty((n, horizon))
+    for idx in groups.values():
+        preds[idx] = models[idx[0]].predict(X[idx].reshape(-1, k)).reshape(len(idx), horizon)
+    get_tracer().count("predict_calls", len(groups))
+    return preds
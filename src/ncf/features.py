@@ -1,16 +1,78 @@
+import numpy as np
 import pandas as pd
 
+CALENDAR_FEATURES = ("hour", "dayofweek", "month", "is_weekend")
+# colonnes ajoutées par add_saturation_label: dépendent des seuils, jamais features du modèle
+LABEL_COLUMNS = ("saturation_threshold_mbps", "is_saturated")
+CATEGORY_COLUMNS = ("cell_id", "region", "zone_type")
+
+# schéma compact des frames horaires: timestamp datetime64 (parsé une fois), chaînes en
+# category, trafic float32, compteurs en petits entiers (users: int16, int32 si débordement)
+COMPACT_DTYPES = {
+    "traffic_mbps": np.float32,
+    "event_flag": np.int8,
+    "saturation_threshold_mbps": np.float32,
+    "is_saturated": np.int8,
+}
+USERS_DTYPES = (np.int16, np.int32)
+
+def _int_dtype(values: np.ndarray, candidates):
+    lo, hi = (values.min(), values.max()) if len(values) else (0, 0)
+    for dt in candidates:
+        if np.iinfo(dt).min <= lo and hi <= np.iinfo(dt).max:
+            return dt
+    return values.dtype
+
+def compact_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Frame horaire au schéma compact (COMPACT_DTYPES): à appeler une fois à l'entrée (simulateur,
+    lecture Parquet); les colonnes déjà au bon type ne sont pas converties (copie superficielle).
+    """
+    df = df.copy(deep=False)
+    if "timestamp" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+    for c in CATEGORY_COLUMNS:
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("category")
+    dtypes = {c: dt for c, dt in COMPACT_DTYPES.items() if c in df.columns}
+    if "users" in df.columns:
+        dtypes["users"] = _int_dtype(df["users"].to_numpy(), USERS_DTYPES)
+    changed = {c: dt for c, dt in dtypes.items() if df[c].dtype != dt}
+    return df.astype(changed) if changed else df
+
 def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    ts = pd.to_datetime(df["timestamp"])
-    df["hour"] = ts.dt.hour
-    df["dayofweek"] = ts.dt.dayofweek
-    df["month"] = ts.dt.month
-    df["is_weekend"] = (df["dayofweek"] >= 5).astype(int)
+    """
+    Ajoute hour / dayofweek / month / is_weekend (int8) en place et renvoie df: à appeler
+    sur un frame dérivé (ex: make_supervised), pas sur les données d'entrée.
+    timestamp n'est reparsé que s'il n'est pas déjà en datetime64.
+    """
+    ts = df["timestamp"]
+    if not pd.api.types.is_datetime64_any_dtype(ts):
+        ts = pd.to_datetime(ts)
+    for name, values in calendar_arrays(ts.to_numpy()).items():
+        df[name] = values.astype(np.int8)
     return df
 
+def calendar_arrays(ts: np.ndarray) -> dict:
+    """
+    Mêmes features calendaires que add_time_features, calculées directement
+    sur un tableau numpy datetime64 (de forme quelconque), sans passer par pandas.
+    """
+    hours = np.asarray(ts).astype("datetime64[h]").astype(np.int64)
+    days = hours // 24
+    dayofweek = (days + 3) % 7  # 1970-01-01 était un jeudi
+    month = np.asarray(ts).astype("datetime64[M]").astype(np.int64) % 12 + 1
+    return {
+        "hour": hours % 24,
+        "dayofweek": dayofweek,
+        "month": month,
+        "is_weekend": (dayofweek >= 5).astype(np.int64),
+    }
+
 def add_saturation_label(df: pd.DataFrame, thresholds_by_zone: dict) -> pd.DataFrame:
-    df = df.copy()
-    df["saturation_threshold_mbps"] = df["zone_type"].map(thresholds_by_zone).astype(float)
-    df["is_saturated"] = (df["traffic_mbps"] >= df["saturation_threshold_mbps"]).astype(int)
+    """Seuil de la zone et label de saturation; les colonnes d'entrée sont partagées (copie superficielle)."""
+    df = df.copy(deep=False)
+    thr = df["zone_type"].map(thresholds_by_zone).astype(np.float32)
+    df["saturation_threshold_mbps"] = thr
+    df["is_saturated"] = (df["traffic_mbps"] >= thr).astype(np.int8)
     return df
@@ -0,0 +1,483 @@
+import os
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from .config import ForecastConfig
+from .cellstore import CellStore, as_cell_store
+from .model_xgb import train_xgb_forecast, train_xgb_global
+from .direct import STRATEGIES, forecast_xgb_direct, train_xgb_direct
+from .forecast import DEFAULT_LAGS, forecast_xgb_batch
+from .registry import ModelRegistry
+from .residuals import ResidualStore, model_version
+from .risk import (
+    calibrate_residuals_batch,
+    estimate_residuals,
+    fleet_window_risk,
+    window_saturation_probabilities,
+    risk_level,
+)
+from .trace import Tracer, get_tracer, tracing
+from .tuning import params_for
+
+TRAIN_END = "2025-07-01"
+# fenêtre de validation de rolling_train_end (183 j: TRAIN_END pour le dataset fin 2025 du MVP)
+VALID_DAYS = 183
+RISK_ORDER = {"HIGH": 0, "MEDIUM": 1, "LOW": 2, "UNKNOWN": 3}
+
+def risk_row(
+    cell_meta,
+    cfg: ForecastConfig,
+    users_multiplier: float,
+    mae: float,
+    residuals: np.ndarray,
+    y_pred: np.ndarray,
+    calibrated: np.ndarray | None = None,
+) -> dict:
+    """
+    Ligne du rapport de risque à partir du chemin prévu (au moins J+30) et des résidus
+    de validation d'une cellule, quel que soit le mode d'entraînement.
+    calibrated: résidus déjà calibrés et triés (ResidualStore), mode exact uniquement.
+    """
+    H7 = cfg.horizon_days_short * 24
+    H30 = cfg.horizon_days_long * 24
+    zone = cell_meta["zone_type"]
+    threshold = float(cfg.saturation_threshold_by_zone.get(zone, 800.0))
+
+    # What-if: proxy simple -> plus d'abonnés = plus de charge
+    f7_adj = y_pred[:H7] * users_multiplier
+    f30_adj = y_pred[:H30] * users_multiplier
+
+    tracer = get_tracer()
+    cell_id = cell_meta["cell_id"]
+    if cfg.risk_method == "exact":
+        with tracer.span("calibration", cell_id):
+            cal = calibrate_residuals_batch([residuals]) if calibrated is None else [calibrated]
+        with tracer.span("risk", cell_id):
+            k = fleet_window_risk(f30_adj[None, :], [threshold], cal, horizons=[H7, H30], calibrated=True)
+        p7, p30 = (float(v) for v in k["p_saturation"][0])
+        exceed_hours = float(k["expected_exceedance_hours"][0, -1])
+        first_exceed = float(k["expected_first_exceedance_h"][0, -1])
+    else:
+        with tracer.span("risk", cell_id):
+            p = window_saturation_probabilities(f30_adj, residuals, threshold, horizons=[H7, H30], n_paths=2000, seed=42)
+        tracer.count("mc_samples", 2000 * len(f30_adj), cell_id)
+        p7, p30 = p[H7], p[H30]
+        exceed_hours = first_exceed = float("nan")
+
+    max7 = float(f7_adj.max())
+    max30 = float(f30_adj.max())
+    worst = max(p7, p30)
+
+    return {
+        "cell_id": cell_meta["cell_id"],
+        "region": cell_meta["region"],
+        "zone_type": zone,
+        "users_multiplier": users_multiplier,
+        "mae_valid_mbps": round(mae, 2),
+        "saturation_threshold_mbps": threshold,
+        "max_pred_j7_mbps": round(max7, 2),
+        "max_pred_j30_mbps": round(max30, 2),
+        "p_saturation_j7": round(p7, 4),
+        "p_saturation_j30": round(p30, 4),
+        "risk_level": risk_level(worst),
+        "p_worst": round(worst, 4),
+        "exp_exceedance_hours_j30": round(exceed_hours, 2),
+        "exp_first_exceedance_h_j30": round(first_exceed, 1),
+    }
+
+def _cell_meta(df_cell: pd.DataFrame) -> dict:
+    first = df_cell.iloc[0]
+    return {"cell_id": first["cell_id"], "region": first["region"], "zone_type": first["zone_type"]}
+
+def rolling_train_end(df_cell: pd.DataFrame, valid_days: int = VALID_DAYS) -> str:
+    """
+    Fin d'entraînement glissante: validation sur les valid_days × 24 dernières heures de la
+    cellule. Les heures ajoutées avancent train_end, l'entraînement stocké reste un préfixe
+    ("warm" du registry).
+    """
+    last = pd.to_datetime(df_cell["timestamp"]).max().floor("h")
+    return str(last + pd.Timedelta(hours=1) - pd.Timedelta(days=valid_days))
+
+def check_strategy(cfg: ForecastConfig, mode: str = "per_cell", registry: ModelRegistry | None = None):
+    """Combinaisons supportées de cfg.forecast_strategy avec le mode et le registry."""
+    if cfg.forecast_strategy not in STRATEGIES:
+        raise ValueError(f"Unknown forecast_strategy={cfg.forecast_strategy!r} (expected one of {STRATEGIES}).")
+    if cfg.forecast_strategy == "direct" and (mode != "per_cell" or registry is not None):
+        raise ValueError("forecast_strategy='direct' only supports mode='per_cell' without registry.")
+
+def train_cell(
+    df_cell: pd.DataFrame,
+    cfg: ForecastConfig,
+    train_end: str | None = TRAIN_END,
+    registry: ModelRegistry | None = None,
+) -> dict:
+    """
+    Entraîne le modèle d'une cellule (stratégie cfg.forecast_strategy).
+    Avec un registry, le modèle est rechargé / mis à jour au lieu d'être réentraîné.
+    train_end=None: rolling_train_end de la cellule (suit les heures ajoutées).
+    Renvoie un enregistrement: cell_id, region, zone_type, mae, residuals, model, feats, model_version.
+    """
+    check_strategy(cfg, registry=registry)
+    H30 = cfg.horizon_days_long * 24
+    rec = _cell_meta(df_cell)
+    if train_end is None:
+        train_end = rolling_train_end(df_cell)
+    tracer = get_tracer()
+    params = params_for(cfg.tuned_params, rec)
+
+    with tracer.span("training", rec["cell_id"]):
+        if cfg.forecast_strategy == "direct":
+            model, feats, mae, valid_out = train_xgb_direct(df_cell, cell_id=rec["cell_id"], train_end=train_end, horizon_hours=H30)
+        elif registry is not None:
+            model, feats, mae, valid_out, _ = registry.get_or_train(df_cell, rec["cell_id"], train_end=train_end, params=params)
+        else:
+            model, feats, mae, valid_out = train_xgb_forecast(df_cell, cell_id=rec["cell_id"], train_end=train_end, params=params)
+    if tracer.enabled:
+        tracer.count("rows", len(df_cell), rec["cell_id"])
+        tracer.count("trees", model.get_booster().num_boosted_rounds(), rec["cell_id"])
+    rec.update(
+        mae=mae, residuals=estimate_residuals(valid_out["y_true"].values, valid_out["y_pred"].values),
+        model=model, feats=feats, model_version=model_version(model),
+    )
+    return rec
+
+def forecast_trained(trained: list[dict], frames: list[pd.DataFrame], cfg: ForecastConfig) -> list[dict]:
+    """
+    Forecast J+30 de cellules entraînées (enregistrements de train_cell, alignés sur frames),
+    en un seul appel: rollout vectorisé (auto-régressif) ou un predict par modèle (direct).
+    Renvoie les enregistrements de forecast_cell (sans model / feats).
+    """
+    H30 = cfg.horizon_days_long * 24
+    # un seul forecast jusqu'à J+30, J+7 = ses 168 premiers pas
+    forecast = forecast_xgb_direct if cfg.forecast_strategy == "direct" else forecast_xgb_batch
+    timestamps, preds = forecast([t["model"] for t in trained], frames, trained[0]["feats"], H30, backend=cfg.inference_backend)
+    out = []
+    for i, t in enumerate(trained):
+        rec = {k: v for k, v in t.items() if k not in ("model", "feats")}
+        rec.update(y_pred=preds[i], forecast_start=timestamps[i, 0])
+        out.append(rec)
+    return out
+
+def forecast_cell(
+    df_cell: pd.DataFrame,
+    cfg: ForecastConfig,
+    train_end: str | None = TRAIN_END,
+    registry: ModelRegistry | None = None,
+) -> dict:
+    """
+    Entraîne (modèle par cellule) et prévoit une cellule jusqu'à J+30.
+    Avec un registry, le modèle est rechargé / mis à jour au lieu d'être réentraîné.
+    cfg.forecast_strategy="direct": modèle à échéance en feature, forecast en un predict.
+    Renvoie un enregistrement: cell_id, region, zone_type, mae, residuals, y_pred, forecast_start.
+    """
+    trained = train_cell(df_cell, cfg, train_end=train_end, registry=registry)
+    with get_tracer().span("forecast", trained["cell_id"]):
+        return forecast_trained([trained], [df_cell], cfg)[0]
+
+def failed_cell(df_cell: pd.DataFrame, exc: Exception) -> dict:
+    """Enregistrement d'une cellule en échec: le run continue, l'erreur est tracée."""
+    rec = _cell_meta(df_cell)
+    rec["error"] = f"{type(exc).__name__}: {exc}"
+    return rec
+
+def error_row(rec: dict, cfg: ForecastConfig, users_multiplier: float) -> dict:
+    """Ligne de rapport d'une cellule en échec."""
+    zone = rec["zone_type"]
+    return {
+        "cell_id": rec["cell_id"],
+        "region": rec["region"],
+        "zone_type": zone,
+        "users_multiplier": users_multiplier,
+        "mae_valid_mbps": np.nan,
+        "saturation_threshold_mbps": float(cfg.saturation_threshold_by_zone.get(zone, 800.0)),
+        "max_pred_j7_mbps": np.nan,
+        "max_pred_j30_mbps": np.nan,
+        "p_saturation_j7": np.nan,
+        "p_saturation_j30": np.nan,
+        "risk_level": "UNKNOWN",
+        "p_worst": np.nan,
+        "exp_exceedance_hours_j30": np.nan,
+        "exp_first_exceedance_h_j30": np.nan,
+        "error": rec["error"],
+    }
+
+def score_record(rec: dict, cfg: ForecastConfig, users_multiplier: float = 1.0, residual_store: ResidualStore | None = None) -> dict:
+    """
+    Ligne du rapport de risque d'un enregistrement de forecast_cell (ou d'échec).
+    residual_store: les résidus de la cellule y sont enregistrés et la calibration y est lue.
+    """
+    if "error" in rec:
+        row = error_row(rec, cfg, users_multiplier)
+    else:
+        try:
+            cal = None
+            if residual_store is not None and cfg.risk_method == "exact":
+                cal = residual_store.calibrated(rec["cell_id"], rec["model_version"], residuals=rec["residuals"])
+            row = risk_row(rec, cfg, users_multiplier, rec["mae"], rec["residuals"], rec["y_pred"], calibrated=cal)
+        except Exception as exc:
+            row = error_row(dict(rec, error=f"{type(exc).__name__}: {exc}"), cfg, users_multiplier)
+    tracer = get_tracer()
+    if tracer.enabled:
+        # temps cumulé de la cellule (training + forecast + calibration + risk)
+        row["cell_time_s"] = round(tracer.cell_seconds(rec["cell_id"]), 3)
+    return row
+
+def score_cell(
+    df_cell: pd.DataFrame,
+    cfg: ForecastConfig,
+    users_multiplier: float = 1.0,
+    train_end: str | None = TRAIN_END,
+    registry: ModelRegistry | None = None,
+) -> dict:
+    """
+    Entraîne, prévoit et évalue le risque d'une cellule.
+    Renvoie une ligne du rapport de risque.
+    """
+    rec = forecast_cell(df_cell, cfg, train_end=train_end, registry=registry)
+    return risk_row(rec, cfg, users_multiplier, rec["mae"], rec["residuals"], rec["y_pred"])
+
+_worker_tracer = None
+
+def _forecast_frames(frames: list[pd.DataFrame], cfg: ForecastConfig, registry=None) -> list[dict]:
+    """
+    Paquet de cellules: entraînement cellule par cellule, puis un seul forecast_trained
+    (rollout vectorisé) pour toutes les cellules entraînées. Si ce forecast groupé échoue,
+    les cellules sont reprévues une à une pour isoler la fautive.
+    """
+    out, trained = [], []
+    for i, df_cell in enumerate(frames):
+        try:
+            trained.append((i, train_cell(df_cell, cfg, registry=registry)))
+            out.append(None)
+        except Exception as exc:
+            out.append(failed_cell(df_cell, exc))
+    if not trained:
+        return out
+
+    tracer = get_tracer()
+    try:
+        with tracer.span("forecast", [t["cell_id"] for _, t in trained]):
+            done = forecast_trained([t for _, t in trained], [frames[i] for i, _ in trained], cfg)
+    except Exception:
+        done = None
+    for j, (i, t) in enumerate(trained):
+        if done is not None:
+            out[i] = done[j]
+            continue
+        try:
+            with tracer.span("forecast", t["cell_id"]):
+                out[i] = forecast_trained([t], [frames[i]], cfg)[0]
+        except Exception as exc:
+            out[i] = failed_cell(frames[i], exc)
+    return out
+
+def _forecast_chunk(frames: list[pd.DataFrame], cfg: ForecastConfig, registry=None, finish=None, trace: tuple | None = None) -> list[dict]:
+    """
+    trace: (pid du parent, config de son tracer). Dans un worker, les spans et compteurs
+    de chaque cellule repartent avec son élément (clé "_trace").
+    """
+    global _worker_tracer
+    local = None
+    if trace is not None and os.getpid() != trace[0]:
+        if _worker_tracer is None:
+            _worker_tracer = Tracer(**trace[1])  # un par processus: les profils s'accumulent
+        local = _worker_tracer
+
+    out = []
+    with tracing(local or get_tracer()):
+        for rec in _forecast_frames(frames, cfg, registry):
+            item = finish(rec) if finish is not None else rec
+            if local is not None:
+                item["_trace"] = local.drain()
+            out.append(item)
+    if local is not None:
+        local.write_profiles()
+    return out
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _iter_global_forecasts(store: CellStore, cfg: ForecastConfig, cell_ids, group_by):
+    """
+    Mode global: un entraînement sur toutes les cellules, puis un rollout unique où
+    chaque pas est un seul predict (par groupe) sur la matrice de toutes les cellules.
+    """
+    H30 = cfg.horizon_days_long * 24
+    min_rows = max(DEFAULT_LAGS) + 2
+
+    tracer = get_tracer()
+    frames = dict(zip(cell_ids, store.frames(cell_ids)))
+    with tracer.span("training"):
+        models, feats, maes, valid_outs = train_xgb_global(store, TRAIN_END, cell_ids=cell_ids, group_by=group_by)
+    if tracer.enabled:
+        tracer.count("rows", sum(len(f) for f in frames.values()))
+        parents = {id(m.parent): m.parent for m in models.values()}
+        tracer.count("trees", sum(p.model.get_booster().num_boosted_rounds() for p in parents.values()))
+
+    ok = []
+    for cell_id in cell_ids:
+        if cell_id not in models:
+            yield failed_cell(frames[cell_id], ValueError("No validation rows for global model."))
+        elif len(frames[cell_id]) < min_rows:
+            yield failed_cell(frames[cell_id], ValueError(f"Not enough history for max_lag={max(DEFAULT_LAGS)}."))
+        else:
+            ok.append(cell_id)
+    if not ok:
+        return
+
+    with tracer.span("forecast"):
+        timestamps, preds = forecast_xgb_batch([models[c] for c in ok], [frames[c] for c in ok], feats, H30, backend=cfg.inference_backend)
+    for i, cell_id in enumerate(ok):
+        v = valid_outs[cell_id]
+        rec = _cell_meta(frames[cell_id])
+        rec.update(
+            mae=maes[cell_id],
+            residuals=estimate_residuals(v["y_true"].values, v["y_pred"].values),
+            y_pred=preds[i],
+            forecast_start=timestamps[i, 0],
+            model_version=model_version(models[cell_id]),
+        )
+        yield rec
+
+def iter_cell_forecasts(
+    df: pd.DataFrame | CellStore,
+    cfg: ForecastConfig,
+    cell_ids=None,
+    n_workers: int = 1,
+    chunk_size: int = 4,
+    progress=None,
+    mode: str = "per_cell",
+    group_by: str | None = None,
+    registry: ModelRegistry | None = None,
+    finish=None,
+):
+    """
+    Génère les forecasts J+30 (+ résidus de validation) cellule par cellule, au fil de l'eau.
+    df: DataFrame multi-cellules ou CellStore (construit une fois et réutilisable).
+    - n_workers > 1: les cellules sont réparties par paquets de chunk_size sur un pool
+      de processus; chaque worker ne reçoit que les données de son paquet. Chaque paquet
+      est entraîné puis prévu en un seul rollout vectorisé.
+    - une cellule en erreur devient un enregistrement avec la clé "error".
+    - progress(done, total, item) est appelé pour chaque élément produit.
+    - mode="per_cell": un XGBRegressor par cellule (défaut);
+      mode="global": un modèle partagé (ou un par group_by = zone_type/region),
+      entraîné et prévu dans le processus courant.
+    - registry: réutilise les modèles par cellule déjà entraînés (voir ModelRegistry).
+    - cfg.forecast_strategy: "autoregressive" ou "direct" (par cellule, sans registry, voir ncf.direct).
+    - finish(rec): post-traitement appliqué à chaque enregistrement (dans le worker).
+    Les éléments arrivent dans l'ordre de fin de calcul (pas forcément l'ordre des cell_ids).
+    """
+    check_strategy(cfg, mode, registry)
+    store = as_cell_store(df)
+    if cell_ids is None:
+        cell_ids = store.cell_ids
+    frames = store.frames(cell_ids)
+    total = len(frames)
+    done = 0
+    tracer = get_tracer()
+
+    if mode == "global":
+        for rec in _iter_global_forecasts(store, cfg, list(cell_ids), group_by):
+            item = finish(rec) if finish is not None else rec
+            done += 1
+            if progress is not None:
+                progress(done, total, item)
+            yield item
+        return
+    if mode != "per_cell":
+        raise ValueError(f"Unknown mode={mode!r} (expected 'per_cell' or 'global').")
+
+    if n_workers <= 1:
+        for chunk in _chunks(frames, chunk_size):
+            for item in _forecast_chunk(chunk, cfg, registry, finish):
+                done += 1
+                if progress is not None:
+                    progress(done, total, item)
+                yield item
+        return
+
+    trace = (os.getpid(), tracer.config()) if tracer.enabled else None
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = [pool.submit(_forecast_chunk, chunk, cfg, registry, finish, trace) for chunk in _chunks(frames, chunk_size)]
+        for fut in as_completed(futures):
+            for item in fut.result():
+                if "_trace" in item:
+                    tracer.merge(item.pop("_trace"))
+                done += 1
+                if progress is not None:
+                    progress(done, total, item)
+                yield item
+
+def iter_risk_rows(
+    df: pd.DataFrame | CellStore,
+    cfg: ForecastConfig,
+    users_multiplier: float = 1.0,
+    cell_ids=None,
+    n_workers: int = 1,
+    chunk_size: int = 4,
+    progress=None,
+    mode: str = "per_cell",
+    group_by: str | None = None,
+    registry: ModelRegistry | None = None,
+    residual_store: ResidualStore | None = None,
+):
+    """
+    Génère les lignes de risque au fil de l'eau (voir iter_cell_forecasts pour les options).
+    Une cellule en erreur devient une ligne "UNKNOWN" avec la colonne error.
+    residual_store: résidus conservés (et calibrations réutilisées) d'un run à l'autre;
+    le scoring se fait alors dans le processus courant, qui détient le store.
+    """
+    score = partial(score_record, cfg=cfg, users_multiplier=users_multiplier, residual_store=residual_store)
+    if residual_store is None:
+        yield from iter_cell_forecasts(
+            df, cfg, cell_ids=cell_ids, n_workers=n_workers, chunk_size=chunk_size,
+            progress=progress, mode=mode, group_by=group_by, registry=registry, finish=score,
+        )
+        return
+
+    records = iter_cell_forecasts(
+        df, cfg, cell_ids=cell_ids, n_workers=n_workers, chunk_size=chunk_size,
+        mode=mode, group_by=group_by, registry=registry,
+    )
+    total = len(as_cell_store(df).cell_ids if cell_ids is None else cell_ids)
+    for done, rec in enumerate(records, 1):
+        row = score(rec)
+        if progress is not None:
+            progress(done, total, row)
+        yield row
+
+def finalize_risk_frame(rows: list[dict]) -> pd.DataFrame:
+    """Tri du rapport (HIGH d'abord, puis p_worst décroissant), indépendant de l'ordre d'arrivée."""
+    out = pd.DataFrame(rows)
+    if "error" in out.columns and out["error"].isna().all():
+        out = out.drop(columns=["error"])
+    out["risk_rank"] = out["risk_level"].map(RISK_ORDER).fillna(9).astype(int)
+    out = out.sort_values(["risk_rank", "p_worst", "cell_id"], ascending=[True, False, True])
+    return out.drop(columns=["risk_rank"]).reset_index(drop=True)
+
+def run_fleet_risk(
+    df: pd.DataFrame | CellStore,
+    cfg: ForecastConfig,
+    users_multiplier: float = 1.0,
+    cell_ids=None,
+    n_workers: int | None = None,
+    chunk_size: int = 4,
+    progress=None,
+    mode: str = "per_cell",
+    group_by: str | None = None,
+    registry: ModelRegistry | None = None,
+    residual_store: ResidualStore | None = None,
+) -> pd.DataFrame:
+    """Run de risque sur tout le parc, en parallèle (par défaut un worker par cœur)."""
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    rows = list(iter_risk_rows(
+        df, cfg, users_multiplier=users_multiplier, cell_ids=cell_ids,
+        n_workers=n_workers, chunk_size=chunk_size, progress=progress,
+        mode=mode, group_by=group_by, registry=registry, residual_store=residual_store,
+    ))
+    return finalize_risk_frame(rows)
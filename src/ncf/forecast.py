@@ -1,68 +1,279 @@
+from functools import partial
+
 import numpy as np
 import pandas as pd
 
-from .features import add_time_features
+from .compiled import CompiledForest, supports_compiled
+from .features import CALENDAR_FEATURES, calendar_arrays
+from .trace import get_tracer
 
 DEFAULT_LAGS = (1, 2, 24, 48, 168)
 
-def _build_feature_row(hist: pd.DataFrame, next_ts: pd.Timestamp, lags=DEFAULT_LAGS) -> pd.DataFrame:
+class LagRingBuffer:
     """
-    Construit une ligne de features pour prédire traffic_mbps à next_ts
-    à partir de l'historique (incluant traffic_mbps et users).
+    Historique glissant des max(lags) dernières heures, pour n cellules à la fois.
+    Tableaux numpy préalloués (n_cells × max_lag): avancer d'une heure = écrire
+    une colonne et déplacer la tête, sans concat ni réallocation.
     """
-    row = {"timestamp": next_ts}
 
-    # lags traffic + users
-    for l in lags:
-        row[f"lag_{l}"] = float(hist["traffic_mbps"].iloc[-l])
-        row[f"ulag_{l}"] = float(hist["users"].iloc[-l])
+    def __init__(self, traffic: np.ndarray, users: np.ndarray, last_ts: np.ndarray):
+        traffic = np.atleast_2d(np.asarray(traffic, dtype=float))
+        users = np.atleast_2d(np.asarray(users, dtype=float))
+        self.size = traffic.shape[1]
+        self.traffic = np.ascontiguousarray(traffic)
+        self.users = np.ascontiguousarray(users)
+        self.last_ts = np.asarray(last_ts, dtype="datetime64[ns]").reshape(-1)
+        self.head = 0  # prochaine colonne à écrire (= la plus ancienne valeur)
 
-    tmp = pd.DataFrame([row])
-    tmp = add_time_features(tmp)
-    return tmp
+    @property
+    def n_cells(self) -> int:
+        return self.traffic.shape[0]
 
-def forecast_xgb_autoregressive(
-    model,
-    df_cell: pd.DataFrame,
+    @classmethod
+    def from_frames(cls, df_cells: list[pd.DataFrame], lags=DEFAULT_LAGS) -> "LagRingBuffer":
+        max_lag = max(lags)
+        n = len(df_cells)
+        traffic = np.empty((n, max_lag))
+        users = np.empty((n, max_lag))
+        last_ts = np.empty(n, dtype="datetime64[ns]")
+
+        for i, df_cell in enumerate(df_cells):
+            d = df_cell if df_cell["timestamp"].is_monotonic_increasing else df_cell.sort_values("timestamp")
+            if len(d) < max_lag + 2:
+                raise ValueError(f"Not enough history for max_lag={max_lag}. Need at least {max_lag+2} rows.")
+            traffic[i] = d["traffic_mbps"].to_numpy(dtype=float)[-max_lag:]
+            users[i] = d["users"].to_numpy(dtype=float)[-max_lag:]
+            last_ts[i] = d["timestamp"].to_numpy()[-1]
+
+        return cls(traffic, users, last_ts)
+
+    def positions(self, lags) -> np.ndarray:
+        """Index de colonne de chaque lag (lag 1 = dernière valeur écrite)."""
+        return (self.head - np.asarray(lags)) % self.size
+
+    def latest_users(self) -> np.ndarray:
+        return self.users[:, (self.head - 1) % self.size]
+
+    def push(self, traffic: np.ndarray, users: np.ndarray):
+        self.traffic[:, self.head] = traffic
+        self.users[:, self.head] = users
+        self.head = (self.head + 1) % self.size
+        self.last_ts = self.last_ts + np.timedelta64(1, "h")
+
+def _feature_plan(feats: list[str], lags) -> dict:
+    """
+    Associe chaque colonne de feats à sa source: lag traffic, lag users, calendrier.
+    Les features absentes (ex: users courant) restent à 0, comme le reindex(fill_value=0)
+    du forecaster historique.
+    """
+    plan = {"lag_cols": [], "lag_l": [], "ulag_cols": [], "ulag_l": [], "cal_cols": [], "cal_names": []}
+    for j, f in enumerate(feats):
+        if f.startswith("lag_") and int(f[4:]) in lags:
+            plan["lag_cols"].append(j)
+            plan["lag_l"].append(int(f[4:]))
+        elif f.startswith("ulag_") and int(f[5:]) in lags:
+            plan["ulag_cols"].append(j)
+            plan["ulag_l"].append(int(f[5:]))
+        elif f in CALENDAR_FEATURES:
+            plan["cal_cols"].append(j)
+            plan["cal_names"].append(f)
+    return {k: np.asarray(v, dtype=np.int64) if k != "cal_names" else v for k, v in plan.items()}
+
+def _horizon_calendar(last_ts: np.ndarray, names: list[str], horizon_hours: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Features calendaires de tout l'horizon, calculées une seule fois.
+    Renvoie (cal, inverse): cal de forme (n_origines_distinctes, horizon, n_names)
+    et inverse l'origine de chaque cellule (en général une seule origine commune).
+    """
+    origins, inverse = np.unique(last_ts, return_inverse=True)
+    steps = np.arange(1, horizon_hours + 1).astype("timedelta64[h]")
+    ts = origins.reshape(-1, 1) + steps.reshape(1, -1)
+    arrays = calendar_arrays(ts)
+    cal = np.empty((len(origins), horizon_hours, len(names)))
+    for k, name in enumerate(names):
+        cal[:, :, k] = arrays[name]
+    return cal, inverse.reshape(-1)
+
+def _model_groups(models, n_cells: int, backend: str = "xgboost") -> list[tuple[object, np.ndarray | None]]:
+    """
+    Regroupe les cellules par modèle et renvoie [(predict, index des cellules)]:
+    - un modèle partagé => un seul predict par pas;
+    - des vues d'un même modèle global (attributs parent/cell_id) => un seul
+      parent.predict_cells par pas, sur toutes les cellules du groupe;
+    - un modèle par cellule => un predict par cellule (mais sur un tableau numpy).
+    backend="compiled": les boosters XGBoost à splits numériques sont aplatis une fois
+    (voir ncf.compiled) et tous les modèles par cellule sont évalués en un seul appel
+    par pas; les autres (modèle global catégoriel) gardent leur predict.
+    """
+    if backend not in ("xgboost", "compiled"):
+        raise ValueError(f"Unknown backend={backend!r} (expected 'xgboost' or 'compiled').")
+    if not isinstance(models, (list, tuple)):
+        if backend == "compiled" and supports_compiled(models):
+            return [(CompiledForest([models]).predict, None)]
+        return [(models.predict, None)]
+    if len(models) != n_cells:
+        raise ValueError(f"Expected {n_cells} models, got {len(models)}.")
+
+    groups = {}
+    for i, m in enumerate(models):
+        groups.setdefault(id(getattr(m, "parent", m)), []).append(i)
+
+    out = []
+    compiled = []
+    for idx in groups.values():
+        m = models[idx[0]]
+        rows = None if len(idx) == n_cells else np.asarray(idx)
+        parent = getattr(m, "parent", None)
+        if parent is not None:
+            cell_ids = np.asarray([models[i].cell_id for i in idx], dtype=object)
+            out.append((partial(parent.predict_cells, cell_ids=cell_ids), rows))
+        elif backend == "compiled" and len(idx) == 1 and supports_compiled(m):
+            compiled.append(idx[0])
+        else:
+            out.append((m.predict, rows))
+
+    if compiled:
+        # un seul predict par pas pour toutes les cellules à modèle propre (ligne i -> modèle i)
+        forest = CompiledForest([models[i] for i in compiled])
+        out.append((forest.predict, None if len(compiled) == n_cells else np.asarray(compiled)))
+    return out
+
+def rollout(
+    models,
+    ring: LagRingBuffer,
     feats: list[str],
     horizon_hours: int,
     lags=DEFAULT_LAGS,
-) -> pd.DataFrame:
+    backend: str = "xgboost",
+    chunk_size: int = 1024,
+) -> np.ndarray:
     """
-    Forecast auto-régressif sur horizon_hours.
+    Forecast auto-régressif vectorisé: toutes les cellules du ring avancent ensemble.
+    A chaque pas, la matrice (n_cells × n_feats) est remplie depuis le ring buffer
+    et les features calendaires précalculées, puis prédite en un appel par modèle.
+    Renvoie les prédictions (n_cells × horizon_hours).
     Hypothèse MVP: users restent constants au dernier niveau observé.
-    (on pourra ajouter un modèle users ou un scénario what-if ensuite)
+    backend: "xgboost" (model.predict) ou "compiled" (arbres aplatis, voir _model_groups).
+    Les cellules sont traitées par blocs de chunk_size: forêt compilée et tampons de
+    travail (n_cellules × n_arbres) bornés quelle que soit la taille du parc.
     """
-    d = df_cell.sort_values("timestamp").copy()
-    d["timestamp"] = pd.to_datetime(d["timestamp"])
+    n = ring.n_cells
+    if n > chunk_size:
+        return _rollout_chunks(models, ring, feats, horizon_hours, lags, backend, chunk_size)
+    plan = _feature_plan(feats, lags)
+    cal, origin = _horizon_calendar(ring.last_ts, plan["cal_names"], horizon_hours)
+    groups = _model_groups(models, n, backend=backend)
 
-    # historique minimal requis (max lag)
-    max_lag = max(lags)
-    if len(d) < max_lag + 2:
-        raise ValueError(f"Not enough history for max_lag={max_lag}. Need at least {max_lag+2} rows.")
+    # users futurs: constants (troncature entière, comme le forecaster historique)
+    future_users = np.trunc(ring.latest_users())
 
-    hist = d[["timestamp", "traffic_mbps", "users"]].tail(max_lag + 1).copy()
-    last_ts = hist["timestamp"].iloc[-1]
-    last_users = int(hist["users"].iloc[-1])
+    X = np.zeros((n, len(feats)))
+    preds = np.empty((n, horizon_hours))
 
-    preds = []
-    for step in range(1, horizon_hours + 1):
-        ts_next = last_ts + pd.Timedelta(hours=step)
+    for step in range(horizon_hours):
+        X[:, plan["lag_cols"]] = ring.traffic[:, ring.positions(plan["lag_l"])]
+        X[:, plan["ulag_cols"]] = ring.users[:, ring.positions(plan["ulag_l"])]
+        X[:, plan["cal_cols"]] = cal[origin, step, :]
 
-        xrow = _build_feature_row(hist, ts_next, lags=lags)
+        for predict, idx in groups:
+            if idx is None:
+                preds[:, step] = predict(X)
+            else:
+                preds[idx, step] = predict(X[idx])
 
-        # users future: constant MVP
-        # (on ajoute quand même les lags users via hist, et on pousse une valeur users à chaque step)
-        x = xrow.reindex(columns=feats, fill_value=0)
+        ring.push(preds[:, step], future_users)
 
-        yhat = float(model.predict(x)[0])
+    get_tracer().count("predict_calls", horizon_hours * len(groups))
+    return preds
 
-        preds.append({"timestamp": ts_next, "y_pred": yhat})
+def _rollout_chunks(models, ring: LagRingBuffer, feats, horizon_hours, lags, backend, chunk_size) -> np.ndarray:
+    n = ring.n_cells
+    shared = not isinstance(models, (list, tuple))
+    if not shared and len(models) != n:
+        raise ValueError(f"Expected {n} models, got {len(models)}.")
+    preds = np.empty((n, horizon_hours))
+    for start in range(0, n, chunk_size):
+        sl = slice(start, min(start + chunk_size, n))
+        # vues sur les lignes du ring: le ring complet avance comme en un seul rollout
+        part = LagRingBuffer(ring.traffic[sl], ring.users[sl], ring.last_ts[sl])
+        part.head = ring.head
+        preds[sl] = rollout(models if shared else models[sl], part, feats, horizon_hours, lags=lags, backend=backend, chunk_size=chunk_size)
+    ring.head = part.head
+    ring.last_ts = ring.last_ts + np.timedelta64(horizon_hours, "h")
+    return preds
 
-        # avancer l'historique: ajouter la prédiction + users constant
-        hist = pd.concat(
-            [hist, pd.DataFrame([{"timestamp": ts_next, "traffic_mbps": yhat, "users": last_users}])],
-            ignore_index=True
-        ).tail(max_lag + 1)
+def forecast_xgb_batch(
+    models,
+    df_cells: list[pd.DataFrame],
+    feats: list[str],
+    horizon_hours: int,
+    lags=DEFAULT_LAGS,
+    backend: str = "xgboost",
+    chunk_size: int = 1024,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Forecast auto-régressif de plusieurs cellules en un seul rollout (par blocs de chunk_size cellules).
+    models: un modèle partagé ou une liste alignée sur df_cells (modèles par cellule
+    ou vues GlobalCellModel d'un modèle global).
+    Renvoie (timestamps, y_pred), deux tableaux (n_cells × horizon_hours).
+    """
+    ring = LagRingBuffer.from_frames(df_cells, lags=lags)
+    steps = np.arange(1, horizon_hours + 1).astype("timedelta64[h]")
+    timestamps = ring.last_ts.reshape(-1, 1) + steps.reshape(1, -1)
+    preds = rollout(models, ring, feats, horizon_hours, lags=lags, backend=backend, chunk_size=chunk_size)
+    return timestamps, preds
+
+def horizon_slices(preds: np.ndarray, horizons_hours) -> dict[int, np.ndarray]:
+    """Vues (sans copie) des premiers h pas d'un rollout, pour chaque horizon h."""
+    return {int(h): preds[..., :int(h)] for h in horizons_hours}
+
+def forecast_xgb_batch_multi_horizon(
+    models,
+    df_cells: list[pd.DataFrame],
+    feats: list[str],
+    horizons_hours,
+    lags=DEFAULT_LAGS,
+    backend: str = "xgboost",
+) -> tuple[np.ndarray, dict[int, np.ndarray]]:
+    """
+    Un seul rollout jusqu'à l'horizon le plus long, découpé ensuite par horizon:
+    le chemin J+7 est exactement le début du chemin J+30.
+    Renvoie (timestamps, {h: y_pred (n_cells × h)}).
+    """
+    horizons_hours = sorted({int(h) for h in horizons_hours})
+    timestamps, preds = forecast_xgb_batch(models, df_cells, feats, horizons_hours[-1], lags=lags, backend=backend)
+    return timestamps, horizon_slices(preds, horizons_hours)
 
-    return pd.DataFrame(preds)
+def forecast_xgb_multi_horizon(
+    model,
+    df_cell: pd.DataFrame,
+    feats: list[str],
+    horizons_hours,
+    lags=DEFAULT_LAGS,
+    backend: str = "xgboost",
+) -> dict[int, pd.DataFrame]:
+    """
+    Forecast auto-régressif d'une cellule pour plusieurs horizons (ex: J+1/J+7/J+30),
+    au coût de l'horizon le plus long seul.
+    Renvoie {h: DataFrame(timestamp, y_pred)} avec h en heures.
+    """
+    longest = forecast_xgb_autoregressive(model, df_cell, feats, max(int(h) for h in horizons_hours), lags=lags, backend=backend)
+    return {int(h): longest.iloc[:int(h)] for h in sorted(horizons_hours)}
+
+def forecast_xgb_autoregressive(
+    model,
+    df_cell: pd.DataFrame,
+    feats: list[str],
+    horizon_hours: int,
+    lags=DEFAULT_LAGS,
+    backend: str = "xgboost",
+) -> pd.DataFrame:
+    """
+    Forecast auto-régressif sur horizon_hours.
+    Hypothèse MVP: users restent constants au dernier niveau observé.
+    (on pourra ajouter un modèle users ou un scénario what-if ensuite)
+    """
+    last_ts = df_cell["timestamp"].max()
+    _, preds = forecast_xgb_batch(model, [df_cell], feats, horizon_hours, lags=lags, backend=backend)
+    ts = last_ts + pd.to_timedelta(np.arange(1, horizon_hours + 1), unit="h")
+    return pd.DataFrame({"timestamp": ts, "y_pred": preds[0]})
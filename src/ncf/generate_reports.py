@@ -1,29 +1,20 @@
-import os
-import pandas as pd
 import plotly.express as px
 
-BASELINE = "reports/capacity_risk_horizons.csv"
-WHATIF = "reports/capacity_risk_whatif_users_1p2.csv"
-OUTDIR = "reports/figures"
+from .render import render_figures
+from .results import RESULTS_PATH
+from .rollups import rollups, scenario_rollup
 
-def load():
-    base = pd.read_csv(BASELINE)
-    wi = pd.read_csv(WHATIF)
-    return base, wi
+BASELINE = "baseline"
+WHATIF = "users_x1.2"
+OUTDIR = "reports/figures"
 
-def agg_region(df: pd.DataFrame) -> pd.DataFrame:
-    return (
-        df.groupby("region", as_index=False)
-          .agg(
-              max_risk=("p_worst", "max"),
-              mean_risk=("p_worst", "mean"),
-              high_cells=("risk_level", lambda s: int((s == "HIGH").sum())),
-              n_cells=("cell_id", "count"),
-          )
-    )
+def load(path: str = RESULTS_PATH):
+    """Agrégats par région (baseline, what-if) lus dans le store de résultats (cache des rollups)."""
+    rolls = rollups(path)
+    return scenario_rollup(rolls, BASELINE), scenario_rollup(rolls, WHATIF)
 
 def plot_baseline_risk(base):
-    agg = agg_region(base).sort_values("max_risk", ascending=False)
+    agg = base.sort_values("max_risk", ascending=False)
 
     fig = px.bar(
         agg,
@@ -36,11 +27,11 @@ def plot_baseline_risk(base):
         yaxis_title="Worst-case saturation probability",
         xaxis_title="Region"
     )
-    fig.write_html(os.path.join(OUTDIR, "baseline_risk_by_region.html"), include_plotlyjs="cdn")
+    return fig
 
 def plot_delta(base, wi):
-    b = agg_region(base).rename(columns={"max_risk": "base"})
-    w = agg_region(wi).rename(columns={"max_risk": "whatif"})
+    b = base.rename(columns={"max_risk": "base"})
+    w = wi.rename(columns={"max_risk": "whatif"})
 
     m = b.merge(w, on="region", suffixes=("_base", "_wi"))
     m["delta"] = m["whatif"] - m["base"]
@@ -57,11 +48,11 @@ def plot_delta(base, wi):
         yaxis_title="Δ saturation probability",
         xaxis_title="Region"
     )
-    fig.write_html(os.path.join(OUTDIR, "delta_risk_by_region.html"), include_plotlyjs="cdn")
+    return fig
 
 def plot_heatmap(base, wi):
-    b = agg_region(base).rename(columns={"max_risk": "baseline"})
-    w = agg_region(wi).rename(columns={"max_risk": "what_if"})
+    b = base.rename(columns={"max_risk": "baseline"})
+    w = wi.rename(columns={"max_risk": "what_if"})
 
     m = b.merge(w, on="region")
     heat = m.set_index("region")[["baseline", "what_if"]]
@@ -72,20 +63,23 @@ def plot_heatmap(base, wi):
         aspect="auto",
         text_auto=".2f"
     )
-    fig.write_html(os.path.join(OUTDIR, "risk_comparison_heatmap.html"), include_plotlyjs="cdn")
+    return fig
+
+def figures(base, wi) -> dict:
+    """Figures du rapport (nom de fichier sans extension -> figure), partagées HTML / PDF."""
+    return {
+        "baseline_risk_by_region": plot_baseline_risk(base),
+        "delta_risk_by_region": plot_delta(base, wi),
+        "risk_comparison_heatmap": plot_heatmap(base, wi),
+    }
 
 def main():
-    os.makedirs(OUTDIR, exist_ok=True)
     base, wi = load()
+    out = render_figures(figures(base, wi), OUTDIR, fmt="html")
 
-    plot_baseline_risk(base)
-    plot_delta(base, wi)
-    plot_heatmap(base, wi)
-
-    print("OK ✅ Professional reports generated in reports/figures/")
-    print("- baseline_risk_by_region.html")
-    print("- delta_risk_by_region.html")
-    print("- risk_comparison_heatmap.html")
+    print(f"OK ✅ Professional reports generated in {OUTDIR}/ ({len(out['rendered'])} rendered, {len(out['skipped'])} unchanged)")
+    for path in out["rendered"] + out["skipped"]:
+        print(f"- {path}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .config import ForecastConfig
+from .risk import calibrate_residuals_batch, pad_residuals, risk_level, window_risk_from_cdf
+from .scenarios import Scenario, _round, _scenario_arrays
+from .trace import get_tracer
+
+# maille -> clés de regroupement des cellules
+GRAINS = {
+    "network": (),
+    "region": ("region",),
+    "zone_type": ("zone_type",),
+    "region_zone": ("region", "zone_type"),
+}
+# colonnes de hierarchy_risk
+HIERARCHY_COLUMNS = (
+    "scenario", "grain", "group", "n_cells", "capacity_mbps", "max_pred_j7_mbps", "max_pred_j30_mbps",
+    "p_saturation_j7", "p_saturation_j30", "risk_level", "p_worst", "exp_exceedance_hours_j30",
+)
+
+def summation_matrix(labels: np.ndarray) -> tuple[sparse.csr_matrix, np.ndarray]:
+    """
+    Matrice de sommation creuse S (n_groupes × n_cellules), S[g, c] = 1 si la cellule c est
+    dans le groupe g: S @ Y agrège les séries horaires des cellules par groupe.
+    Renvoie (S, noms des groupes triés).
+    """
+    names, codes = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+    n = len(codes)
+    S = sparse.csr_matrix((np.ones(n), (codes, np.arange(n))), shape=(len(names), n))
+    return S, names
+
+def group_labels(regions: np.ndarray, zones: np.ndarray, grain: str) -> np.ndarray:
+    """Libellé du groupe de chaque cellule pour une maille de GRAINS (ex: "IDF/urban")."""
+    cols = {"region": np.asarray(regions, dtype=str), "zone_type": np.asarray(zones, dtype=str)}
+    keys = GRAINS[grain]
+    if not keys:
+        return np.full(len(regions), "all")
+    out = cols[keys[0]]
+    for k in keys[1:]:
+        out = np.char.add(np.char.add(out, "/"), cols[k])
+    return out
+
+def aggregate_residual_cdf(calibrated: np.ndarray, S: sparse.csr_matrix, bins: int = 4096, chunk_size: int = 256, n_sigma: float = 12.0):
+    """
+    Loi de la somme des erreurs des cellules de chaque groupe (erreurs indépendantes entre
+    cellules, tirées de leurs résidus calibrés), sans tirer de chemins: la loi empirique de
+    chaque cellule est discrétisée sur une grille de pas commun dx, puis les lois d'un groupe
+    sont convoluées par produit de leurs transformées de Fourier (une passe par paquet de
+    cellules). La moyenne de la grille est recalée sur la somme exacte des moyennes.
+    dx est tiré de l'écart-type agrégé (sqrt de la somme des variances): bins pas sur ±4 σ,
+    quelle que soit la taille du groupe. Quand le support complet (somme des étendues) dépasse
+    ±n_sigma σ, les lois sont centrées sur leur moyenne et la convolution est circulaire sur
+    cette fenêtre (masse hors fenêtre négligeable): n_fft ne croît pas avec le nombre de cellules.
+    calibrated: lignes calibrées triées (n_cellules × R, NaN en fin), ex: calibrate_residuals_batch.
+    Renvoie une liste (par groupe) de (x, cdf): cdf[j] = P(erreur agrégée <= x[j]), ou None
+    si aucune cellule du groupe n'a de résidus.
+    """
+    cal = np.asarray(calibrated, dtype=float)
+    counts = (~np.isnan(cal)).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lo, hi = np.nanmin(cal, axis=1, initial=np.inf), np.nanmax(cal, axis=1, initial=-np.inf)
+        mean = np.nansum(cal, axis=1) / counts
+        var = np.nansum((cal - mean[:, None]) ** 2, axis=1) / counts
+
+    out = []
+    for g in range(S.shape[0]):
+        members = S.indices[S.indptr[g]:S.indptr[g + 1]]
+        members = members[counts[members] > 0]
+        if members.size == 0:
+            out.append(None)
+            continue
+        span = float((hi[members] - lo[members]).sum())
+        std = float(np.sqrt(var[members].sum()))
+        dx = 8.0 * std / bins if std > 0 else (span / bins if span > 0 else 1.0)
+        width = np.rint((hi[members] - lo[members]) / dx).astype(np.int64) + 1
+        n_support = int(width.sum() - members.size + 1)
+        window = 2 * int(np.ceil(n_sigma * std / dx)) + 1
+        centered = n_support > window
+        n_fft = 1 << int(np.ceil(np.log2(max(window if centered else n_support, 2))))
+        base = np.rint(mean / dx) * dx if centered else lo
+        step = max(1, min(chunk_size, (1 << 22) // n_fft))  # paquet borné à ~4M points
+
+        spectrum = np.ones(n_fft // 2 + 1, dtype=complex)
+        for start in range(0, members.size, step):
+            block = members[start:start + step]
+            c = counts[block]
+            rows = np.repeat(np.arange(block.size), c)
+            vals = cal[block][np.arange(cal.shape[1])[None, :] < c[:, None]]
+            k = np.rint((vals - np.repeat(base[block], c)) / dx).astype(np.int64) % n_fft
+            pmf = np.bincount(rows * n_fft + k, weights=np.repeat(1.0 / c, c), minlength=block.size * n_fft)
+            spectrum *= np.fft.rfft(pmf.reshape(block.size, n_fft), axis=1).prod(axis=0)
+
+        pmf = np.clip(np.fft.irfft(spectrum, n_fft), 0.0, None)
+        if centered:
+            # indices circulaires: [0, n_fft/2) positifs, [n_fft/2, n_fft) négatifs
+            pmf = np.roll(pmf, n_fft // 2)
+            x = base[members].sum() + dx * (np.arange(n_fft) - n_fft // 2)
+        else:
+            pmf = pmf[:n_support]
+            x = lo[members].sum() + dx * np.arange(n_support)
+        pmf /= pmf.sum()
+        x += mean[members].sum() - float(pmf @ x)
+        out.append((x, np.cumsum(pmf)))
+    return out
+
+def _cdf_at(dist, z: np.ndarray) -> np.ndarray:
+    """P(erreur agrégée <= z) (fonction en escalier, comme la CDF empirique des cellules)."""
+    x, cdf = dist
+    i = np.searchsorted(x, z, side="right") - 1
+    return np.where(i >= 0, cdf[np.clip(i, 0, None)], 0.0)
+
+def aggregate_capacities(
+    cfg: ForecastConfig,
+    names: np.ndarray,
+    S: sparse.csr_matrix,
+    cell_thresholds: np.ndarray,
+    threshold_multiplier: float = 1.0,
+) -> np.ndarray:
+    """
+    Capacité agrégée de chaque groupe: cfg.aggregate_capacity_mbps[nom] (× threshold_multiplier
+    du scénario) si fournie, sinon cfg.aggregate_capacity_factor × somme des seuils de saturation
+    de ses cellules (le backhaul est mutualisé: toutes les cellules ne sont pas au seuil en même temps).
+    """
+    default = cfg.aggregate_capacity_factor * (S @ np.asarray(cell_thresholds, dtype=float))
+    given = cfg.aggregate_capacity_mbps or {}
+    return np.array([float(given[n]) * threshold_multiplier if n in given else d for n, d in zip(names, default)])
+
+def hierarchy_risk(
+    records: list[dict],
+    cfg: ForecastConfig,
+    scenarios=None,
+    grains=tuple(GRAINS),
+    calibrated=None,
+    bins: int = 4096,
+) -> pd.DataFrame:
+    """
+    Risque de saturation agrégé (réseau, région, zone, région × zone), en une passe par maille:
+    - forecasts J+30 des cellules sommés par groupe (S @ Y, S creuse), par scénario;
+    - incertitude: loi de la somme des résidus calibrés des cellules (aggregate_residual_cdf),
+      calculée une fois par groupe et partagée par tous les scénarios;
+    - p_saturation = P(max_t charge agrégée_t > capacité agrégée), heures indépendantes
+      (même hypothèse que le noyau cellule).
+    records: enregistrements de iter_cell_forecasts (les cellules en erreur sont ignorées).
+    calibrated: résidus déjà calibrés, alignés sur les enregistrements sans erreur.
+    Renvoie une table longue, une ligne par (scenario, grain, group) (vide si toutes les
+    cellules sont en erreur).
+    """
+    scenarios = scenarios or [Scenario("baseline")]
+    H7 = cfg.horizon_days_short * 24
+    H30 = cfg.horizon_days_long * 24
+    ok = [r for r in records if "error" not in r]
+    if not ok:
+        return pd.DataFrame(columns=list(HIERARCHY_COLUMNS))
+    regions = np.array([str(r["region"]) for r in ok], dtype=object)
+    zones = np.array([str(r["zone_type"]) for r in ok], dtype=object)
+    Y = np.array([np.asarray(r["y_pred"], dtype=float)[:H30] for r in ok]).reshape(len(ok), -1)
+    if calibrated is None:
+        calibrated = calibrate_residuals_batch([r["residuals"] for r in ok])
+    elif not (isinstance(calibrated, np.ndarray) and calibrated.ndim == 2):
+        calibrated = pad_residuals(calibrated)
+    params = [_scenario_arrays(sc, cfg, regions, zones) for sc in scenarios]
+    horizons = np.array(sorted({min(H7, Y.shape[1]), Y.shape[1]})) - 1
+
+    frames = []
+    tracer = get_tracer()
+    for grain in grains:
+        S, names = summation_matrix(group_labels(regions, zones, grain))
+        n_cells = np.diff(S.indptr)
+        with tracer.span("aggregation"):
+            dists = aggregate_residual_cdf(calibrated, S, bins=bins)
+
+        for sc, (mult, thr) in zip(scenarios, params):
+            load = S @ (mult[:, None] * Y)
+            capacity = aggregate_capacities(cfg, names, S, thr, sc.threshold_multiplier)
+            F = np.full(load.shape, np.nan)
+            for g, dist in enumerate(dists):
+                if dist is not None:
+                    F[g] = _cdf_at(dist, capacity[g] - load[g])
+            risk = window_risk_from_cdf(F, horizons)
+            p7, p30 = risk["p_saturation"][:, 0], risk["p_saturation"][:, -1]
+            worst = np.fmax(p7, p30)
+
+            frames.append(pd.DataFrame({
+                "scenario": sc.name,
+                "grain": grain,
+                "group": names,
+                "n_cells": n_cells,
+                "capacity_mbps": _round(capacity, 1),
+                "max_pred_j7_mbps": _round(load[:, :H7].max(axis=1, initial=-np.inf), 2),
+                "max_pred_j30_mbps": _round(load.max(axis=1, initial=-np.inf), 2),
+                "p_saturation_j7": _round(p7, 4),
+                "p_saturation_j30": _round(p30, 4),
+                "risk_level": [risk_level(p) for p in worst],
+                "p_worst": _round(worst, 4),
+                "exp_exceedance_hours_j30": _round(risk["expected_exceedance_hours"][:, -1], 2),
+            }))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .cellstore import CellStore
+from .features import CATEGORY_COLUMNS, compact_schema
+
+DATASET_DIR = "data/processed/network_capacity"
+PARTITION_COLS = ("region", "month")
+
+# colonnes utilisées par les modèles (event_flag est une feature des modèles par cellule)
+MODEL_COLUMNS = ("timestamp", "cell_id", "region", "zone_type", "event_flag", "users", "traffic_mbps")
+
+def write_cell_frames(df: pd.DataFrame, root: str, partition_cols=PARTITION_COLS, basename: str = "part") -> None:
+    """
+    Ajoute un frame horaire (cell_id, timestamp, ...) à un dataset Parquet partitionné hive
+    (ex: region=IDF/month=2025-03/). Les catégories sont écrites en chaînes: le schéma reste
+    identique d'un paquet à l'autre. Noms de fichiers déterministes (basename-{i}.parquet).
+    """
+    df = df.copy(deep=False)
+    if "month" in partition_cols and "month" not in df.columns:
+        df["month"] = df["timestamp"].dt.strftime("%Y-%m")
+    for c in CATEGORY_COLUMNS:
+        if c in df.columns and isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype(str)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        root_path=root,
+        partition_cols=list(partition_cols),
+        basename_template=basename + "-{i}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+def open_dataset(root: str = DATASET_DIR) -> ds.Dataset:
+    return ds.dataset(root, format="parquet", partitioning="hive")
+
+def _filter(dataset: ds.Dataset, cell_ids=None, start=None, end=None):
+    """
+    Filtre poussé au scan: cellules (isin) et fenêtre [start, end).
+    Si le dataset est partitionné par mois, la fenêtre élague aussi les dossiers month=....
+    """
+    names = dataset.schema.names
+    expr = None
+
+    def _and(e):
+        return e if expr is None else expr & e
+
+    if cell_ids is not None:
+        expr = _and(pc.field("cell_id").isin(pa.array([str(c) for c in cell_ids], type=pa.string())))
+
+    ts_type = dataset.schema.field("timestamp").type
+    if start is not None:
+        start = pd.Timestamp(start)
+        expr = _and(pc.field("timestamp") >= pa.scalar(start.to_datetime64(), type=ts_type))
+        if "month" in names:
+            expr = _and(pc.field("month") >= start.strftime("%Y-%m"))
+    if end is not None:
+        end = pd.Timestamp(end)
+        expr = _and(pc.field("timestamp") < pa.scalar(end.to_datetime64(), type=ts_type))
+        if "month" in names:
+            expr = _and(pc.field("month") <= end.strftime("%Y-%m"))
+    return expr
+
+def _to_frame(table: pa.Table) -> pd.DataFrame:
+    # chaînes converties en category par Arrow (pas de colonnes str intermédiaires), buffers
+    # Arrow libérés au fil de la conversion: table n'est plus utilisable ensuite
+    df = table.to_pandas(strings_to_categorical=True, split_blocks=True, self_destruct=True)
+    return compact_schema(df)
+
+def list_cells(root: str = DATASET_DIR, dataset: ds.Dataset | None = None) -> list[str]:
+    """cell_id présents dans le dataset, triés (scan de la seule colonne cell_id)."""
+    dataset = dataset or open_dataset(root)
+    if dataset.partitioning is not None and "cell_id" in dataset.partitioning.schema.names:
+        # partitionné par cellule: les valeurs sont dans les chemins, aucun fichier lu
+        values = {
+            str(v)
+            for frag in dataset.get_fragments()
+            for k, v in ds.get_partition_keys(frag.partition_expression).items()
+            if k == "cell_id"
+        }
+        return sorted(values)
+    col = dataset.to_table(columns=["cell_id"]).column("cell_id")
+    return sorted(str(c) for c in pc.unique(col).to_pylist())
+
+def read_cells(
+    root: str = DATASET_DIR,
+    cell_ids=None,
+    start=None,
+    end=None,
+    columns=MODEL_COLUMNS,
+    dataset: ds.Dataset | None = None,
+) -> pd.DataFrame:
+    """
+    Lit uniquement les colonnes demandées, pour les cellules et la fenêtre [start, end)
+    demandées (filtres poussés au scan: partitions et statistiques de row groups).
+    """
+    dataset = dataset or open_dataset(root)
+    columns = [c for c in columns if c in dataset.schema.names]
+    table = dataset.to_table(columns=columns, filter=_filter(dataset, cell_ids, start, end))
+    return _to_frame(table)
+
+def iter_cell_batches(
+    root: str = DATASET_DIR,
+    cell_ids=None,
+    start=None,
+    end=None,
+    columns=MODEL_COLUMNS,
+    batch_cells: int = 64,
+):
+    """
+    Parcourt le dataset par paquets de batch_cells cellules, chaque paquet étant un CellStore
+    (mémoire bornée à batch_cells × heures, quelle que soit la taille du parc).
+    """
+    dataset = open_dataset(root)
+    if cell_ids is None:
+        cell_ids = list_cells(dataset=dataset)
+    cell_ids = list(cell_ids)
+    for i in range(0, len(cell_ids), batch_cells):
+        batch = cell_ids[i:i + batch_cells]
+        df = read_cells(cell_ids=batch, start=start, end=end, columns=columns, dataset=dataset)
+        if len(df):
+            yield CellStore(df)
@@ -3,49 +3,202 @@ import pandas as pd
 from xgboost import XGBRegressor
 from sklearn.metrics import mean_absolute_error
 
-from .features import add_time_features
+from .features import CALENDAR_FEATURES, LABEL_COLUMNS, add_time_features
+from .cellstore import as_cell_store, cell_frame
+
+XGB_PARAMS = dict(
+    n_estimators=600,
+    learning_rate=0.05,
+    max_depth=6,
+    subsample=0.9,
+    colsample_bytree=0.9,
+    random_state=42,
+    n_jobs=0,
+)
+
+# les labels de saturation ne sont pas des features: changer un seuil ne réentraîne pas
+NON_FEATURES = ["timestamp", "cell_id", "region", "zone_type", "traffic_mbps", *LABEL_COLUMNS]
+GLOBAL_CATEGORICALS = ("cell_id", "zone_type", "region")
 
 def make_supervised(df_cell: pd.DataFrame, lags=(1,2,24,48,168)) -> pd.DataFrame:
-    df = df_cell.sort_values("timestamp").copy()
+    """
+    Frame supervisé d'une cellule: lags traffic / users (float32) et calendrier (int8) ajoutés
+    en une fois à une copie superficielle (les colonnes d'entrée ne sont pas recopiées).
+    """
+    df = df_cell if df_cell["timestamp"].is_monotonic_increasing else df_cell.sort_values("timestamp")
+    traffic = df["traffic_mbps"].astype(np.float32)
+    users = df["users"].astype(np.float32)
+    lagged = {}
     for l in lags:
-        df[f"lag_{l}"] = df["traffic_mbps"].shift(l)
-        df[f"ulag_{l}"] = df["users"].shift(l)
-    df = add_time_features(df)
-    df = df.dropna()
-    return df
+        lagged[f"lag_{l}"] = traffic.shift(l)
+        lagged[f"ulag_{l}"] = users.shift(l)
+    df = add_time_features(df.assign(**lagged))
+    return df.dropna()
 
-def train_xgb_forecast(df: pd.DataFrame, cell_id: str, train_end: str):
+def split_supervised(df: pd.DataFrame, cell_id: str, train_end: str, lags=(1,2,24,48,168)):
     """
-    Entraîne un XGBRegressor sur une cellule.
-    Renvoie: model, feats, mae, valid_df (timestamp + y_true + y_pred)
+    Frame supervisé d'une cellule, coupé à train_end.
+    Renvoie: train, valid, feats
     """
-    d = df[df["cell_id"] == cell_id].copy()
-    d = make_supervised(d)
+    d = make_supervised(cell_frame(df, cell_id), lags=lags)
 
     train_end = pd.to_datetime(train_end)
     train = d[d["timestamp"] < train_end]
     valid = d[d["timestamp"] >= train_end]
 
-    feats = [c for c in train.columns if c not in ["timestamp","cell_id","region","zone_type","traffic_mbps"]]
-    Xtr, ytr = train[feats], train["traffic_mbps"]
-    Xva, yva = valid[feats], valid["traffic_mbps"]
-
-    model = XGBRegressor(
-        n_estimators=600,
-        learning_rate=0.05,
-        max_depth=6,
-        subsample=0.9,
-        colsample_bytree=0.9,
-        random_state=42,
-        n_jobs=0
-    )
-    model.fit(Xtr, ytr)
-
-    pred = model.predict(Xva)
+    feats = [c for c in train.columns if c not in NON_FEATURES]
+    return train, valid, feats
+
+def validate_model(model, valid: pd.DataFrame, feats: list[str]):
+    """Renvoie: mae, valid_df (timestamp + y_true + y_pred)"""
+    yva = valid["traffic_mbps"]
+    pred = model.predict(valid[feats])
     mae = mean_absolute_error(yva, pred)
 
-    valid_out = valid[["timestamp"]].copy()
-    valid_out["y_true"] = yva.values
-    valid_out["y_pred"] = pred
+    valid_out = valid[["timestamp"]].assign(y_true=yva.values, y_pred=pred)
+    return mae, valid_out
+
+def train_xgb_forecast(df: pd.DataFrame, cell_id: str, train_end: str, params: dict | None = None):
+    """
+    Entraîne un XGBRegressor sur une cellule.
+    df: DataFrame multi-cellules ou CellStore (accès direct à la cellule).
+    params: surcharge de XGB_PARAMS (ex: n_estimators / max_depth choisis par ncf.tuning).
+    Renvoie: model, feats, mae, valid_df (timestamp + y_true + y_pred)
+    """
+    train, valid, feats = split_supervised(df, cell_id, train_end)
+
+    model = XGBRegressor(**dict(XGB_PARAMS, **(params or {})))
+    model.fit(train[feats], train["traffic_mbps"])
 
+    mae, valid_out = validate_model(model, valid, feats)
     return model, feats, mae, valid_out
+
+class GlobalCellModel:
+    """
+    Vue d'un GlobalXGBModel pour une cellule: même interface predict(X) qu'un
+    XGBRegressor par cellule. Le forecaster regroupe les vues d'un même parent
+    pour faire un seul predict par pas sur toutes les cellules.
+    """
+
+    def __init__(self, parent: "GlobalXGBModel", cell_id: str):
+        self.parent = parent
+        self.cell_id = cell_id
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        return self.parent.predict_cells(X, np.full(len(X), self.cell_id, dtype=object))
+
+class GlobalXGBModel:
+    """
+    Un XGBRegressor entraîné sur les frames supervisées empilées de plusieurs cellules.
+    - features numériques normalisées par cellule (lags traffic / moyenne traffic,
+      lags users / moyenne users, sur la période d'entraînement), cible idem;
+    - cell_id / zone_type / region en features catégorielles natives XGBoost.
+    """
+
+    def __init__(self, model: XGBRegressor, feats: list[str], scales: pd.DataFrame, categories: dict):
+        self.model = model
+        self.feats = feats
+        self.scales = scales  # index cell_id: traffic_scale, users_scale, zone_type, region
+        self.categories = categories
+
+    @property
+    def cell_ids(self) -> list[str]:
+        return list(self.scales.index)
+
+    def for_cell(self, cell_id: str) -> GlobalCellModel:
+        return GlobalCellModel(self, cell_id)
+
+    def _design(self, X: np.ndarray, cell_ids) -> tuple[pd.DataFrame, np.ndarray]:
+        sc = self.scales.loc[np.asarray(cell_ids)]
+        t_scale = sc["traffic_scale"].to_numpy()
+        u_scale = sc["users_scale"].to_numpy()
+
+        design = {}
+        for j, f in enumerate(self.feats):
+            col = X[:, j]
+            if f.startswith("lag_"):
+                col = col / t_scale
+            elif f.startswith("ulag_"):
+                col = col / u_scale
+            design[f] = col
+        design["cell_id"] = np.asarray(cell_ids)
+        design["zone_type"] = sc["zone_type"].to_numpy()
+        design["region"] = sc["region"].to_numpy()
+
+        out = pd.DataFrame(design)
+        for c in GLOBAL_CATEGORICALS:
+            out[c] = pd.Categorical(out[c], categories=self.categories[c])
+        return out, t_scale
+
+    def predict_cells(self, X: np.ndarray, cell_ids) -> np.ndarray:
+        """Prédit traffic_mbps pour des lignes X (ordre self.feats) de cellules quelconques."""
+        design, t_scale = self._design(np.asarray(X, dtype=float), cell_ids)
+        return self.model.predict(design) * t_scale
+
+def global_feats(lags=(1,2,24,48,168)) -> list[str]:
+    """Features du modèle global: lags traffic/users + calendrier (pas de users courant)."""
+    return [f"{p}_{l}" for l in lags for p in ("lag", "ulag")] + list(CALENDAR_FEATURES)
+
+def _fit_global(sup: pd.DataFrame, feats: list[str], train_end: pd.Timestamp, params: dict) -> tuple[GlobalXGBModel, pd.DataFrame]:
+    train_mask = (sup["timestamp"] < train_end).to_numpy()
+
+    cells = sup.loc[train_mask].groupby("cell_id", observed=True)
+    scales = pd.DataFrame({
+        "traffic_scale": cells["traffic_mbps"].mean(),
+        "users_scale": cells["users"].mean(),
+        "zone_type": cells["zone_type"].first(),
+        "region": cells["region"].first(),
+    })
+    scales[["traffic_scale", "users_scale"]] = scales[["traffic_scale", "users_scale"]].clip(lower=1e-6)
+    categories = {c: sorted(sup[c].astype(str).unique()) for c in GLOBAL_CATEGORICALS}
+
+    model = GlobalXGBModel(None, feats, scales, categories)
+    cell_ids = sup["cell_id"].astype(str).to_numpy()
+    X = sup[feats].to_numpy(dtype=float)
+    design, t_scale = model._design(X, cell_ids)
+    y = sup["traffic_mbps"].to_numpy(dtype=float) / t_scale
+
+    xgb = XGBRegressor(**params, tree_method="hist", enable_categorical=True)
+    xgb.fit(design[train_mask], y[train_mask])
+    model.model = xgb
+
+    valid = ~train_mask
+    valid_out = sup.loc[valid, ["cell_id", "timestamp", "traffic_mbps"]].rename(columns={"traffic_mbps": "y_true"})
+    valid_out["y_pred"] = xgb.predict(design[valid]) * t_scale[valid]
+    return model, valid_out
+
+def train_xgb_global(
+    df,
+    train_end: str,
+    cell_ids=None,
+    group_by: str | None = None,
+    lags=(1,2,24,48,168),
+    params: dict | None = None,
+):
+    """
+    Mode "global": un modèle partagé par toutes les cellules (ou un par zone_type/region
+    avec group_by), au lieu d'un XGBRegressor par cellule.
+    df: DataFrame multi-cellules ou CellStore.
+    Renvoie: models ({cell_id: GlobalCellModel}), feats, maes ({cell_id: mae}),
+    valid_outs ({cell_id: valid_df}) — mêmes objets que train_xgb_forecast, par cellule.
+    """
+    store = as_cell_store(df)
+    if cell_ids is None:
+        cell_ids = store.cell_ids
+    params = dict(XGB_PARAMS, **(params or {}))
+    feats = global_feats(lags)
+    train_end = pd.to_datetime(train_end)
+
+    sup = pd.concat([make_supervised(store.frame(c), lags=lags) for c in cell_ids], ignore_index=True)
+    sup = sup.dropna(subset=feats)
+    groups = [(None, sup)] if group_by is None else sup.groupby(group_by, observed=True)
+
+    models, maes, valid_outs = {}, {}, {}
+    for _, g in groups:
+        model, valid_out = _fit_global(g, feats, train_end, params)
+        for cell_id, v in valid_out.groupby("cell_id", observed=True):
+            models[cell_id] = model.for_cell(cell_id)
+            maes[cell_id] = mean_absolute_error(v["y_true"], v["y_pred"])
+            valid_outs[cell_id] = v[["timestamp", "y_true", "y_pred"]].reset_index(drop=True)
+    return models, feats, maes, valid_outs
@@ -0,0 +1,195 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from .cellstore import as_cell_store
+from .features import calendar_arrays
+from .forecast import DEFAULT_LAGS, LagRingBuffer, _feature_plan, rollout
+
+ONE_HOUR = np.timedelta64(1, "h")
+
+class OnlineFeatureStore:
+    """
+    Etat courant des features de lag, par cellule, pour le re-forecast horaire.
+    Seules les max(lags) dernières heures sont gardées, dans des tableaux
+    (n_cells × max_lag) avec une tête par cellule: ajouter une heure écrit une
+    colonne (O(1)), servir une ligne de features lit len(lags) colonnes (O(lags)).
+    L'historique complet n'est lu qu'une fois, à la construction.
+    """
+
+    def __init__(self, cell_ids, traffic: np.ndarray, users: np.ndarray, last_ts: np.ndarray, lags=DEFAULT_LAGS):
+        self.lags = tuple(lags)
+        self.size = max(self.lags)
+        self.cell_ids = [str(c) for c in cell_ids]
+        self._index = {c: i for i, c in enumerate(self.cell_ids)}
+        self.traffic = np.array(traffic, dtype=float).reshape(len(self.cell_ids), self.size)
+        self.users = np.array(users, dtype=float).reshape(len(self.cell_ids), self.size)
+        self.last_ts = np.asarray(last_ts, dtype="datetime64[ns]").reshape(-1).copy()
+        self.head = np.zeros(len(self.cell_ids), dtype=np.int64)  # colonne la plus ancienne
+
+    def __len__(self) -> int:
+        return len(self.cell_ids)
+
+    def __contains__(self, cell_id) -> bool:
+        return cell_id in self._index
+
+    @classmethod
+    def from_history(cls, source, cell_ids=None, lags=DEFAULT_LAGS) -> "OnlineFeatureStore":
+        """Amorçage depuis l'historique (DataFrame ou CellStore): max(lags) dernières heures."""
+        store = as_cell_store(source)
+        cell_ids = store.cell_ids if cell_ids is None else [str(c) for c in cell_ids]
+        ring = LagRingBuffer.from_frames(store.frames(cell_ids), lags=lags)
+        return cls(cell_ids, ring.traffic, ring.users, ring.last_ts, lags=lags)
+
+    def rows(self, cell_ids=None) -> np.ndarray:
+        if cell_ids is None:
+            return np.arange(len(self.cell_ids))
+        return np.array([self._index[str(c)] for c in cell_ids], dtype=np.int64)
+
+    def _write(self, rows: np.ndarray, traffic: np.ndarray, users: np.ndarray):
+        self.traffic[rows, self.head[rows]] = traffic
+        self.users[rows, self.head[rows]] = users
+        self.head[rows] = (self.head[rows] + 1) % self.size
+        self.last_ts[rows] += ONE_HOUR
+
+    def append(self, timestamp, cell_ids, traffic, users) -> int:
+        """
+        Ajoute les compteurs d'une heure (timestamp) pour un ensemble de cellules.
+        - heure déjà vue (replay du flux) => ignorée;
+        - trou dans le flux => heures manquantes remplies par la dernière valeur connue.
+        Renvoie le nombre de cellules mises à jour.
+        """
+        ts = np.datetime64(pd.Timestamp(timestamp).to_datetime64(), "ns")
+        rows = self.rows(np.atleast_1d(cell_ids))
+        traffic = np.broadcast_to(np.asarray(traffic, dtype=float), rows.shape)
+        users = np.broadcast_to(np.asarray(users, dtype=float), rows.shape)
+
+        fresh = self.last_ts[rows] < ts
+        rows, traffic, users = rows[fresh], traffic[fresh], users[fresh]
+
+        # trous: on avance heure par heure (au plus max_lag fois, au-delà le ring est réécrit)
+        gap = ((ts - self.last_ts[rows]) // ONE_HOUR).astype(np.int64) - 1
+        for k in range(min(int(gap.max(initial=0)), self.size)):
+            g = rows[gap > k]
+            last = (self.head[g] - 1) % self.size
+            self._write(g, self.traffic[g, last], self.users[g, last])
+        # (trous > max_lag: les heures restantes ne changent plus le contenu du ring)
+        self.last_ts[rows] = ts - ONE_HOUR
+
+        self._write(rows, traffic, users)
+        return len(rows)
+
+    def consume(self, batch: pd.DataFrame) -> int:
+        """Ajoute un lot de compteurs (timestamp, cell_id, traffic_mbps, users), heure par heure."""
+        batch = batch[batch["cell_id"].astype(str).isin(self._index)]
+        n = 0
+        for ts, g in batch.sort_values("timestamp").groupby("timestamp", sort=True):
+            n += self.append(ts, g["cell_id"].astype(str).to_numpy(), g["traffic_mbps"].to_numpy(), g["users"].to_numpy())
+        return n
+
+    def ring(self, cell_ids=None) -> LagRingBuffer:
+        """
+        Graine du rollout (copie réalignée, plus ancienne heure en premier): le forecast
+        n'avance pas l'état du store.
+        """
+        rows = self.rows(cell_ids)
+        order = (self.head[rows, None] + np.arange(self.size)) % self.size
+        return LagRingBuffer(
+            np.take_along_axis(self.traffic[rows], order, axis=1),
+            np.take_along_axis(self.users[rows], order, axis=1),
+            self.last_ts[rows],
+        )
+
+    def feature_rows(self, feats: list[str], cell_ids=None) -> pd.DataFrame:
+        """
+        Ligne de features de l'heure suivante (last_ts + 1h) pour chaque cellule,
+        même remplissage que le premier pas du rollout (features absentes à 0).
+        """
+        rows = self.rows(cell_ids)
+        plan = _feature_plan(feats, self.lags)
+        X = np.zeros((len(rows), len(feats)))
+        for cols, l, src in ((plan["lag_cols"], plan["lag_l"], self.traffic), (plan["ulag_cols"], plan["ulag_l"], self.users)):
+            pos = (self.head[rows, None] - l[None, :]) % self.size
+            X[:, cols] = np.take_along_axis(src[rows], pos, axis=1)
+        cal = calendar_arrays(self.last_ts[rows] + ONE_HOUR)
+        for j, name in zip(plan["cal_cols"], plan["cal_names"]):
+            X[:, j] = cal[name]
+        return pd.DataFrame(X, columns=feats, index=[self.cell_ids[i] for i in rows])
+
+    def forecast(self, models, feats: list[str], horizon_hours: int, cell_ids=None, backend: str = "xgboost") -> tuple[np.ndarray, np.ndarray]:
+        """
+        Re-forecast depuis l'état courant, sans relire l'historique.
+        Renvoie (timestamps, y_pred), deux tableaux (n_cells × horizon_hours).
+        """
+        ring = self.ring(cell_ids)
+        steps = np.arange(1, horizon_hours + 1).astype("timedelta64[h]")
+        timestamps = ring.last_ts.reshape(-1, 1) + steps.reshape(1, -1)
+        return timestamps, rollout(models, ring, feats, horizon_hours, lags=self.lags, backend=backend)
+
+    def save(self, path: str):
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            cell_ids=np.asarray(self.cell_ids),
+            lags=np.asarray(self.lags),
+            traffic=self.traffic, users=self.users,
+            last_ts=self.last_ts, head=self.head,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "OnlineFeatureStore":
+        with np.load(path) as z:
+            out = cls(z["cell_ids"].tolist(), z["traffic"], z["users"], z["last_ts"], lags=z["lags"].tolist())
+            out.head = z["head"].copy()
+        return out
+
+class CsvFeed:
+    """
+    Stand-in local du flux OSS: fichier CSV en ajout seul (timestamp, cell_id, users, traffic_mbps).
+    poll() renvoie les lignes écrites depuis le dernier appel (suivi de l'offset en octets).
+    """
+
+    COLUMNS = ["timestamp", "cell_id", "users", "traffic_mbps"]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+
+    def publish(self, rows: pd.DataFrame):
+        header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        rows[self.COLUMNS].to_csv(self.path, mode="a", header=header, index=False)
+
+    def poll(self) -> pd.DataFrame:
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=self.COLUMNS)
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        # seulement les lignes complètes (un écrivain peut être en cours d'écriture)
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return pd.DataFrame(columns=self.COLUMNS)
+        first = self.offset == 0
+        self.offset += end
+        return pd.read_csv(
+            io.BytesIO(data[:end]),
+            header=0 if first else None,
+            names=self.COLUMNS,
+            parse_dates=["timestamp"],
+            dtype={"cell_id": str, "users": float, "traffic_mbps": float},
+        )
+
+def replay_hours(source, start, end=None, cell_ids=None):
+    """Stand-in en mémoire du flux: rejoue l'historique heure par heure, un lot par heure."""
+    store = as_cell_store(source)
+    df = store.df if cell_ids is None else pd.concat(store.frames(cell_ids))
+    ts = df["timestamp"]
+    mask = ts >= pd.Timestamp(start)
+    if end is not None:
+        mask &= ts < pd.Timestamp(end)
+    cols = ["timestamp", "cell_id", "users", "traffic_mbps"]
+    for _, g in df.loc[mask, cols].groupby("timestamp", sort=True):
+        yield g
@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, fields, is_dataclass
+from typing import Callable
+
+import pandas as pd
+
+from .cellstore import CellStore
+from .config import ForecastConfig
+from .cube import CUBE_DIR, write_forecast_cube
+from .features import LABEL_COLUMNS, add_saturation_label
+from .fleet import TRAIN_END, failed_cell, forecast_trained, train_cell
+from .generate_reports import BASELINE, OUTDIR as FIGURES_DIR, WHATIF, figures
+from .hierarchy import hierarchy_risk
+from .ingest import DATASET_DIR, list_cells, read_cells
+from .registry import frame_hash
+from .render import render_figures
+from .results import RESULTS_PATH, write_results
+from .rollups import compute_rollups, scenario_rollup
+from .scenarios import evaluate_scenarios, scenario_report
+from .simulate import write_synthetic_dataset
+from .trace import get_tracer
+
+STAGE_CACHE_DIR = "cache/stages"
+
+def code_version() -> str:
+    """Empreinte des sources du package: un changement de code invalide toutes les étapes."""
+    h = hashlib.sha1()
+    root = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(root)):
+        if name.endswith(".py"):
+            with open(os.path.join(root, name), "rb") as f:
+                h.update(name.encode())
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+def _canonical(obj) -> str:
+    return json.dumps(obj, sort_keys=True, default=lambda o: asdict(o) if is_dataclass(o) else str(o))
+
+def value_hash(value) -> str:
+    """Empreinte du contenu d'une sortie (DataFrame: valeurs + colonnes + dtypes, sinon pickle)."""
+    if isinstance(value, pd.DataFrame):
+        schema = _canonical([(str(c), str(t)) for c, t in value.dtypes.items()])
+        return hashlib.sha1((schema + frame_hash(value, list(value.columns))).encode()).hexdigest()
+    return hashlib.sha1(pickle.dumps(value, protocol=5)).hexdigest()
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    Étape du pipeline: run(params, **sorties des deps) -> sortie.
+    - config: clés de params (champs de ForecastConfig + paramètres du run) qui entrent dans la clé;
+    - key_inputs: {dep: f(sortie)} pour ne mettre dans la clé que la partie d'une entrée
+      réellement lue (ex: données sans les labels de saturation pour l'entraînement);
+    - files: f(sortie) -> fichiers écrits; l'étape est réexécutée si l'un d'eux manque.
+    """
+    name: str
+    run: Callable
+    deps: tuple = ()
+    config: tuple = ()
+    key_inputs: dict = None
+    files: Callable = None
+
+class StageCache:
+    """
+    Cache disque adressé par contenu: root/<étape>/<clé>.pkl (sortie) et <clé>.json (empreinte
+    de la sortie, durée). Clé = empreinte(étape, version du code, empreintes des entrées, config).
+    root/<étape>/LATEST garde la dernière clé, pour distinguer un premier calcul ("miss")
+    d'un recalcul après changement d'une entrée ("recomputed").
+    """
+
+    def __init__(self, root: str = STAGE_CACHE_DIR):
+        self.root = root
+        self.version = code_version()
+
+    def _path(self, name: str, key: str, ext: str) -> str:
+        return os.path.join(self.root, name, f"{key}.{ext}")
+
+    def key(self, stage: Stage, inputs: dict, config: dict) -> str:
+        payload = _canonical({"stage": stage.name, "code": self.version, "inputs": inputs, "config": config})
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def has(self, name: str, key: str) -> bool:
+        return os.path.exists(self._path(name, key, "pkl")) and os.path.exists(self._path(name, key, "json"))
+
+    def load(self, name: str, key: str):
+        with open(self._path(name, key, "pkl"), "rb") as f:
+            return pickle.load(f)
+
+    def meta(self, name: str, key: str) -> dict:
+        with open(self._path(name, key, "json")) as f:
+            return json.load(f)
+
+    def save(self, name: str, key: str, value, seconds: float) -> str:
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        data = pickle.dumps(value, protocol=5)
+        out_hash = value_hash(value) if isinstance(value, pd.DataFrame) else hashlib.sha1(data).hexdigest()
+        path = self._path(name, key, "pkl")
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        # le .json est écrit en dernier: une entrée sans .json est incomplète
+        with open(self._path(name, key, "json") + ".tmp", "w") as f:
+            json.dump({"output_hash": out_hash, "seconds": seconds}, f)
+        os.replace(self._path(name, key, "json") + ".tmp", self._path(name, key, "json"))
+        return out_hash
+
+    def latest(self, name: str) -> str | None:
+        path = os.path.join(self.root, name, "LATEST")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return f.read().strip()
+
+    def set_latest(self, name: str, key: str):
+        with open(os.path.join(self.root, name, "LATEST"), "w") as f:
+            f.write(key)
+
+class PipelineRun:
+    """Sorties d'un run: chargées depuis le cache à la première lecture seulement (étapes "hit")."""
+
+    def __init__(self, cache: StageCache):
+        self.cache = cache
+        self.keys, self.hashes, self.rows = {}, {}, []
+        self._values = {}
+
+    def __getitem__(self, name: str):
+        if name not in self._values:
+            self._values[name] = self.cache.load(name, self.keys[name])
+        return self._values[name]
+
+    def summary(self) -> pd.DataFrame:
+        return pd.DataFrame(self.rows)
+
+def run_pipeline(stages: list[Stage], params: dict, cache: StageCache | None = None, force=()) -> PipelineRun:
+    """
+    Exécute les étapes (dans l'ordre donné, deps avant) en ne recalculant que celles dont la
+    clé a changé: une étape est "hit" (lue du cache), "miss" (jamais calculée) ou
+    "recomputed" (entrées, config ou code modifiés; ou forcée par force=[noms]).
+    Les étapes en aval d'une sortie identique au bit près restent en cache.
+    """
+    cache = cache or StageCache()
+    run = PipelineRun(cache)
+    tracer = get_tracer()
+    for stage in stages:
+        missing = [d for d in stage.deps if d not in run.keys]
+        if missing:
+            raise ValueError(f"Stage {stage.name!r} depends on {missing}, which must come first.")
+        projections = stage.key_inputs or {}
+        inputs = {d: value_hash(projections[d](run[d])) if d in projections else run.hashes[d] for d in stage.deps}
+        key = cache.key(stage, inputs, {c: params.get(c) for c in stage.config})
+        run.keys[stage.name] = key
+
+        status = "hit" if cache.has(stage.name, key) and stage.name not in force else None
+        if status == "hit" and stage.files is not None:
+            if not all(os.path.exists(p) for p in stage.files(run[stage.name])):
+                status = None
+        t0 = time.perf_counter()
+        if status == "hit":
+            run.hashes[stage.name] = cache.meta(stage.name, key)["output_hash"]
+        else:
+            status = "miss" if cache.latest(stage.name) is None else "recomputed"
+            with tracer.span(f"stage:{stage.name}"):
+                value = stage.run(params, **{d: run[d] for d in stage.deps})
+            run._values[stage.name] = value
+            run.hashes[stage.name] = cache.save(stage.name, key, value, time.perf_counter() - t0)
+        cache.set_latest(stage.name, key)
+        run.rows.append({
+            "stage": stage.name,
+            "status": status,
+            "seconds": round(time.perf_counter() - t0, 3),
+            "key": key[:12],
+        })
+    return run
+
+def pipeline_params(cfg: ForecastConfig, **run) -> dict:
+    """params des étapes: champs de cfg (pour les clés), cfg lui-même et les paramètres du run."""
+    return {**{f.name: getattr(cfg, f.name) for f in fields(cfg)}, "cfg": cfg, "train_end": TRAIN_END, **run}
+
+# --- étapes du MVP --------------------------------------------------------------------------
+
+def _model_inputs(df: pd.DataFrame) -> pd.DataFrame:
+    return df.drop(columns=[c for c in LABEL_COLUMNS if c in df.columns])
+
+def stage_ingest(p: dict) -> pd.DataFrame:
+    shutil.rmtree(DATASET_DIR, ignore_errors=True)
+    write_synthetic_dataset(DATASET_DIR, n_cells=p["n_cells"], seed=p["seed"])
+    cell_ids = list_cells(DATASET_DIR)[:p["max_cells"]]
+    return read_cells(DATASET_DIR, cell_ids=cell_ids)
+
+def stage_features(p: dict, ingest: pd.DataFrame) -> pd.DataFrame:
+    return add_saturation_label(ingest, p["saturation_threshold_by_zone"])
+
+def _train_chunk(frames: list[pd.DataFrame], cfg: ForecastConfig, train_end: str, registry=None) -> list[dict]:
+    out = []
+    for df_cell in frames:
+        try:
+            out.append(train_cell(df_cell, cfg, train_end=train_end, registry=registry))
+        except Exception as exc:
+            out.append(failed_cell(df_cell, exc))
+    return out
+
+def stage_train(p: dict, features: pd.DataFrame) -> list[dict]:
+    store = CellStore(features)
+    frames = store.frames(store.cell_ids)
+    n_workers = max(1, min(p.get("n_workers", 1), len(frames)))
+    registry = p.get("registry") if p["forecast_strategy"] == "autoregressive" else None
+    if n_workers == 1:
+        return _train_chunk(frames, p["cfg"], p["train_end"], registry)
+    chunks = [frames[i::n_workers] for i in range(n_workers)]
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        parts = list(pool.map(_train_chunk, chunks, [p["cfg"]] * n_workers, [p["train_end"]] * n_workers, [registry] * n_workers))
+    by_cell = {rec["cell_id"]: rec for part in parts for rec in part}
+    return [by_cell[c] for c in store.cell_ids]
+
+def stage_forecast(p: dict, train: list[dict], features: pd.DataFrame) -> list[dict]:
+    store = CellStore(features)
+    ok = [t for t in train if "error" not in t]
+    with get_tracer().span("forecast"):
+        done = forecast_trained(ok, store.frames([t["cell_id"] for t in ok]), p["cfg"]) if ok else []
+    by_cell = {rec["cell_id"]: rec for rec in done}
+    return [by_cell.get(t["cell_id"], t) for t in train]
+
+def _calibrated(p: dict, records: list[dict]):
+    store = p.get("residual_store")
+    if store is None or p["risk_method"] != "exact":
+        return None
+    return [store.calibrated(r["cell_id"], r["model_version"], residuals=r["residuals"]) for r in records if "error" not in r]
+
+def stage_risk(p: dict, forecast: list[dict]) -> pd.DataFrame:
+    return evaluate_scenarios(forecast, p["cfg"], p["scenarios"], calibrated=_calibrated(p, forecast))
+
+def stage_aggregate(p: dict, forecast: list[dict], risk: pd.DataFrame) -> dict:
+    return {
+        # risque agrégé réseau / région / zone (somme des forecasts, capacités agrégées)
+        "hierarchy": hierarchy_risk(forecast, p["cfg"], p["scenarios"], calibrated=_calibrated(p, forecast)),
+        "rollups": compute_rollups(risk),
+    }
+
+def stage_render(p: dict, forecast: list[dict], risk: pd.DataFrame, aggregate: dict) -> list[str]:
+    os.makedirs("reports", exist_ok=True)
+    paths = {
+        "reports/capacity_risk_scenarios.csv": risk,
+        "reports/capacity_risk_horizons.csv": scenario_report(risk, BASELINE),
+        "reports/capacity_risk_whatif_users_1p2.csv": scenario_report(risk, WHATIF),
+        "reports/capacity_risk_aggregate.csv": aggregate["hierarchy"],
+    }
+    for path, df in paths.items():
+        df.to_csv(path, index=False)
+    write_results(risk)  # store columnaire lu par les générateurs de rapports
+    write_forecast_cube(forecast, p["cfg"], p["scenarios"])  # forecasts horaires complets, lus en memmap
+
+    rolls = aggregate["rollups"]
+    out = render_figures(figures(scenario_rollup(rolls, BASELINE), scenario_rollup(rolls, WHATIF)), FIGURES_DIR)
+    return [*paths, RESULTS_PATH, os.path.join(CUBE_DIR, "cube.npy"), *out["rendered"], *out["skipped"]]
+
+_HORIZONS = ("horizon_days_short", "horizon_days_long")
+MVP_STAGES = [
+    Stage("ingest", stage_ingest, config=("n_cells", "max_cells", "seed")),
+    Stage("features", stage_features, deps=("ingest",), config=("saturation_threshold_by_zone",)),
+    # seuils de saturation hors clé: un changement de seuil ne réentraîne ni ne reprévoit
+    Stage(
+        "train", stage_train, deps=("features",),
+        config=("forecast_strategy", "tuned_params", "train_end", "horizon_days_long"),
+        key_inputs={"features": _model_inputs},
+    ),
+    Stage(
+        "forecast", stage_forecast, deps=("train", "features"),
+        config=("forecast_strategy", "horizon_days_long"),
+        key_inputs={"features": _model_inputs},
+    ),
+    Stage(
+        "risk", stage_risk, deps=("forecast",),
+        config=("scenarios", "risk_method", "saturation_threshold_by_zone", *_HORIZONS),
+    ),
+    Stage(
+        "aggregate", stage_aggregate, deps=("forecast", "risk"),
+        config=("scenarios", "saturation_threshold_by_zone", "aggregate_capacity_mbps", "aggregate_capacity_factor", *_HORIZONS),
+    ),
+    Stage(
+        "render", stage_render, deps=("forecast", "risk", "aggregate"),
+        config=("scenarios", "saturation_threshold_by_zone", "horizon_days_long"),
+        files=lambda paths: paths,
+    ),
+]
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+
+from .forecast import DEFAULT_LAGS
+from .model_xgb import XGB_PARAMS, split_supervised, validate_model
+
+REGISTRY_DIR = "models/registry"
+
+def frame_hash(df: pd.DataFrame, columns: list[str]) -> str:
+    """Empreinte du contenu (valeurs + ordre des lignes) des colonnes données."""
+    h = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    return hashlib.sha1(h.tobytes()).hexdigest()
+
+def params_hash(params: dict, lags, feats: list[str]) -> str:
+    payload = json.dumps({"params": params, "lags": list(lags), "feats": feats}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+class ModelRegistry:
+    """
+    Registre local des modèles par cellule (un dossier par cellule):
+    model.ubj (booster), meta.json (feats, mae, empreinte), valid.npz (résidus de validation).
+
+    get_or_train compare l'empreinte des entrées (données d'entraînement, lags,
+    hyperparamètres, train_end) à celle stockée:
+    - "hit": rien n'a changé => modèle chargé depuis le disque;
+    - "warm": les données d'entraînement stockées sont un préfixe des nouvelles
+      (heures ajoutées) => refresh_rounds arbres supplémentaires boostés depuis le
+      booster stocké, au lieu d'un refit complet. Suppose que train_end avance avec les
+      données (fleet.rolling_train_end): à train_end fixe, seule la validation grandit;
+    - "miss": sinon => entraînement complet.
+    """
+
+    def __init__(self, root: str = REGISTRY_DIR, refresh_rounds: int = 50, max_rounds_factor: float = 2.0):
+        self.root = root
+        self.refresh_rounds = refresh_rounds
+        # au-delà de n_estimators * max_rounds_factor arbres, on repart d'un refit complet
+        self.max_rounds_factor = max_rounds_factor
+
+    def _paths(self, cell_id: str) -> dict:
+        d = os.path.join(self.root, str(cell_id))
+        return {
+            "dir": d,
+            "model": os.path.join(d, "model.ubj"),
+            "meta": os.path.join(d, "meta.json"),
+            "valid": os.path.join(d, "valid.npz"),
+        }
+
+    def load_meta(self, cell_id: str) -> dict | None:
+        path = self._paths(cell_id)["meta"]
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def load_model(self, cell_id: str) -> XGBRegressor:
+        model = XGBRegressor()
+        model.load_model(self._paths(cell_id)["model"])
+        return model
+
+    def load_valid(self, cell_id: str) -> pd.DataFrame:
+        with np.load(self._paths(cell_id)["valid"]) as z:
+            return pd.DataFrame({
+                "timestamp": pd.to_datetime(z["timestamp"]),
+                "y_true": z["y_true"],
+                "y_pred": z["y_pred"],
+            })
+
+    def residuals(self, cell_id: str) -> np.ndarray:
+        v = self.load_valid(cell_id)
+        return v["y_true"].to_numpy() - v["y_pred"].to_numpy()
+
+    def save(self, cell_id: str, model: XGBRegressor, meta: dict, valid_out: pd.DataFrame):
+        p = self._paths(cell_id)
+        os.makedirs(p["dir"], exist_ok=True)
+
+        # écritures atomiques: un run interrompu ne laisse pas de modèle à moitié écrit
+        model.save_model(p["model"] + ".tmp.ubj")
+        os.replace(p["model"] + ".tmp.ubj", p["model"])
+        np.savez(
+            p["valid"] + ".tmp.npz",
+            timestamp=valid_out["timestamp"].to_numpy().astype("datetime64[ns]"),
+            y_true=valid_out["y_true"].to_numpy(dtype=float),
+            y_pred=valid_out["y_pred"].to_numpy(dtype=float),
+        )
+        os.replace(p["valid"] + ".tmp.npz", p["valid"])
+        with open(p["meta"] + ".tmp", "w") as f:
+            json.dump(meta, f, indent=2, default=str)
+        os.replace(p["meta"] + ".tmp", p["meta"])
+
+    def get_or_train(
+        self,
+        df,
+        cell_id: str,
+        train_end: str,
+        lags=DEFAULT_LAGS,
+        params: dict | None = None,
+    ):
+        """
+        Même contrat que train_xgb_forecast, plus le statut ("hit" / "warm" / "miss").
+        Renvoie: model, feats, mae, valid_df, status
+        """
+        params = dict(XGB_PARAMS, **(params or {}))
+        train, valid, feats = split_supervised(df, cell_id, train_end, lags=lags)
+        data_cols = ["timestamp", "traffic_mbps"] + feats
+
+        fingerprint = {
+            "params_hash": params_hash(params, lags, feats),
+            "train_end": str(pd.to_datetime(train_end)),
+            "n_train_rows": len(train),
+            "train_hash": frame_hash(train, data_cols),
+            "valid_hash": frame_hash(valid, data_cols),
+        }
+        meta = self.load_meta(cell_id)
+        old = meta["fingerprint"] if meta else None
+
+        status = "miss"
+        if old and old["params_hash"] == fingerprint["params_hash"]:
+            if old["train_hash"] == fingerprint["train_hash"]:
+                status = "hit"
+            elif (
+                0 < old["n_train_rows"] < len(train)
+                and meta["n_rounds"] + self.refresh_rounds <= params["n_estimators"] * self.max_rounds_factor
+                and frame_hash(train.iloc[:old["n_train_rows"]], data_cols) == old["train_hash"]
+            ):
+                status = "warm"
+
+        if status == "hit":
+            model = self.load_model(cell_id)
+            if old["valid_hash"] == fingerprint["valid_hash"]:
+                return model, meta["feats"], meta["mae"], self.load_valid(cell_id), status
+            mae, valid_out = validate_model(model, valid, feats)
+            n_rounds = meta["n_rounds"]
+        elif status == "warm":
+            # boosting de quelques arbres de plus, à partir du booster stocké
+            model = XGBRegressor(**dict(params, n_estimators=self.refresh_rounds))
+            model.fit(train[feats], train["traffic_mbps"], xgb_model=self.load_model(cell_id).get_booster())
+            mae, valid_out = validate_model(model, valid, feats)
+            n_rounds = meta["n_rounds"] + self.refresh_rounds
+        else:
+            model = XGBRegressor(**params)
+            model.fit(train[feats], train["traffic_mbps"])
+            mae, valid_out = validate_model(model, valid, feats)
+            n_rounds = params["n_estimators"]
+
+        self.save(cell_id, model, {
+            "cell_id": cell_id,
+            "feats": feats,
+            "mae": float(mae),
+            "n_rounds": n_rounds,
+            "fingerprint": fingerprint,
+        }, valid_out)
+        return model, feats, mae, valid_out, status
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+PLOTLY_JS = "plotly.min.js"
+MANIFEST = ".render-manifest.json"
+IMAGE_FORMATS = ("pdf", "png", "svg", "jpeg", "webp")
+
+def figure_hash(spec: str, fmt: str) -> str:
+    """Empreinte d'une figure: données + spec (JSON plotly), format de sortie et version de plotly."""
+    return hashlib.sha1(f"{plotly.__version__}|{fmt}|{spec}".encode()).hexdigest()
+
+def _load_manifest(outdir: str) -> dict:
+    path = os.path.join(outdir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def _save_manifest(outdir: str, manifest: dict):
+    path = os.path.join(outdir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def bundle_plotlyjs(outdir: str, manifest: dict) -> bool:
+    """plotly.min.js écrit une fois par dossier (HTML hors ligne), réécrit si plotly change."""
+    path = os.path.join(outdir, PLOTLY_JS)
+    if os.path.exists(path) and manifest.get(PLOTLY_JS) == plotly.__version__:
+        return False
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(get_plotlyjs())
+    os.replace(path + ".tmp", path)
+    manifest[PLOTLY_JS] = plotly.__version__
+    return True
+
+def _render_chunk(items: list[tuple[str, str]], fmt: str) -> list[str]:
+    """
+    Rend un paquet de figures (chemin, spec JSON) dans un worker. Pour les images, un seul
+    appel write_images (plotly >= 6.1, Kaleido >= 1): Kaleido garde le même navigateur pour
+    tout le paquet; une figure à la fois avec write_image sur les versions antérieures.
+    """
+    figs = [json.loads(spec) for _, spec in items]
+    paths = [path for path, _ in items]
+    if fmt in IMAGE_FORMATS and hasattr(pio, "write_images"):
+        pio.write_images(figs, paths, format=fmt, validate=False)
+    elif fmt in IMAGE_FORMATS:
+        for fig, path in zip(figs, paths):
+            pio.write_image(fig, path, format=fmt, validate=False)
+    else:
+        for fig, path in zip(figs, paths):
+            # script plotly.js partagé, à côté des fichiers HTML (pas de CDN)
+            pio.write_html(fig, path, include_plotlyjs=PLOTLY_JS, validate=False)
+    return paths
+
+def render_figures(figures: dict, outdir: str, fmt: str = "html", n_workers: int | None = None, force: bool = False) -> dict:
+    """
+    Écrit les figures {nom: go.Figure} dans outdir/nom.fmt.
+    - une figure dont l'empreinte (figure_hash) est celle du fichier déjà écrit est sautée
+      (manifest .render-manifest.json dans outdir), sauf force=True;
+    - les figures restantes sont rendues par un pool de processus, un paquet par worker
+      (le moteur de rendu est réutilisé pour tout le paquet);
+    - HTML: plotly.min.js est copié une fois dans outdir.
+    Renvoie {"rendered": [...], "skipped": [...]}.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    manifest = _load_manifest(outdir)
+    if fmt not in IMAGE_FORMATS:
+        bundle_plotlyjs(outdir, manifest)
+
+    pending, hashes, skipped = [], {}, []
+    for name, fig in figures.items():
+        filename = f"{name}.{fmt}"
+        path = os.path.join(outdir, filename)
+        spec = fig.to_json()
+        hashes[filename] = figure_hash(spec, fmt)
+        if not force and os.path.exists(path) and manifest.get(filename) == hashes[filename]:
+            skipped.append(path)
+        else:
+            pending.append((path, spec))
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, len(pending)))
+    chunks = [pending[i::n_workers] for i in range(n_workers)] if pending else []
+    rendered = []
+    try:
+        if n_workers == 1:
+            for chunk in chunks:
+                rendered.extend(_render_chunk(chunk, fmt))
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                for paths in pool.map(_render_chunk, chunks, [fmt] * len(chunks)):
+                    rendered.extend(paths)
+    finally:
+        # les figures déjà rendues restent enregistrées même si une autre échoue
+        for path in rendered:
+            name = os.path.basename(path)
+            manifest[name] = hashes[name]
+        _save_manifest(outdir, manifest)
+    return {"rendered": rendered, "skipped": skipped}
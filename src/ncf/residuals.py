@@ -0,0 +1,185 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from .risk import calibrate_sorted_rows, estimate_residuals
+
+RESIDUALS_DIR = "models/residuals"
+DEFAULT_CALIBRATION = ("both", 0.01, 0.99, 3.0)  # method, lower_q, upper_q, clip_sigma (défauts de risk_row)
+
+_VERSION_ATTR = "_ncf_version"
+
+def model_version(model) -> str:
+    """
+    Empreinte d'un modèle (sha1 du booster sérialisé), mise en cache sur le modèle.
+    Une vue de modèle global (GlobalCellModel) a la version de son booster partagé.
+    """
+    parent = getattr(model, "parent", None)
+    if parent is not None:
+        return model_version(parent.model)
+    cached = getattr(model, _VERSION_ATTR, None)
+    if cached is not None:
+        return cached
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    version = hashlib.sha1(bytes(booster.save_raw("ubj"))).hexdigest()[:16]
+    try:
+        setattr(model, _VERSION_ATTR, version)
+    except AttributeError:
+        pass
+    return version
+
+def _cal_key(method: str, lower_q: float, upper_q: float, clip_sigma: float) -> str:
+    return f"cal_{method}_{float(lower_q)!r}_{float(upper_q)!r}_{float(clip_sigma)!r}"
+
+class ResidualStore:
+    """
+    Résidus de validation par cellule, conservés entre runs:
+    - raw: résidus dans l'ordre chronologique (fenêtre glissante des `window` derniers si window);
+    - sorted: les mêmes, triés (NaN en fin);
+    - calibrés triés sans NaN (support de la CDF de fleet_window_risk), un tableau par jeu de
+      paramètres (method, lower_q, upper_q, clip_sigma), calculés à la demande.
+    Une entrée est valable pour une version de modèle (model_version): un modèle réentraîné
+    repart de ses propres résidus.
+    En mémoire: au plus max_cells entrées, éviction LRU. Avec root, chaque entrée est aussi
+    écrite sur disque (un .npz par cellule) et rechargée après éviction ou au run suivant.
+    append() ajoute de nouveaux résidus (nouvelles heures observées) sans retrier la fenêtre:
+    insertion / retrait par recherche binaire dans le tableau trié, puis recalibration en O(R).
+    """
+
+    def __init__(self, root: str | None = RESIDUALS_DIR, max_cells: int = 4096, window: int | None = None):
+        self.root = root
+        self.max_cells = max_cells
+        self.window = window
+        self.stats = {"hit": 0, "disk": 0, "miss": 0, "evicted": 0}
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for e in self._entries.values() for a in (e["raw"], e["sorted"], *e["cal"].values()))
+
+    def _path(self, cell_id: str) -> str:
+        return os.path.join(self.root, f"{cell_id}.npz")
+
+    def _remember(self, cell_id: str, entry: dict):
+        self._entries[cell_id] = entry
+        self._entries.move_to_end(cell_id)
+        while len(self._entries) > self.max_cells:
+            self._entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def _persist(self, cell_id: str, entry: dict):
+        if self.root is None:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._path(cell_id) + ".tmp.npz"
+        np.savez(tmp, version=np.array(entry["version"]), raw=entry["raw"], sorted=entry["sorted"], **entry["cal"])
+        os.replace(tmp, self._path(cell_id))
+
+    def _entry(self, cell_id: str, version: str) -> dict | None:
+        cell_id = str(cell_id)
+        entry = self._entries.get(cell_id)
+        if entry is not None and entry["version"] == version:
+            self._entries.move_to_end(cell_id)
+            self.stats["hit"] += 1
+            return entry
+        if self.root is not None and os.path.exists(self._path(cell_id)):
+            with np.load(self._path(cell_id)) as z:
+                if str(z["version"]) == version:
+                    entry = {
+                        "version": version,
+                        "raw": z["raw"],
+                        "sorted": z["sorted"],
+                        "cal": {k: z[k] for k in z.files if k.startswith("cal_")},
+                    }
+                    self._remember(cell_id, entry)
+                    self.stats["disk"] += 1
+                    return entry
+        self.stats["miss"] += 1
+        return None
+
+    def _windowed(self, residuals) -> np.ndarray:
+        raw = np.asarray(residuals, dtype=float).ravel()
+        return raw if self.window is None else raw[-self.window:]
+
+    def put(self, cell_id: str, version: str, residuals) -> dict:
+        """Remplace les résidus d'une cellule (nouvelle version de modèle ou nouvelle validation)."""
+        raw = self._windowed(residuals)
+        entry = {"version": version, "raw": raw, "sorted": np.sort(raw), "cal": {}}
+        self._remember(str(cell_id), entry)
+        self._persist(str(cell_id), entry)
+        return entry
+
+    def raw(self, cell_id: str, version: str) -> np.ndarray | None:
+        """Résidus (ordre chronologique) d'une cellule pour cette version, None si absents."""
+        entry = self._entry(cell_id, version)
+        return None if entry is None else entry["raw"]
+
+    def calibrated(
+        self,
+        cell_id: str,
+        version: str,
+        residuals=None,
+        method: str = DEFAULT_CALIBRATION[0],
+        lower_q: float = DEFAULT_CALIBRATION[1],
+        upper_q: float = DEFAULT_CALIBRATION[2],
+        clip_sigma: float = DEFAULT_CALIBRATION[3],
+    ) -> np.ndarray:
+        """
+        Résidus calibrés, triés, sans NaN (mêmes valeurs que calibrate_residuals_batch).
+        residuals: résidus courants de la cellule (ex: validation du run). Ils remplacent
+        l'entrée s'ils diffèrent des résidus enregistrés: un modèle inchangé (même version)
+        peut avoir été revalidé sur de nouvelles heures.
+        """
+        entry = self._entry(cell_id, version)
+        if residuals is not None:
+            raw = self._windowed(residuals)
+            if entry is None or not np.array_equal(entry["raw"], raw, equal_nan=True):
+                entry = self.put(cell_id, version, raw)
+        elif entry is None:
+            raise KeyError(f"No residuals for cell {cell_id!r} (model version {version}).")
+
+        key = _cal_key(method, lower_q, upper_q, clip_sigma)
+        if key not in entry["cal"]:
+            cal = calibrate_sorted_rows(entry["sorted"][None, :].copy(), method, lower_q, upper_q, clip_sigma)[0]
+            entry["cal"][key] = cal[~np.isnan(cal)]
+            self._persist(str(cell_id), entry)
+        return entry["cal"][key]
+
+    def append(self, cell_id: str, version: str, residuals) -> dict:
+        """
+        Ajoute des résidus récents (ex: réel - prévision à 1 pas des nouvelles heures).
+        Les plus anciens sortent de la fenêtre; le tableau trié est mis à jour par
+        insertion / suppression ciblées, les calibrations sont recalculées à la demande.
+        """
+        entry = self._entry(cell_id, version)
+        new = np.asarray(residuals, dtype=float).ravel()
+        if entry is None:
+            return self.put(cell_id, version, new)
+
+        raw = np.concatenate([entry["raw"], new])
+        # positions d'insertion calculées sur le lot trié: sinon le tableau ne l'est plus
+        batch = np.sort(new)
+        srt = np.insert(entry["sorted"], np.searchsorted(entry["sorted"], batch), batch)
+        if self.window is not None and raw.size > self.window:
+            old, raw = raw[:-self.window], raw[-self.window:]
+            srt = np.delete(srt, _positions(srt, old))
+        entry.update(raw=raw, sorted=srt, cal={})
+        self._persist(str(cell_id), entry)
+        return entry
+
+    def update(self, cell_id: str, version: str, y_true, y_pred) -> dict:
+        """append() à partir de valeurs observées et prévues."""
+        return self.append(cell_id, version, estimate_residuals(y_true, y_pred))
+
+def _positions(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Indices distincts, dans sorted_values, d'une occurrence de chaque élément de values."""
+    values = np.sort(values)
+    first = np.searchsorted(sorted_values, values, side="left")
+    # doublons: k-ième occurrence d'une même valeur => k-ième position après la première
+    rank = np.arange(values.size) - np.searchsorted(values, values, side="left")
+    return first + rank
@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+RESULTS_PATH = "reports/capacity_risk.parquet"
+
+RISK_LEVELS = ("HIGH", "MEDIUM", "LOW", "UNKNOWN")
+CATEGORY_COLUMNS = ("scenario", "region", "zone_type")
+
+def to_columnar(long: pd.DataFrame) -> pd.DataFrame:
+    """
+    Table longue de run_scenarios (ou rapport de run_risk, scénario "baseline") au format du
+    store: scenario / region / zone_type en catégories, risk_level en catégorie aux niveaux fixes.
+    """
+    out = long.copy(deep=False)
+    if "scenario" not in out.columns:
+        out.insert(0, "scenario", "baseline")
+    for c in CATEGORY_COLUMNS:
+        out[c] = out[c].astype(str).astype("category")
+    out["risk_level"] = pd.Categorical(out["risk_level"].astype(str), categories=RISK_LEVELS)
+    out["cell_id"] = out["cell_id"].astype(str)
+    return out
+
+def write_results(long: pd.DataFrame, path: str = RESULTS_PATH) -> str:
+    """Écrit les résultats de risque (toutes cellules, tous scénarios) en un fichier Parquet."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    table = pa.Table.from_pandas(to_columnar(long), preserve_index=False)
+    # écriture atomique: un lecteur ne voit jamais de fichier à moitié écrit
+    pq.write_table(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return path
+
+def read_results(path: str = RESULTS_PATH, scenarios=None, columns=None) -> pd.DataFrame:
+    """Résultats du store (catégories restaurées), filtrés par scénario au scan."""
+    filters = None
+    if scenarios is not None:
+        filters = pc.field("scenario").isin(pa.array([str(s) for s in scenarios], type=pa.string()))
+    table = pq.read_table(path, columns=list(columns) if columns is not None else None, filters=filters)
+    return table.to_pandas()
+
+def results_fingerprint(path: str = RESULTS_PATH) -> str:
+    """Identifie une version du fichier de résultats (taille + date de modification)."""
+    st = os.stat(path)
+    return f"{st.st_size}-{st.st_mtime_ns}"
@@ -39,6 +39,37 @@ def _calibrate_residuals(
 
     return r
 
+def sorted_calibrated_residuals(residuals: np.ndarray, calibrate: str = "both") -> np.ndarray:
+    """Résidus calibrés, sans NaN, triés: support de la CDF empirique F utilisée en mode exact."""
+    r = _calibrate_residuals(np.asarray(residuals, dtype=float), method=calibrate)
+    return np.sort(r[~np.isnan(r)])
+
+def exact_exceedance_probabilities(y_pred_series: np.ndarray, sorted_residuals: np.ndarray, threshold, horizons) -> dict:
+    """
+    Mode exact (sans tirage): sous l'hypothèse bootstrap i.i.d.,
+    P(max(y_t + eps_t, t <= h) > threshold) = 1 - prod_{t<=h} F(threshold - y_t),
+    F = CDF empirique des résidus calibrés (searchsorted sur le tableau trié), coût O(H log R).
+    y_pred_series peut être (H,) ou (..., H) avec threshold diffusable sur (...).
+    Renvoie {h: probabilité (float ou tableau de forme (...))}.
+    """
+    y = np.asarray(y_pred_series, dtype=float)
+    thr = np.asarray(threshold, dtype=float)[..., None]
+    horizons = sorted({int(h) for h in horizons})
+    if sorted_residuals.size == 0 or y.shape[-1] == 0:
+        nan = np.full(y.shape[:-1], np.nan)
+        return {h: float(nan) if nan.ndim == 0 else nan for h in horizons}
+
+    # F(x) = #{r <= x} / R  <=>  P(y_t + eps <= threshold)
+    F = np.searchsorted(sorted_residuals, thr - y, side="right") / sorted_residuals.size
+    with np.errstate(divide="ignore"):
+        log_all_below = np.cumsum(np.log(F), axis=-1)
+
+    out = {}
+    for h in horizons:
+        p = 0.0 - np.expm1(log_all_below[..., min(h, y.shape[-1]) - 1])
+        out[h] = float(p) if p.ndim == 0 else p
+    return out
+
 def saturation_probability(
     y_pred_point: float,
     residuals: np.ndarray,
@@ -46,15 +77,20 @@ def saturation_probability(
     n_samples: int = 2000,
     seed: int = 42,
     calibrate: str = "both",
+    method: str = "mc",
 ) -> float:
     """
     Approxime P(y > threshold) où y = y_pred_point + epsilon
     et epsilon est tiré des résidus observés (bootstrap), calibrés.
+    method="exact": 1 - F(threshold - y_pred_point), sans tirage.
     """
     residuals = np.asarray(residuals, dtype=float)
     if residuals.size == 0:
         return float("nan")
 
+    if method == "exact":
+        return exact_exceedance_probabilities([y_pred_point], sorted_calibrated_residuals(residuals, calibrate), threshold, [1])[1]
+
     r = _calibrate_residuals(residuals, method=calibrate)
 
     rng = np.random.default_rng(seed)
@@ -69,17 +105,24 @@ def window_saturation_probability(
     n_paths: int = 2000,
     seed: int = 42,
     calibrate: str = "both",
+    method: str = "mc",
 ) -> float:
     """
     Approxime P(max(y_t) > threshold) sur une fenêtre,
     avec y_t = y_pred_t + eps_t, eps_t tirés des résidus (bootstrap i.i.d),
     après calibration robuste des résidus.
+    - method="mc": simulation de n_paths chemins (gardé pour de futurs modèles d'erreur non i.i.d.);
+    - method="exact": valeur exacte de la même probabilité, sans tirage ni variance de graine.
     """
     y_pred_series = np.asarray(y_pred_series, dtype=float)
     residuals = np.asarray(residuals, dtype=float)
     if residuals.size == 0 or y_pred_series.size == 0:
         return float("nan")
 
+    if method == "exact":
+        sr = sorted_calibrated_residuals(residuals, calibrate)
+        return exact_exceedance_probabilities(y_pred_series, sr, threshold, [y_pred_series.size])[y_pred_series.size]
+
     r = _calibrate_residuals(residuals, method=calibrate)
 
     rng = np.random.default_rng(seed)
@@ -87,6 +130,213 @@ def window_saturation_probability(
     sims = y_pred_series.reshape(1, -1) + eps
     return float(np.mean(np.max(sims, axis=1) > threshold))
 
+def bootstrap_paths(
+    residuals: np.ndarray,
+    horizon: int,
+    n_paths: int = 2000,
+    seed: int = 42,
+    calibrate: str = "both",
+) -> np.ndarray:
+    """
+    Tire une matrice d'erreurs (n_paths × horizon) par bootstrap i.i.d. des résidus calibrés.
+    Même tirage que window_saturation_probability(ies) pour la même graine: la matrice
+    peut être tirée une fois par cellule et réutilisée pour plusieurs scénarios.
+    """
+    r = _calibrate_residuals(np.asarray(residuals, dtype=float), method=calibrate)
+    rng = np.random.default_rng(seed)
+    return rng.choice(r, size=(n_paths, horizon), replace=True)
+
+def paths_exceedance_probabilities(y_pred_series: np.ndarray, eps: np.ndarray, threshold: float, horizons) -> dict[int, float]:
+    """
+    P(max(y_t + eps_t, t <= h) > threshold) pour chaque horizon h, sur des chemins déjà tirés
+    (les horizons courts partagent les mêmes chemins => p_h croissant avec h).
+    """
+    y = np.asarray(y_pred_series, dtype=float)[:eps.shape[1]]
+    running_max = np.maximum.accumulate(y.reshape(1, -1) + eps[:, :y.size], axis=1)
+    return {h: float(np.mean(running_max[:, min(h, y.size) - 1] > threshold)) for h in sorted({int(h) for h in horizons})}
+
+def window_saturation_probabilities(
+    y_pred_series: np.ndarray,
+    residuals: np.ndarray,
+    threshold: float,
+    horizons,
+    n_paths: int = 2000,
+    seed: int = 42,
+    calibrate: str = "both",
+    method: str = "mc",
+) -> dict[int, float]:
+    """
+    Version multi-horizons de window_saturation_probability: un seul tirage de
+    chemins sur l'horizon le plus long, puis max glissant lu à chaque horizon h
+    (les horizons courts partagent les mêmes chemins => p_h croissant avec h).
+    method="exact": probabilités exactes, sans tirage (voir exact_exceedance_probabilities).
+    Renvoie {h: P(max(y_t, t <= h) > threshold)}.
+    """
+    horizons = sorted({int(h) for h in horizons})
+    y_pred_series = np.asarray(y_pred_series, dtype=float)[:horizons[-1]]
+    residuals = np.asarray(residuals, dtype=float)
+    if residuals.size == 0 or y_pred_series.size == 0:
+        return {h: float("nan") for h in horizons}
+
+    if method == "exact":
+        return exact_exceedance_probabilities(y_pred_series, sorted_calibrated_residuals(residuals, calibrate), threshold, horizons)
+
+    eps = bootstrap_paths(residuals, y_pred_series.size, n_paths=n_paths, seed=seed, calibrate=calibrate)
+    return paths_exceedance_probabilities(y_pred_series, eps, threshold, horizons)
+
+def pad_residuals(residuals_list) -> np.ndarray:
+    """Stocke des résidus de longueurs différentes dans une matrice (n_cells × R_max) complétée par NaN."""
+    residuals_list = [np.asarray(r, dtype=float).ravel() for r in residuals_list]
+    width = max((r.size for r in residuals_list), default=0)
+    out = np.full((len(residuals_list), width), np.nan)
+    for i, r in enumerate(residuals_list):
+        out[i, :r.size] = r
+    return out
+
+def _sorted_quantile(sorted_rows: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Quantile (interpolation linéaire, comme np.quantile) de chaque ligne triée, NaN en fin de ligne."""
+    virtual = q * (counts - 1)
+    lo = np.floor(virtual).astype(np.int64)
+    hi = np.minimum(lo + 1, counts - 1)
+    t = virtual - lo
+    rows = np.arange(len(sorted_rows))
+    a, b = sorted_rows[rows, lo], sorted_rows[rows, hi]
+    # même formule d'interpolation que numpy (_lerp), pour des bornes identiques
+    return np.where(t >= 0.5, b - (b - a) * (1 - t), a + (b - a) * t)
+
+def calibrate_residuals_batch(
+    residuals,
+    method: str = "both",
+    lower_q: float = 0.01,
+    upper_q: float = 0.99,
+    clip_sigma: float = 3.0,
+) -> np.ndarray:
+    """
+    Même calibration que _calibrate_residuals, ligne par ligne, sur une matrice de résidus
+    (n_cells × R) complétée par NaN (ou une liste de tableaux). Chaque cellule est calibrée
+    une seule fois. Renvoie les lignes calibrées et triées (NaN en fin de ligne), prêtes
+    pour les lookups de CDF de fleet_window_risk.
+    Centrage et clipping sont monotones: un seul tri suffit, et les quantiles sont lus
+    directement dans les lignes triées.
+    """
+    r = residuals if isinstance(residuals, np.ndarray) and residuals.ndim == 2 else pad_residuals(residuals)
+    r = np.sort(np.asarray(r, dtype=float), axis=1)
+    return calibrate_sorted_rows(r, method, lower_q, upper_q, clip_sigma)
+
+def calibrate_sorted_rows(
+    r: np.ndarray,
+    method: str = "both",
+    lower_q: float = 0.01,
+    upper_q: float = 0.99,
+    clip_sigma: float = 3.0,
+) -> np.ndarray:
+    """
+    Cœur de calibrate_residuals_batch sur des lignes déjà triées (NaN en fin de ligne),
+    modifiées en place: aucun tri (utilisé par le ResidualStore, qui garde ses résidus triés).
+    """
+    counts = (~np.isnan(r)).sum(axis=1)
+    has_data = counts > 0
+    if not has_data.any():
+        return r
+
+    rows, c = r[has_data], counts[has_data]
+    with np.errstate(invalid="ignore"):
+        rows -= np.nanmean(rows, axis=1, keepdims=True)
+
+        if method in ("winsor", "both"):
+            lo = _sorted_quantile(rows, c, lower_q)[:, None]
+            hi = _sorted_quantile(rows, c, upper_q)[:, None]
+            rows = np.clip(rows, lo, hi)
+
+        if method in ("sigma", "both"):
+            std = np.nanstd(rows, axis=1, keepdims=True)
+            bound = np.where(std > 0, clip_sigma * std, np.inf)
+            rows = np.clip(rows, -bound, bound)
+
+    r[has_data] = rows
+    return r
+
+def _rowwise_count_le(sorted_rows: np.ndarray, counts: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """
+    #{r_i <= q_ij} pour chaque ligne i (searchsorted side="right" sur la partie valide de
+    chaque ligne triée). Une recherche binaire en C par cellule: plus rapide qu'un tri
+    fusionné de tout le bloc, qui re-trierait des résidus déjà triés.
+    """
+    out = np.empty(queries.shape, dtype=np.int64)
+    for i in range(len(sorted_rows)):
+        out[i] = np.searchsorted(sorted_rows[i, :counts[i]], queries[i], side="right")
+    return out
+
+def fleet_window_risk(
+    y_pred: np.ndarray,
+    thresholds: np.ndarray,
+    residuals,
+    horizons,
+    calibrate: str = "both",
+    calibrated: bool = False,
+    chunk_size: int = 1024,
+) -> dict:
+    """
+    Noyau de risque vectorisé sur tout le parc (mode exact, bootstrap i.i.d.):
+    - y_pred: forecasts (n_cells × H); thresholds: seuils par cellule (n_cells,);
+    - residuals: matrice (n_cells × R) complétée par NaN ou liste de tableaux;
+      avec calibrated=True, sortie de calibrate_residuals_batch (pour la réutiliser entre scénarios).
+    Pour chaque cellule et chaque horizon h, avec q_t = P(y_t + eps_t > threshold):
+    - p_saturation: 1 - prod_{t<=h} (1 - q_t);
+    - expected_exceedance_hours: sum_{t<=h} q_t;
+    - expected_first_exceedance_h: E[T | T <= h], T = première heure de dépassement (NaN si p = 0).
+    Les cellules sont traitées par blocs de chunk_size (mémoire bornée pour de grands parcs).
+    Renvoie un dict de tableaux (n_cells × n_horizons) + "horizons".
+    """
+    Y = np.atleast_2d(np.asarray(y_pred, dtype=float))
+    n, H_all = Y.shape
+    thr = np.broadcast_to(np.asarray(thresholds, dtype=float), (n,))
+    horizons = sorted({min(int(h), H_all) for h in horizons})
+    if not (isinstance(residuals, np.ndarray) and residuals.ndim == 2):
+        residuals = pad_residuals(residuals)
+
+    out = {k: np.full((n, len(horizons)), np.nan) for k in ("p_saturation", "expected_exceedance_hours", "expected_first_exceedance_h")}
+    h_idx = np.asarray(horizons) - 1
+
+    for start in range(0, n, chunk_size):
+        sl = slice(start, min(start + chunk_size, n))
+        cal = residuals[sl] if calibrated else calibrate_residuals_batch(residuals[sl], method=calibrate)
+        counts = (~np.isnan(cal)).sum(axis=1)
+        ok = counts > 0
+        if not ok.any():
+            continue
+        rows = np.flatnonzero(ok) + start
+        cal, counts = cal[ok], counts[ok]
+
+        F = _rowwise_count_le(cal, counts, thr[rows, None] - Y[rows]) / counts[:, None]
+        for k, v in window_risk_from_cdf(F, h_idx).items():
+            out[k][rows] = v
+
+    out["horizons"] = np.asarray(horizons)
+    return out
+
+def window_risk_from_cdf(F: np.ndarray, h_idx: np.ndarray) -> dict:
+    """
+    Indicateurs de fenêtre à partir de F[i, t] = P(charge_t <= capacité) (n × H), heures
+    indépendantes: p_saturation, expected_exceedance_hours, expected_first_exceedance_h,
+    lus aux indices d'horizon h_idx (h - 1). Partagé par le noyau cellule et l'agrégation.
+    """
+    t = np.arange(1, F.shape[1] + 1, dtype=float)
+    q = 1.0 - F
+    with np.errstate(divide="ignore"):
+        survive = np.exp(np.cumsum(np.log(F), axis=1))  # S_t = P(aucun dépassement jusqu'à t)
+    prev = np.concatenate([np.ones((len(F), 1)), survive[:, :-1]], axis=1)
+    first_mass = np.cumsum(t * (prev - survive), axis=1)  # sum_{s<=t} s * P(T = s)
+
+    p = 1.0 - survive[:, h_idx]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        first = np.where(p > 0, first_mass[:, h_idx] / p, np.nan)
+    return {
+        "p_saturation": p,
+        "expected_exceedance_hours": np.cumsum(q, axis=1)[:, h_idx],
+        "expected_first_exceedance_h": first,
+    }
+
 def risk_level(p: float) -> str:
     if p != p:  # NaN
         return "UNKNOWN"
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .results import RESULTS_PATH, read_results, results_fingerprint
+
+# grain -> clés de regroupement (toujours par scénario)
+GRAINS = {
+    "scenario": ["scenario"],
+    "region": ["scenario", "region"],
+    "zone_type": ["scenario", "zone_type"],
+    "region_zone": ["scenario", "region", "zone_type"],
+}
+LEVEL_COUNTS = {"HIGH": "high_cells", "MEDIUM": "med_cells", "LOW": "low_cells", "UNKNOWN": "unknown_cells"}
+METRICS = ["max_risk", "mean_risk", *LEVEL_COUNTS.values(), "n_cells"]
+_SUMS = ["n_cells", "p_sum", "p_count", *LEVEL_COUNTS.values()]
+
+_cache = {}
+
+def compute_rollups(results: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """
+    Agrégats de risque (max / moyenne de p_worst, nb de cellules par niveau de risque) à
+    toutes les mailles de GRAINS, en un seul passage sur les cellules: un groupby vectorisé
+    à la maille la plus fine (scenario × region × zone_type), dont les mailles plus grossières
+    sont déduites (sommes et max de quelques dizaines de lignes).
+    results: store de résultats (ou table sans colonne scenario: un seul scénario "baseline").
+    """
+    scenario = results["scenario"] if "scenario" in results.columns else pd.Series("baseline", index=results.index)
+    p = results["p_worst"].to_numpy(dtype=float)
+    level = results["risk_level"]  # comparaisons sur les codes si catégorielle (store)
+
+    cells = pd.DataFrame({
+        "scenario": pd.Categorical(scenario),
+        "region": pd.Categorical(results["region"]),
+        "zone_type": pd.Categorical(results["zone_type"]),
+        "p": p,
+        "p_ok": ~np.isnan(p),
+        **{col: (level == lvl).to_numpy() for lvl, col in LEVEL_COUNTS.items()},
+    })
+    fine = cells.groupby(GRAINS["region_zone"], observed=True, sort=True).agg(
+        n_cells=("p", "size"),
+        p_sum=("p", "sum"),
+        p_count=("p_ok", "sum"),
+        max_risk=("p", "max"),
+        **{col: (col, "sum") for col in LEVEL_COUNTS.values()},
+    )
+
+    out = {}
+    for grain, keys in GRAINS.items():
+        g = fine if grain == "region_zone" else fine.groupby(level=keys, observed=True, sort=True).agg(
+            {**{c: "sum" for c in _SUMS}, "max_risk": "max"}
+        )
+        g = g.reset_index()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            g["mean_risk"] = g["p_sum"] / g["p_count"]
+        for c in keys:
+            g[c] = g[c].astype(str)
+        out[grain] = g[keys + METRICS].astype({c: "int64" for c in _SUMS if c in METRICS})
+    return out
+
+def _cache_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".rollups.parquet"
+
+def rollups(path: str = RESULTS_PATH) -> dict[str, pd.DataFrame]:
+    """
+    Agrégats du store de résultats, mis en cache en mémoire et sur disque (à côté du store),
+    recalculés seulement quand le fichier de résultats change.
+    """
+    source = results_fingerprint(path)
+    key = (os.path.abspath(path), source)
+    if key in _cache:
+        return _cache[key]
+
+    cached = _cache_path(path)
+    out = None
+    if os.path.exists(cached):
+        stacked = pd.read_parquet(cached)
+        if len(stacked) and (stacked["source"] == source).all():
+            out = {
+                grain: stacked.loc[stacked["grain"] == grain, keys + METRICS].reset_index(drop=True)
+                for grain, keys in GRAINS.items()
+            }
+    if out is None:
+        out = compute_rollups(read_results(path, columns=["scenario", "region", "zone_type", "p_worst", "risk_level"]))
+        stacked = pd.concat([g.assign(grain=grain) for grain, g in out.items()], ignore_index=True)
+        stacked["source"] = source
+        stacked.to_parquet(cached + ".tmp", index=False)
+        os.replace(cached + ".tmp", cached)
+    _cache[key] = out
+    return out
+
+def scenario_rollup(rolls: dict[str, pd.DataFrame], scenario: str, grain: str = "region") -> pd.DataFrame:
+    """Agrégats d'un scénario à une maille (sans la colonne scenario)."""
+    g = rolls[grain]
+    out = g[g["scenario"] == scenario].drop(columns=["scenario"]).reset_index(drop=True)
+    if out.empty:
+        raise ValueError(f"Unknown scenario {scenario!r} (available: {sorted(g['scenario'].unique())}).")
+    return out
+
+def agg_region(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrégats par région d'un rapport de risque (un scénario), ex: sortie de run_risk."""
+    return compute_rollups(df)["region"].drop(columns=["scenario"])
@@ -1,87 +1,122 @@
+import argparse
 import os
+from dataclasses import replace
 import pandas as pd
 
-from .simulate import generate_synthetic_network_data
 from .config import ForecastConfig
 from .features import add_saturation_label
-from .model_xgb import train_xgb_forecast
-from .forecast import forecast_xgb_autoregressive
-from .risk import estimate_residuals, window_saturation_probability, risk_level
-
-def run_risk(df: pd.DataFrame, cfg: ForecastConfig, users_multiplier: float = 1.0) -> pd.DataFrame:
-    H7 = cfg.horizon_days_short * 24
-    H30 = cfg.horizon_days_long * 24
-
-    cell_ids = sorted(df["cell_id"].unique())[:20]  # MVP: 20 cellules
+from .cellstore import CellStore, as_cell_store
+from .direct import STRATEGIES
+from .fleet import iter_risk_rows, finalize_risk_frame
+from .ingest import iter_cell_batches
+from .pipeline import MVP_STAGES, StageCache, pipeline_params, run_pipeline
+from .registry import ModelRegistry
+from .residuals import ResidualStore
+from .scenarios import Scenario, scenario_report
+from .trace import Tracer, get_tracer, tracing
+from .tuning import tuned_config
+
+def run_risk(
+    df: pd.DataFrame | CellStore,
+    cfg: ForecastConfig,
+    users_multiplier: float = 1.0,
+    max_cells: int | None = 20,
+    n_workers: int = 1,
+    chunk_size: int = 4,
+    progress=None,
+    mode: str = "per_cell",
+    group_by: str | None = None,
+    registry: ModelRegistry | None = None,
+    tracer: Tracer | None = None,
+    residual_store: ResidualStore | None = None,
+    strategy: str | None = None,
+) -> pd.DataFrame:
+    """
+    Rapport de risque (une ligne par cellule). Avec un tracer (voir ncf.trace), chaque étape
+    est chronométrée par cellule et le rapport gagne une colonne cell_time_s.
+    residual_store: résidus et calibrations conservés pour les runs suivants (voir ncf.residuals).
+    strategy: "autoregressive" ou "direct" (voir ncf.direct), remplace cfg.forecast_strategy.
+    """
+    if strategy is not None:
+        cfg = replace(cfg, forecast_strategy=strategy)
+    store = as_cell_store(df)
+    cell_ids = store.cell_ids
+    if max_cells is not None:
+        cell_ids = cell_ids[:max_cells]  # MVP: 20 cellules
+
+    with tracing(tracer if tracer is not None else get_tracer()):
+        rows = iter_risk_rows(
+            store, cfg, users_multiplier=users_multiplier, cell_ids=cell_ids,
+            n_workers=n_workers, chunk_size=chunk_size, progress=progress,
+            mode=mode, group_by=group_by, registry=registry, residual_store=residual_store,
+        )
+        return finalize_risk_frame(list(rows))
+
+def run_risk_dataset(
+    root: str,
+    cfg: ForecastConfig,
+    users_multiplier: float = 1.0,
+    cell_ids=None,
+    start=None,
+    end=None,
+    batch_cells: int = 64,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    run_risk sur un dataset Parquet partitionné, lu par paquets de batch_cells cellules:
+    seul le paquet courant est en mémoire (les lignes de risque sont accumulées).
+    """
     rows = []
-
-    for cell_id in cell_ids:
-        df_cell = df[df["cell_id"] == cell_id].copy()
-        zone = df_cell["zone_type"].iloc[0]
-        threshold = float(cfg.saturation_threshold_by_zone.get(zone, 800.0))
-
-        model, feats, mae, valid_out = train_xgb_forecast(df, cell_id=cell_id, train_end="2025-07-01")
-        residuals = estimate_residuals(valid_out["y_true"].values, valid_out["y_pred"].values)
-
-        f7 = forecast_xgb_autoregressive(model, df_cell, feats, horizon_hours=H7)
-        f30 = forecast_xgb_autoregressive(model, df_cell, feats, horizon_hours=H30)
-
-        # What-if: proxy simple -> plus d'abonnés = plus de charge
-        f7_adj = f7["y_pred"].values * users_multiplier
-        f30_adj = f30["y_pred"].values * users_multiplier
-
-        p7 = window_saturation_probability(f7_adj, residuals, threshold, n_paths=2000, seed=42)
-        p30 = window_saturation_probability(f30_adj, residuals, threshold, n_paths=2000, seed=42)
-
-        max7 = float(f7_adj.max())
-        max30 = float(f30_adj.max())
-        worst = max(p7, p30)
-
-        cell_meta = df_cell.iloc[0]
-        rows.append({
-            "cell_id": cell_id,
-            "region": cell_meta["region"],
-            "zone_type": zone,
-            "users_multiplier": users_multiplier,
-            "mae_valid_mbps": round(mae, 2),
-            "saturation_threshold_mbps": threshold,
-            "max_pred_j7_mbps": round(max7, 2),
-            "max_pred_j30_mbps": round(max30, 2),
-            "p_saturation_j7": round(p7, 4),
-            "p_saturation_j30": round(p30, 4),
-            "risk_level": risk_level(worst),
-            "p_worst": round(worst, 4),
-        })
-
-    out = pd.DataFrame(rows)
-    order = {"HIGH": 0, "MEDIUM": 1, "LOW": 2, "UNKNOWN": 3}
-    out["risk_rank"] = out["risk_level"].map(order).fillna(9).astype(int)
-    out = out.sort_values(["risk_rank", "p_worst"], ascending=[True, False]).drop(columns=["risk_rank"])
-    return out
+    for store in iter_cell_batches(root, cell_ids=cell_ids, start=start, end=end, batch_cells=batch_cells):
+        store = CellStore(add_saturation_label(store.df, cfg.saturation_threshold_by_zone))
+        rows.extend(iter_risk_rows(store, cfg, users_multiplier=users_multiplier, **kwargs))
+    return finalize_risk_frame(rows)
 
 def main():
-    cfg = ForecastConfig()
-    os.makedirs("data/processed", exist_ok=True)
-    os.makedirs("reports", exist_ok=True)
-
-    print("1) Génération data synthétique…")
-    df = generate_synthetic_network_data(n_cells=60)
-    df.to_parquet("data/processed/network_capacity.parquet", index=False)
-
-    print("2) Ajout label saturation (seuil par zone)…")
-    df = add_saturation_label(df, cfg.saturation_threshold_by_zone)
-
-    print("3) Risk baseline (users x1.0)…")
-    out_base = run_risk(df, cfg, users_multiplier=1.0)
-    out_base.to_csv("reports/capacity_risk_horizons.csv", index=False)
-    print("OK ✅ reports/capacity_risk_horizons.csv")
-    print(out_base.head(10).to_string(index=False))
-
-    print("4) What-if +20% abonnés (users x1.2)…")
-    out_wi = run_risk(df, cfg, users_multiplier=1.2)
-    out_wi.to_csv("reports/capacity_risk_whatif_users_1p2.csv", index=False)
-    print("OK ✅ reports/capacity_risk_whatif_users_1p2.csv")
-    print(out_wi.head(10).to_string(index=False))
+    parser = argparse.ArgumentParser(description="Forecast + risque de saturation (MVP).")
+    parser.add_argument("--trace", default=None, help="écrit une trace JSON par étape / cellule (ex: reports/trace.json)")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="autoregressive", help="forecast auto-régressif ou direct (échéance en feature)")
+    parser.add_argument("--profile", nargs="*", default=(), help="étapes profilées avec cProfile (training, forecast, ...)")
+    parser.add_argument("--force", nargs="*", default=(), help="étapes recalculées même si leur cache est valide (ex: train)")
+    args = parser.parse_args()
+    tracer = Tracer(profile=args.profile) if args.trace or args.profile else None
+
+    # hyperparamètres de python -m src.ncf.tuning, s'ils ont été cherchés
+    cfg = tuned_config(forecast_strategy=args.strategy)
+
+    # DAG ingest -> features -> train -> forecast -> risk -> aggregate -> render: seules les
+    # étapes dont les entrées (données, champs de config, code) ont changé sont recalculées
+    params = pipeline_params(
+        cfg,
+        n_cells=60,
+        max_cells=20,  # MVP: 20 cellules
+        seed=42,
+        # un seul entraînement + forecast par cellule, baseline et what-if en post-traitement
+        scenarios=[Scenario("baseline", users_multiplier=1.0), Scenario("users_x1.2", users_multiplier=1.2)],
+        n_workers=os.cpu_count() or 1,
+        # modèles réutilisés entre runs (le registry ne stocke que les modèles auto-régressifs);
+        # fin d'entraînement glissante: des heures ajoutées mettent à jour le modèle stocké ("warm")
+        registry=ModelRegistry(),
+        train_end=None,
+        residual_store=ResidualStore(),  # résidus calibrés réutilisés tant que le modèle ne change pas
+    )
+    with tracing(tracer):
+        run = run_pipeline(MVP_STAGES, params, StageCache(), force=args.force)
+    if args.trace:
+        tracer.write_json(args.trace)
+        print(f"OK ✅ {args.trace}")
+
+    for path in run["render"]:
+        print(f"OK ✅ {path}")
+    long = run["risk"]
+    print(scenario_report(long, "baseline").head(10).to_string(index=False))
+    agg = run["aggregate"]["hierarchy"]
+    print(agg[(agg["scenario"] == "baseline") & (agg["grain"] == "region")].to_string(index=False))
+    print(scenario_report(long, "users_x1.2").head(10).to_string(index=False))
+
+    summary = run.summary()
+    print(f"Étapes: {', '.join(f'{s}={n}' for s, n in summary['status'].value_counts().items())}")
+    print(summary.to_string(index=False))
 
 if __name__ == "__main__":
     main()
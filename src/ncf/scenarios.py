@@ -0,0 +1,223 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .config import ForecastConfig
+from .cellstore import CellStore
+from .fleet import RISK_ORDER, iter_cell_forecasts
+from .registry import ModelRegistry
+from .residuals import ResidualStore
+from .trace import Tracer, get_tracer, tracing
+from .risk import (
+    bootstrap_paths,
+    calibrate_residuals_batch,
+    fleet_window_risk,
+    paths_exceedance_probabilities,
+    risk_level,
+)
+
+@dataclass(frozen=True)
+class Scenario:
+    """
+    Scénario what-if appliqué après forecast (aucun réentraînement):
+    - users_multiplier: proxy de croissance globale (plus d'abonnés = plus de charge);
+    - region_multipliers / zone_multipliers: facteurs supplémentaires par région / type de zone;
+    - threshold_multiplier / threshold_by_zone: upgrade de capacité (global / par zone).
+    """
+    name: str
+    users_multiplier: float = 1.0
+    region_multipliers: dict = None
+    zone_multipliers: dict = None
+    threshold_multiplier: float = 1.0
+    threshold_by_zone: dict = None
+
+def multiplier_sweep(start: float = 0.8, stop: float = 2.0, step: float = 0.05) -> list[Scenario]:
+    """Grille de scénarios users_multiplier (bornes incluses), ex: 0.80, 0.85, ..., 2.00."""
+    n = int(round((stop - start) / step)) + 1
+    return [Scenario(name=f"users_x{m:.2f}", users_multiplier=round(m, 4)) for m in start + step * np.arange(n)]
+
+def _scenario_arrays(sc: Scenario, cfg: ForecastConfig, regions: np.ndarray, zones: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Multiplicateur de charge et seuil de saturation effectifs, par cellule."""
+    mult = np.full(len(zones), float(sc.users_multiplier))
+    if sc.region_multipliers:
+        mult *= np.array([sc.region_multipliers.get(r, 1.0) for r in regions], dtype=float)
+    if sc.zone_multipliers:
+        mult *= np.array([sc.zone_multipliers.get(z, 1.0) for z in zones], dtype=float)
+
+    thresholds = dict(cfg.saturation_threshold_by_zone, **(sc.threshold_by_zone or {}))
+    thr = np.array([thresholds.get(z, 800.0) for z in zones], dtype=float) * sc.threshold_multiplier
+    return mult, thr
+
+def _round(values: np.ndarray, ndigits: int) -> list[float]:
+    # même arrondi que les lignes de run_risk (round Python, pas np.round)
+    return [round(float(v), ndigits) for v in values]
+
+def evaluate_scenarios(
+    records: list[dict],
+    cfg: ForecastConfig,
+    scenarios: list[Scenario],
+    n_paths: int = 2000,
+    seed: int = 42,
+    calibrated=None,
+) -> pd.DataFrame:
+    """
+    Post-traitement vectorisé d'un lot de forecasts (enregistrements de iter_cell_forecasts)
+    pour une grille de scénarios. En mode exact (cfg.risk_method), les résidus sont calibrés
+    une fois pour tout le parc et chaque scénario est un passage de fleet_window_risk; en mode mc,
+    les chemins bootstrap sont tirés une fois par cellule et partagés par tous les scénarios
+    (même graine que run_risk => mêmes probabilités).
+    calibrated: résidus déjà calibrés (sortie de calibrate_residuals_batch), alignés sur les
+    enregistrements sans erreur, pour ne pas recalibrer à chaque appel.
+    Renvoie une table longue, une ligne par (scenario, cellule).
+    """
+    H7 = cfg.horizon_days_short * 24
+    H30 = cfg.horizon_days_long * 24
+
+    ok = [r for r in records if "error" not in r]
+    failed = [r for r in records if "error" in r]
+
+    cell_ids = np.array([r["cell_id"] for r in ok], dtype=object)
+    regions = np.array([r["region"] for r in ok], dtype=object)
+    zones = np.array([r["zone_type"] for r in ok], dtype=object)
+    maes = np.array([r["mae"] for r in ok], dtype=float)
+    Y = np.array([np.asarray(r["y_pred"], dtype=float)[:H30] for r in ok]) if ok else np.empty((0, H30))
+
+    params = [_scenario_arrays(sc, cfg, regions, zones) for sc in scenarios]
+    p7 = np.full((len(scenarios), len(ok)), np.nan)
+    p30 = np.full((len(scenarios), len(ok)), np.nan)
+    mults = np.array([m for m, _ in params]).reshape(len(scenarios), len(ok))
+    thrs = np.array([t for _, t in params]).reshape(len(scenarios), len(ok))
+    exceed_hours = np.full((len(scenarios), len(ok)), np.nan)
+    first_exceed = np.full((len(scenarios), len(ok)), np.nan)
+    tracer = get_tracer()
+    if cfg.risk_method == "exact":
+        # résidus calibrés une fois pour tout le parc, puis un passage vectorisé par scénario
+        with tracer.span("calibration"):
+            cal = calibrate_residuals_batch([r["residuals"] for r in ok]) if calibrated is None else calibrated
+        with tracer.span("risk"):
+            for k in range(len(scenarios)):
+                res = fleet_window_risk(mults[k][:, None] * Y, thrs[k], cal, horizons=[H7, H30], calibrated=True)
+                p7[k], p30[k] = res["p_saturation"][:, 0], res["p_saturation"][:, -1]
+                exceed_hours[k] = res["expected_exceedance_hours"][:, -1]
+                first_exceed[k] = res["expected_first_exceedance_h"][:, -1]
+    else:
+        with tracer.span("risk"):
+            for i, rec in enumerate(ok):
+                if np.asarray(rec["residuals"]).size == 0:
+                    continue
+                eps = bootstrap_paths(rec["residuals"], Y.shape[1], n_paths=n_paths, seed=seed)
+                tracer.count("mc_samples", eps.size, rec["cell_id"])
+                for k in range(len(scenarios)):
+                    p = paths_exceedance_probabilities(Y[i] * mults[k, i], eps, thrs[k, i], horizons=[H7, H30])
+                    p7[k, i], p30[k, i] = p[H7], p[H30]
+
+    frames = []
+    for k, sc in enumerate(scenarios):
+        mult, thr = params[k]
+        worst = np.fmax(p7[k], p30[k])
+        out = pd.DataFrame({
+            "scenario": sc.name,
+            "cell_id": cell_ids,
+            "region": regions,
+            "zone_type": zones,
+            "users_multiplier": mult,
+            "mae_valid_mbps": _round(maes, 2),
+            "saturation_threshold_mbps": thr,
+            "max_pred_j7_mbps": _round((Y[:, :H7] * mult[:, None]).max(axis=1, initial=-np.inf), 2),
+            "max_pred_j30_mbps": _round((Y * mult[:, None]).max(axis=1, initial=-np.inf), 2),
+            "p_saturation_j7": _round(p7[k], 4),
+            "p_saturation_j30": _round(p30[k], 4),
+            "risk_level": [risk_level(p) for p in worst],
+            "p_worst": _round(worst, 4),
+            "exp_exceedance_hours_j30": _round(exceed_hours[k], 2),
+            "exp_first_exceedance_h_j30": _round(first_exceed[k], 1),
+        })
+        if failed:
+            fail_mult, fail_thr = _scenario_arrays(
+                sc, cfg,
+                np.array([r["region"] for r in failed], dtype=object),
+                np.array([r["zone_type"] for r in failed], dtype=object),
+            )
+            out = pd.concat([out, pd.DataFrame({
+                "scenario": sc.name,
+                "cell_id": [r["cell_id"] for r in failed],
+                "region": [r["region"] for r in failed],
+                "zone_type": [r["zone_type"] for r in failed],
+                "users_multiplier": fail_mult,
+                "saturation_threshold_mbps": fail_thr,
+                "risk_level": "UNKNOWN",
+                "error": [r["error"] for r in failed],
+            })], ignore_index=True)
+        frames.append(out)
+
+    out = pd.concat(frames, ignore_index=True)
+    out["risk_rank"] = out["risk_level"].map(RISK_ORDER).fillna(9).astype(int)
+    out["scenario_rank"] = out["scenario"].map({sc.name: k for k, sc in enumerate(scenarios)})
+    out = out.sort_values(["scenario_rank", "risk_rank", "p_worst", "cell_id"], ascending=[True, True, False, True])
+    return out.drop(columns=["risk_rank", "scenario_rank"]).reset_index(drop=True)
+
+def forecast_records(
+    df: pd.DataFrame | CellStore,
+    cfg: ForecastConfig,
+    cell_ids=None,
+    n_workers: int = 1,
+    chunk_size: int = 4,
+    progress=None,
+    mode: str = "per_cell",
+    group_by: str | None = None,
+    registry: ModelRegistry | None = None,
+    residual_store: ResidualStore | None = None,
+) -> tuple[list[dict], list | None]:
+    """
+    Forecasts J+30 de toutes les cellules (iter_cell_forecasts) et, avec un residual_store en
+    mode exact, leurs résidus calibrés (alignés sur les enregistrements sans erreur, sinon None).
+    Entrée commune de evaluate_scenarios et de hierarchy_risk.
+    """
+    records = list(iter_cell_forecasts(
+        df, cfg, cell_ids=cell_ids, n_workers=n_workers, chunk_size=chunk_size,
+        progress=progress, mode=mode, group_by=group_by, registry=registry,
+    ))
+    cal = None
+    if residual_store is not None and cfg.risk_method == "exact":
+        cal = [
+            residual_store.calibrated(r["cell_id"], r["model_version"], residuals=r["residuals"])
+            for r in records if "error" not in r
+        ]
+    return records, cal
+
+def run_scenarios(
+    df: pd.DataFrame | CellStore,
+    cfg: ForecastConfig,
+    scenarios: list[Scenario],
+    cell_ids=None,
+    n_workers: int = 1,
+    chunk_size: int = 4,
+    progress=None,
+    mode: str = "per_cell",
+    group_by: str | None = None,
+    registry: ModelRegistry | None = None,
+    tracer: Tracer | None = None,
+    residual_store: ResidualStore | None = None,
+) -> pd.DataFrame:
+    """
+    Sweep de scénarios: un seul entraînement + forecast par cellule, puis évaluation de
+    toute la grille de scénarios en post-traitement. Un sweep de 25 points coûte à peu
+    près le prix du baseline seul.
+    tracer: Tracer (voir ncf.trace) installé pendant le run, sinon le tracer actif.
+    residual_store: calibrations lues (ou enregistrées) dans le store, par cellule et version de modèle.
+    Renvoie une table longue indexée par la colonne scenario.
+    """
+    with tracing(tracer if tracer is not None else get_tracer()):
+        records, cal = forecast_records(
+            df, cfg, cell_ids=cell_ids, n_workers=n_workers, chunk_size=chunk_size,
+            progress=progress, mode=mode, group_by=group_by, registry=registry, residual_store=residual_store,
+        )
+        return evaluate_scenarios(records, cfg, scenarios, calibrated=cal)
+
+def scenario_report(long: pd.DataFrame, name: str) -> pd.DataFrame:
+    """Rapport d'un scénario au format de run_risk (sans la colonne scenario)."""
+    out = long[long["scenario"] == name].drop(columns=["scenario"])
+    if "error" in out.columns and out["error"].isna().all():
+        out = out.drop(columns=["error"])
+    return out.reset_index(drop=True)
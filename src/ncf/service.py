@@ -0,0 +1,376 @@
+import argparse
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from .config import ForecastConfig
+from .cellstore import as_cell_store
+from .features import add_saturation_label
+from .direct import STRATEGIES, forecast_direct_ring
+from .fleet import TRAIN_END, failed_cell, train_cell
+from .forecast import rollout
+from .ingest import DATASET_DIR, list_cells, read_cells
+from .online import CsvFeed, OnlineFeatureStore
+from .registry import ModelRegistry
+from .residuals import ResidualStore
+from .scenarios import Scenario, evaluate_scenarios
+from .tuning import tuned_config
+
+# résidus mis à jour en ligne par le service: racine distincte de celle de run_mvp (RESIDUALS_DIR)
+SERVICE_RESIDUALS_DIR = "models/residuals_service"
+
+class LatencyMetrics:
+    """Latences des dernières requêtes par route (fenêtre glissante) + compteurs cumulés."""
+
+    def __init__(self, window: int = 10000):
+        self.window = window
+        self.started = time.perf_counter()
+        self.latencies = {}
+        self.counts = {}
+        self.errors = {}
+
+    def record(self, route: str, seconds: float, ok: bool = True):
+        self.latencies.setdefault(route, deque(maxlen=self.window)).append(seconds)
+        self.counts[route] = self.counts.get(route, 0) + 1
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def snapshot(self) -> dict:
+        uptime = time.perf_counter() - self.started
+        routes = {}
+        for route, lat in self.latencies.items():
+            ms = np.asarray(lat) * 1000.0
+            routes[route] = {
+                "requests": self.counts[route],
+                "errors": self.errors.get(route, 0),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p99_ms": round(float(np.percentile(ms, 99)), 3),
+                "throughput_rps": round(self.counts[route] / uptime, 2),
+            }
+        return {"uptime_s": round(uptime, 1), "total_requests": sum(self.counts.values()), "routes": routes}
+
+class ForecastService:
+    """
+    Etat chaud du service, par cellule: modèle, features, MAE, résidus calibrés (triés),
+    état de lags en ligne (OnlineFeatureStore) et dernier forecast J+30 (cache invalidé
+    quand de nouvelles heures arrivent du flux).
+    Les forecasts manquants sont calculés par micro-lots: les requêtes arrivées pendant
+    window_s sont regroupées en un seul rollout (un predict par pas et par modèle).
+    failed: cellules dont l'entraînement a échoué (cell_id -> erreur), répondues en 404.
+    """
+
+    def __init__(
+        self,
+        cfg: ForecastConfig,
+        cells: dict,
+        online: OnlineFeatureStore,
+        residuals: ResidualStore,
+        window_s: float = 0.002,
+        max_batch: int = 512,
+        failed: dict | None = None,
+    ):
+        self.cfg = cfg
+        self.cells = cells
+        self.failed = dict(failed or {})
+        self.online = online
+        self.residuals = residuals
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self.metrics = LatencyMetrics()
+        self.batches = {"count": 0, "cells": 0}
+        self._forecasts = {}
+        self._lock = threading.Lock()  # état en ligne partagé entre boucle et exécuteur
+        self._pending = {}
+        self._flush_task = None
+
+    @classmethod
+    def from_history(
+        cls,
+        source,
+        cfg: ForecastConfig,
+        cell_ids=None,
+        registry: ModelRegistry | None = None,
+        train_end: str | None = TRAIN_END,
+        residuals: ResidualStore | None = None,
+        **kwargs,
+    ) -> "ForecastService":
+        """
+        Modèles entraînés comme par run_mvp (train_cell: cfg.forecast_strategy, cfg.tuned_params).
+        residuals: store de résidus (par défaut en mémoire, fenêtre glissante de 720 h);
+        les heures ingérées y ajoutent l'erreur du forecast à 1 pas.
+        Une cellule dont l'entraînement échoue est écartée (service.failed), sans bloquer le démarrage.
+        """
+        store = as_cell_store(source)
+        if residuals is None:
+            residuals = ResidualStore(root=None, max_cells=max(len(store.cell_ids), 1), window=720)
+        cell_ids = store.cell_ids if cell_ids is None else [str(c) for c in cell_ids]
+        cells, failed = {}, {}
+        for cell_id in cell_ids:
+            df_cell = store.frame(cell_id)
+            try:
+                rec = train_cell(df_cell, cfg, train_end=train_end, registry=registry)
+            except Exception as exc:
+                failed[cell_id] = failed_cell(df_cell, exc)["error"]
+                print(f"⚠️ cellule {cell_id} ignorée: {failed[cell_id]}")
+                continue
+            if residuals.raw(cell_id, rec["model_version"]) is None:
+                residuals.put(cell_id, rec["model_version"], rec["residuals"])
+            cells[cell_id] = dict(
+                cell_id=cell_id, region=str(rec["region"]), zone_type=str(rec["zone_type"]),
+                model=rec["model"], feats=rec["feats"], mae=float(rec["mae"]), model_version=rec["model_version"],
+            )
+        online = OnlineFeatureStore.from_history(store, cell_ids=list(cells))
+        return cls(cfg, cells, online, residuals, failed=failed, **kwargs)
+
+    # --- forecasts (micro-lots) ---
+
+    def _rollout(self, cell_ids: list[str]) -> dict:
+        """Forecast J+30 d'un lot de cellules (exécuté hors de la boucle asyncio)."""
+        H30 = self.cfg.horizon_days_long * 24
+        out = {}
+        groups = {}
+        for c in cell_ids:
+            groups.setdefault(tuple(self.cells[c]["feats"]), []).append(c)
+        for feats, group in groups.items():
+            with self._lock:
+                ring = self.online.ring(group)
+                version = ring.last_ts.copy()
+            models = [self.cells[c]["model"] for c in group]
+            if self.cfg.forecast_strategy == "direct":
+                preds = forecast_direct_ring(models, ring, list(feats), H30, lags=self.online.lags)
+            else:
+                preds = rollout(models, ring, list(feats), H30, lags=self.online.lags, backend=self.cfg.inference_backend)
+            for i, c in enumerate(group):
+                out[c] = (version[i], preds[i])
+        return out
+
+    async def _flush(self):
+        await asyncio.sleep(self.window_s)
+        pending, self._pending, self._flush_task = self._pending, {}, None
+        cell_ids = list(pending)
+        loop = asyncio.get_running_loop()
+        try:
+            results = {}
+            for i in range(0, len(cell_ids), self.max_batch):
+                results.update(await loop.run_in_executor(None, self._rollout, cell_ids[i:i + self.max_batch]))
+        except Exception as exc:
+            for futures in pending.values():
+                for f in futures:
+                    f.set_exception(exc)
+            return
+        self.batches["count"] += 1
+        self.batches["cells"] += len(cell_ids)
+        for c, (version, y_pred) in results.items():
+            # le forecast n'est gardé en cache que si l'état n'a pas bougé entre-temps
+            if self.online.last_ts[self.online.rows([c])[0]] == version:
+                self._forecasts[c] = y_pred
+            for f in pending[c]:
+                f.set_result(y_pred)
+
+    async def forecast(self, cell_id: str) -> np.ndarray:
+        if cell_id in self.failed:
+            raise KeyError(f"{cell_id} (training failed: {self.failed[cell_id]})")
+        if cell_id not in self.cells:
+            raise KeyError(cell_id)
+        if cell_id in self._forecasts:
+            return self._forecasts[cell_id]
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(cell_id, []).append(fut)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+        return await fut
+
+    async def warm(self):
+        """Forecasts de toutes les cellules en un lot, avant d'accepter des requêtes."""
+        await asyncio.gather(*(self.forecast(c) for c in self.cells))
+
+    def _observe(self, batch: pd.DataFrame):
+        """
+        Erreur du forecast à 1 pas (même nature que les résidus de validation) pour chaque
+        cellule dont le forecast en cache démarre à l'heure observée: ajoutée à la fenêtre
+        de résidus de la cellule.
+        """
+        batch = batch[batch["cell_id"].astype(str).isin(self._forecasts.keys())]
+        if batch.empty:
+            return
+        cell_ids = batch["cell_id"].astype(str).to_numpy()
+        next_ts = self.online.last_ts[self.online.rows(cell_ids)] + np.timedelta64(1, "h")
+        hit = batch["timestamp"].to_numpy().astype(next_ts.dtype) == next_ts
+        for c, y in zip(cell_ids[hit], batch["traffic_mbps"].to_numpy(dtype=float)[hit]):
+            self.residuals.update(c, self.cells[c]["model_version"], [y], [self._forecasts[c][0]])
+
+    def ingest(self, batch: pd.DataFrame) -> int:
+        """
+        Nouvelles heures de compteurs: fenêtre de résidus mise à jour, état de lags avancé,
+        forecasts concernés invalidés.
+        """
+        with self._lock:
+            self._observe(batch)
+            n = self.online.consume(batch)
+        for c in set(batch["cell_id"].astype(str)):
+            self._forecasts.pop(c, None)
+        return n
+
+    # --- risque / scénarios ---
+
+    def _records(self, cell_ids, forecasts) -> list[dict]:
+        keys = ("cell_id", "region", "zone_type", "mae", "model_version")
+        return [
+            dict({k: self.cells[c][k] for k in keys}, residuals=self.residuals.raw(c, self.cells[c]["model_version"]), y_pred=y)
+            for c, y in zip(cell_ids, forecasts)
+        ]
+
+    async def scenarios(self, cell_ids: list[str], scenarios: list[Scenario]) -> pd.DataFrame:
+        forecasts = await asyncio.gather(*(self.forecast(c) for c in cell_ids))
+        cal = [self.residuals.calibrated(c, self.cells[c]["model_version"]) for c in cell_ids]
+        return evaluate_scenarios(self._records(cell_ids, forecasts), self.cfg, scenarios, calibrated=cal)
+
+    async def risk(self, cell_id: str, users_multiplier: float = 1.0) -> dict:
+        """Ligne au format run_risk pour une cellule et un multiplicateur d'abonnés."""
+        long = await self.scenarios([cell_id], [Scenario("request", users_multiplier=users_multiplier)])
+        return long.drop(columns=["scenario"]).iloc[0].to_dict()
+
+    # --- HTTP ---
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> tuple[int, object]:
+        url = urlsplit(target)
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        path = url.path.rstrip("/") or "/"
+
+        if path == "/health":
+            return 200, {"status": "ok", "cells": len(self.cells), "failed": len(self.failed)}
+        if path == "/metrics":
+            out = self.metrics.snapshot()
+            out["predict_batches"] = self.batches["count"]
+            out["mean_batch_cells"] = round(self.batches["cells"] / max(self.batches["count"], 1), 2)
+            return 200, out
+        if path == "/forecast":
+            cell_id = q["cell_id"]
+            hours = int(q.get("hours", self.cfg.horizon_days_long * 24))
+            y = await self.forecast(cell_id)
+            last = self.online.last_ts[self.online.rows([cell_id])[0]]
+            ts = last + np.arange(1, len(y) + 1).astype("timedelta64[h]")
+            return 200, {
+                "cell_id": cell_id,
+                "timestamp": [str(t) for t in ts[:hours].astype("datetime64[s]")],
+                "y_pred": [round(float(v), 2) for v in y[:hours]],
+            }
+        if path == "/risk":
+            return 200, await self.risk(q["cell_id"], float(q.get("users_multiplier", 1.0)))
+        if path == "/scenario" and method == "POST":
+            req = json.loads(body or b"{}")
+            cell_ids = [str(c) for c in req.get("cell_ids") or list(self.cells)]
+            scenarios = [Scenario(**s) for s in req.get("scenarios") or [{"name": "baseline"}]]
+            return 200, (await self.scenarios(cell_ids, scenarios)).to_dict(orient="records")
+        if path == "/ingest" and method == "POST":
+            rows = pd.DataFrame(json.loads(body or b"[]"))
+            rows["timestamp"] = pd.to_datetime(rows["timestamp"])
+            return 200, {"updated": self.ingest(rows)}
+        return 404, {"error": f"unknown route {method} {path}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """HTTP/1.1 minimal (keep-alive, réponses JSON)."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, v = h.decode("latin-1").split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                t0 = time.perf_counter()
+                try:
+                    status, payload = await self.dispatch(method, target, body)
+                except KeyError as exc:
+                    status, payload = 404, {"error": f"unknown cell or missing parameter: {exc}"}
+                except Exception as exc:
+                    status, payload = 500, {"error": f"{type(exc).__name__}: {exc}"}
+                route = urlsplit(target).path
+                if route != "/metrics":
+                    self.metrics.record(route, time.perf_counter() - t0, ok=status == 200)
+
+                data = json.dumps(_jsonable(payload)).encode()
+                reason = {200: "OK", 404: "Not Found", 500: "Internal Server Error"}[status]
+                writer.write(
+                    f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def poll_feed(self, feed: CsvFeed, every_s: float = 1.0):
+        while True:
+            batch = feed.poll()
+            if len(batch):
+                self.ingest(batch)
+            await asyncio.sleep(every_s)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765, feed: CsvFeed | None = None):
+        await self.warm()
+        server = await asyncio.start_server(self.handle, host, port)
+        if feed is not None:
+            asyncio.create_task(self.poll_feed(feed))
+        print(f"OK ✅ service prêt sur http://{host}:{port} ({len(self.cells)} cellules)")
+        async with server:
+            await server.serve_forever()
+
+def _jsonable(obj):
+    """NaN -> null et types numpy -> types Python, pour un JSON valide."""
+    if isinstance(obj, dict):
+        return {k: _jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(v) for v in obj]
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and math.isnan(obj):
+        return None
+    return obj
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP local forecast / risque / scénarios (modèles chauds).")
+    parser.add_argument("--data", default=DATASET_DIR)
+    parser.add_argument("--max-cells", type=int, default=20)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--feed", default=None, help="CSV en ajout seul (timestamp, cell_id, users, traffic_mbps)")
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--strategy", choices=STRATEGIES, default="autoregressive", help="même stratégie que run_mvp --strategy")
+    args = parser.parse_args()
+
+    # même config que run_mvp: stratégie et hyperparamètres de models/tuning.json
+    cfg = tuned_config(forecast_strategy=args.strategy)
+    cell_ids = list_cells(args.data)[:args.max_cells]
+    df = add_saturation_label(read_cells(args.data, cell_ids=cell_ids), cfg.saturation_threshold_by_zone)
+    print(f"Chargement des modèles ({len(cell_ids)} cellules)…")
+    service = ForecastService.from_history(
+        df, cfg, cell_ids=cell_ids,
+        # le registry ne stocke que les modèles auto-régressifs (comme run_mvp)
+        registry=ModelRegistry() if cfg.forecast_strategy == "autoregressive" else None,
+        train_end=None,  # rolling_train_end, comme run_mvp
+        residuals=ResidualStore(root=SERVICE_RESIDUALS_DIR, window=720), window_s=args.window_ms / 1000,
+    )
+    feed = CsvFeed(args.feed) if args.feed else None
+    asyncio.run(service.serve(args.host, args.port, feed=feed))
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,142 @@
 import numpy as np
 import pandas as pd
 
+from .features import USERS_DTYPES, _int_dtype
+
+REGIONS = ["IDF", "NAQ", "ARA", "PACA", "HDF", "OCC", "BRE", "PDL"]
+ZONE_TYPES = ["urban", "suburban", "rural"]
+
+# base selon zone
+BASE_USERS = {"urban": 450, "suburban": 260, "rural": 120}
+BASE_TRAFFIC = {"urban": 520, "suburban": 320, "rural": 160}  # Mbps
+CAPACITY_FACTOR = {"urban": 1.25, "suburban": 1.0, "rural": 0.85}
+
+def _seasonal_terms(dt: pd.DatetimeIndex) -> dict:
+    """Termes calendaires communs à toutes les cellules, calculés une seule fois."""
+    # tendance lente (croissance)
+    trend = np.linspace(0, 0.18, len(dt))  # +18% sur la période
+
+    # saisonnalités
+    hour = dt.hour.values
+    dow = dt.dayofweek.values
+    month = dt.month.values
+
+    # profil heure: pics matin/soir
+    hour_season = (
+        0.25*np.sin(2*np.pi*(hour/24 - 0.2)) +
+        0.35*np.exp(-0.5*((hour-20)/3.2)**2) +
+        0.18*np.exp(-0.5*((hour-9)/2.8)**2)
+    )
+
+    # week-end: pattern différent
+    weekend = (dow >= 5).astype(float)
+    weekend_boost = 0.10*weekend
+
+    # mois: hiver + été (tourisme)
+    month_season = 0.08*np.cos(2*np.pi*(month/12 - 0.05)) + 0.06*np.exp(-0.5*((month-8)/1.4)**2)
+
+    # même ordre d'évaluation que la formule par cellule => valeurs identiques au bit près
+    return {
+        "users": 1 + trend + hour_season + weekend_boost + month_season,
+        "traffic": 1 + trend + 0.9*hour_season + 0.6*weekend_boost + 0.7*month_season,
+    }
+
+def _fleet_plan(start, end, n_cells, seed) -> dict:
+    rng = np.random.default_rng(seed)
+    dt = pd.date_range(start=start, end=end, freq="h", inclusive="left")
+    cells = [f"CELL_{i:04d}" for i in range(n_cells)]
+
+    cell_region = [rng.choice(REGIONS) for _ in cells]
+    cell_zone = [rng.choice(ZONE_TYPES, p=[0.45, 0.35, 0.20]) for _ in cells]
+
+    # événements: quelques jours dans l'année (concert, match)
+    event_days = pd.to_datetime(rng.choice(pd.date_range(dt.min().date(), dt.max().date(), freq="D"), size=120, replace=False))
+    event_flag = dt.normalize().isin(event_days.normalize()).astype(float)
+
+    return {
+        "rng": rng,
+        "dt": dt,
+        "cells": cells,
+        "region": np.asarray(cell_region),
+        "zone": np.asarray(cell_zone),
+        "event_flag": event_flag,
+        "season": _seasonal_terms(dt),
+    }
+
+def _generate_block(plan: dict, lo: int, hi: int, categorical: bool) -> pd.DataFrame:
+    """
+    Cellules [lo, hi) en blocs (cellules × heures). Les tirages restent faits cellule par
+    cellule, dans l'ordre historique, pour rester reproductibles à graine égale.
+    """
+    rng, dt = plan["rng"], plan["dt"]
+    n, T = hi - lo, len(dt)
+    zones = plan["zone"][lo:hi]
+    flag = plan["event_flag"]
+
+    rand_event = np.empty((n, T))
+    noise_u = np.empty((n, T))
+    noise_t = np.empty((n, T))
+    for i in range(n):
+        rand_event[i] = rng.random(T)
+        noise_u[i] = rng.normal(0, 18, T)
+        noise_t[i] = rng.normal(0, 35, T)
+
+    # événement: impulsion trafic + users sur certaines dates
+    event_boost = flag * (0.22 + 0.15*rand_event)
+
+    base_users = np.array([BASE_USERS[z] for z in zones], dtype=float)[:, None]
+    users = base_users * (plan["season"]["users"] + 0.35*event_boost) + noise_u
+    users = np.clip(users, 10, None)
+
+    # traffic dépend users + bruit + capacité locale
+    base_traffic = np.array([BASE_TRAFFIC[z] * CAPACITY_FACTOR[z] for z in zones], dtype=float)[:, None]
+    traffic = base_traffic * (plan["season"]["traffic"] + 1.0*event_boost) \
+             + 0.45*(users - users.mean(axis=1, keepdims=True)) + noise_t
+    traffic = np.clip(traffic, 1, None)
+
+    cell_id = np.repeat(np.asarray(plan["cells"][lo:hi], dtype=object), T)
+    region = np.repeat(plan["region"][lo:hi], T)
+    zone = np.repeat(zones, T)
+    if categorical:
+        cell_id = pd.Categorical(cell_id, categories=plan["cells"])
+        region = pd.Categorical(region, categories=REGIONS)
+        zone = pd.Categorical(zone, categories=ZONE_TYPES)
+
+    # schéma compact (features.COMPACT_DTYPES): trafic float32, compteurs en petits entiers
+    users = users.round(0).ravel()
+    return pd.DataFrame({
+        "timestamp": np.tile(dt.values, n),
+        "cell_id": cell_id,
+        "region": region,
+        "zone_type": zone,
+        "event_flag": np.tile(flag.astype(np.int8), n),
+        "users": users.astype(_int_dtype(users, USERS_DTYPES)),
+        "traffic_mbps": traffic.round(2).ravel().astype(np.float32),
+    })
+
+def iter_synthetic_chunks(
+    start="2023-01-01",
+    end="2025-12-31",
+    n_cells=80,
+    seed=42,
+    chunk_cells=256,
+    categorical=True,
+):
+    """
+    Même données que generate_synthetic_network_data, produites par paquets de
+    chunk_cells cellules (mémoire bornée à chunk_cells × heures par colonne).
+    """
+    plan = _fleet_plan(start, end, n_cells, seed)
+    for lo in range(0, n_cells, chunk_cells):
+        yield _generate_block(plan, lo, min(lo + chunk_cells, n_cells), categorical)
+
 def generate_synthetic_network_data(
     start="2023-01-01",
     end="2025-12-31",
     n_cells=80,
-    seed=42
+    seed=42,
+    chunk_cells=256,
+    categorical=True,
 ) -> pd.DataFrame:
     """
     Génère des données horaires par cellule:
@@ -14,77 +145,28 @@ def generate_synthetic_network_data(
     - zone_type
     - event_flag
     - region
+    cell_id / region / zone_type en dtype category (categorical=False pour des chaînes).
     """
-    rng = np.random.default_rng(seed)
-    dt = pd.date_range(start=start, end=end, freq="h", inclusive="left")
-    cells = [f"CELL_{i:04d}" for i in range(n_cells)]
-
-    regions = ["IDF", "NAQ", "ARA", "PACA", "HDF", "OCC", "BRE", "PDL"]
-    zone_types = ["urban", "suburban", "rural"]
+    return pd.concat(
+        iter_synthetic_chunks(start, end, n_cells, seed, chunk_cells=chunk_cells, categorical=categorical),
+        ignore_index=True,
+    )
 
-    cell_region = {c: rng.choice(regions) for c in cells}
-    cell_zone = {c: rng.choice(zone_types, p=[0.45, 0.35, 0.20]) for c in cells}
+def write_synthetic_dataset(
+    root: str,
+    start="2023-01-01",
+    end="2025-12-31",
+    n_cells=80,
+    seed=42,
+    chunk_cells=256,
+    partition_cols=("region", "month"),
+) -> str:
+    """
+    Ecrit le parc synthétique en dataset Parquet partitionné (hive: region=.../month=YYYY-MM/),
+    paquet par paquet, sans jamais matérialiser tout le parc en mémoire.
+    """
+    from .ingest import write_cell_frames
 
-    # événements: quelques jours dans l'année (concert, match)
-    event_days = pd.to_datetime(rng.choice(pd.date_range(dt.min().date(), dt.max().date(), freq="D"), size=120, replace=False))
-    event_days = set(event_days.date)
-
-    rows = []
-    for cell in cells:
-        zone = cell_zone[cell]
-        region = cell_region[cell]
-
-        # base selon zone
-        base_users = {"urban": 450, "suburban": 260, "rural": 120}[zone]
-        base_traffic = {"urban": 520, "suburban": 320, "rural": 160}[zone]  # Mbps
-
-        # tendance lente (croissance)
-        trend = np.linspace(0, 0.18, len(dt))  # +18% sur la période
-
-        # saisonnalités
-        hour = dt.hour.values
-        dow = dt.dayofweek.values
-        month = dt.month.values
-
-        # profil heure: pics matin/soir
-        hour_season = (
-            0.25*np.sin(2*np.pi*(hour/24 - 0.2)) +
-            0.35*np.exp(-0.5*((hour-20)/3.2)**2) +
-            0.18*np.exp(-0.5*((hour-9)/2.8)**2)
-        )
-
-        # week-end: pattern différent
-        weekend = (dow >= 5).astype(float)
-        weekend_boost = 0.10*weekend
-
-        # mois: hiver + été (tourisme)
-        month_season = 0.08*np.cos(2*np.pi*(month/12 - 0.05)) + 0.06*np.exp(-0.5*((month-8)/1.4)**2)
-
-        # événement: impulsion trafic + users sur certaines dates
-        event_flag = np.array([1 if d.date() in event_days else 0 for d in dt], dtype=float)
-        event_boost = event_flag * (0.22 + 0.15*rng.random(len(dt)))
-
-        # users
-        noise_u = rng.normal(0, 18, len(dt))
-        users = base_users * (1 + trend + hour_season + weekend_boost + month_season + 0.35*event_boost) + noise_u
-        users = np.clip(users, 10, None)
-
-        # traffic dépend users + bruit + capacité locale
-        capacity_factor = {"urban": 1.25, "suburban": 1.0, "rural": 0.85}[zone]
-        noise_t = rng.normal(0, 35, len(dt))
-        traffic = (base_traffic * capacity_factor) * (1 + trend + 0.9*hour_season + 0.6*weekend_boost + 0.7*month_season + 1.0*event_boost) \
-                 + 0.45*(users - users.mean()) + noise_t
-        traffic = np.clip(traffic, 1, None)
-
-        df_cell = pd.DataFrame({
-            "timestamp": dt,
-            "cell_id": cell,
-            "region": region,
-            "zone_type": zone,
-            "event_flag": event_flag.astype(int),
-            "users": users.round(0).astype(int),
-            "traffic_mbps": traffic.round(2),
-        })
-        rows.append(df_cell)
-
-    return pd.concat(rows, ignore_index=True)
+    for k, chunk in enumerate(iter_synthetic_chunks(start, end, n_cells, seed, chunk_cells=chunk_cells)):
+        write_cell_frames(chunk, root, partition_cols=partition_cols, basename=f"chunk{k:05d}")
+    return root
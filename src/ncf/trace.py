@@ -0,0 +1,169 @@
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+def rss_mb() -> float:
+    """
+    Pic de RSS du processus depuis son démarrage, en Mo (ru_maxrss: Ko sous Linux, octets
+    sous macOS). Cumulatif: ne redescend jamais, et hérité au fork.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class Tracer:
+    """
+    Instrumentation légère du pipeline de risque:
+    - span(name, cell_id): durée d'une étape (training, forecast, calibration, risk), par cellule
+      (cell_id: liste => étape d'un lot, durée répartie entre ses cellules);
+    - count(name, n, cell_id): compteurs (rows, trees, predict_calls, mc_samples);
+    - pic de RSS relevé à la fin de chaque span;
+    - profile: étapes profilées avec cProfile (un fichier .pstats par étape et par processus
+      dans profile_dir).
+    Désactivé (NULL_TRACER, défaut), chaque appel est un no-op.
+    """
+
+    enabled = True
+
+    def __init__(self, profile=(), profile_dir: str = "reports/profiles"):
+        self.profile = tuple(profile)
+        self.profile_dir = profile_dir
+        self.spans = []
+        self.counters = {}
+        self.cell_counters = {}
+        self._cell_seconds = {}
+        self._profilers = {}
+        self._t0 = time.perf_counter()
+
+    def config(self) -> dict:
+        """Paramètres pour recréer un tracer équivalent dans un worker."""
+        return {"profile": self.profile, "profile_dir": self.profile_dir}
+
+    @contextmanager
+    def span(self, name: str, cell_id=None):
+        prof = None
+        if name in self.profile:
+            prof = self._profilers.setdefault(name, cProfile.Profile())
+            prof.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if prof is not None:
+                prof.disable()
+            # span d'un lot de cellules (liste de cell_id): un span par cellule, temps partagé
+            cells = list(cell_id) if isinstance(cell_id, (list, tuple)) else [cell_id]
+            seconds = (end - start) / max(len(cells), 1)
+            for c in cells:
+                if c is not None:
+                    c = str(c)
+                    self._cell_seconds[c] = self._cell_seconds.get(c, 0.0) + seconds
+                self.spans.append({
+                    "name": name,
+                    "cell_id": c,
+                    "start_s": round(start - self._t0, 6),
+                    "seconds": seconds,
+                    "pid": os.getpid(),
+                    "rss_mb": round(rss_mb(), 1),
+                })
+
+    def count(self, name: str, n: int = 1, cell_id=None):
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+        if cell_id is not None:
+            c = self.cell_counters.setdefault(str(cell_id), {})
+            c[name] = c.get(name, 0) + int(n)
+
+    def cell_seconds(self, cell_id) -> float:
+        """Temps total des spans d'une cellule."""
+        return self._cell_seconds.get(str(cell_id), 0.0)
+
+    def drain(self) -> dict:
+        """Spans et compteurs accumulés depuis le dernier drain (envoyés d'un worker au parent)."""
+        out = {"spans": self.spans, "counters": self.counters, "cell_counters": self.cell_counters}
+        self.spans, self.counters, self.cell_counters = [], {}, {}
+        return out
+
+    def merge(self, part: dict):
+        self.spans.extend(part["spans"])
+        for s in part["spans"]:
+            if s["cell_id"] is not None:
+                self._cell_seconds[s["cell_id"]] = self._cell_seconds.get(s["cell_id"], 0.0) + s["seconds"]
+        for k, v in part["counters"].items():
+            self.counters[k] = self.counters.get(k, 0) + v
+        for cell_id, counters in part["cell_counters"].items():
+            c = self.cell_counters.setdefault(cell_id, {})
+            for k, v in counters.items():
+                c[k] = c.get(k, 0) + v
+
+    def write_profiles(self):
+        if not self._profilers:
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        for name, prof in self._profilers.items():
+            prof.dump_stats(os.path.join(self.profile_dir, f"{name}.{os.getpid()}.pstats"))
+
+    def summary(self) -> dict:
+        """Par étape: nb de spans, temps total, p50, max et cellule la plus lente."""
+        out = {}
+        for name in dict.fromkeys(s["name"] for s in self.spans):
+            spans = [s for s in self.spans if s["name"] == name]
+            sec = np.array([s["seconds"] for s in spans])
+            slowest = spans[int(sec.argmax())]
+            out[name] = {
+                "count": len(spans),
+                "total_s": round(float(sec.sum()), 4),
+                "p50_s": round(float(np.median(sec)), 4),
+                "max_s": round(float(sec.max()), 4),
+                "slowest_cell": slowest["cell_id"],
+            }
+        return out
+
+    def to_dict(self) -> dict:
+        return {
+            "wall_s": round(time.perf_counter() - self._t0, 4),
+            "peak_rss_mb": round(max([rss_mb()] + [s["rss_mb"] for s in self.spans]), 1),
+            "summary": self.summary(),
+            "counters": self.counters,
+            "cell_counters": self.cell_counters,
+            "spans": self.spans,
+        }
+
+    def write_json(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        self.write_profiles()
+
+class _NullTracer:
+    """Tracer désactivé: aucune mesure, aucune allocation."""
+
+    enabled = False
+    _span = nullcontext()
+
+    def span(self, name: str, cell_id=None):
+        return self._span
+
+    def count(self, name: str, n: int = 1, cell_id=None):
+        pass
+
+NULL_TRACER = _NullTracer()
+_active = NULL_TRACER
+
+def get_tracer():
+    return _active
+
+@contextmanager
+def tracing(tracer):
+    """Installe tracer comme tracer actif (par processus) le temps du bloc."""
+    global _active
+    previous, _active = _active, (tracer if tracer is not None else NULL_TRACER)
+    try:
+        yield _active
+    finally:
+        _active = previous
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+
+from .cellstore import CellStore, as_cell_store
+from .config import ForecastConfig
+from .features import add_saturation_label
+from .forecast import forecast_xgb_batch
+from .model_xgb import NON_FEATURES, XGB_PARAMS, make_supervised, train_xgb_forecast
+from .simulate import generate_synthetic_network_data
+
+TUNING_PATH = "models/tuning.json"
+OUTDIR = "reports/benchmarks"
+# n_estimators n'est pas cherché: il vient de l'early stopping (plafond XGB_PARAMS["n_estimators"])
+SEARCH_SPACE = {"max_depth": (3, 4, 6, 8), "learning_rate": (0.05, 0.1, 0.2)}
+EARLY_STOPPING_ROUNDS = 30
+
+def rolling_origin_folds(
+    timestamps: pd.Series,
+    train_end: str,
+    n_folds: int = 3,
+    fold_hours: int = 168,
+    tail_hours: int = 168,
+) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Plis à origine glissante avant train_end, le plus récent en premier: pour le pli k,
+    origine = train_end - (k + 1) × fold_hours; fit sur les heures < origine - tail_hours,
+    early stopping sur la queue [origine - tail_hours, origine), validation sur
+    [origine, origine + fold_hours). Renvoie [(fit, tail, valid)] en masques booléens.
+    """
+    ts = pd.to_datetime(timestamps).to_numpy()
+    end = pd.to_datetime(train_end).to_datetime64()
+    hour = np.timedelta64(1, "h")
+    folds = []
+    for k in range(n_folds):
+        origin = end - (k + 1) * fold_hours * hour
+        fit = ts < origin - tail_hours * hour
+        tail = (ts >= origin - tail_hours * hour) & (ts < origin)
+        valid = (ts >= origin) & (ts < origin + fold_hours * hour)
+        if fit.any() and tail.any() and valid.any():
+            folds.append((fit, tail, valid))
+    return folds
+
+def _cell_data(df_cell: pd.DataFrame, train_end: str, n_folds: int) -> dict:
+    sup = make_supervised(df_cell)
+    feats = [c for c in sup.columns if c not in NON_FEATURES]
+    folds = rolling_origin_folds(sup["timestamp"], train_end, n_folds=n_folds)
+    if not folds:
+        raise ValueError(f"No rolling-origin fold before train_end={train_end}.")
+    return {"X": sup[feats].to_numpy(dtype=float), "y": sup["traffic_mbps"].to_numpy(dtype=float), "folds": folds}
+
+def evaluate(cells: list[dict], candidate: dict, n_folds: int) -> dict:
+    """MAE moyenne et nb d'arbres retenu par early stopping d'un candidat, sur les n_folds plis les plus récents."""
+    maes, trees = [], []
+    for d in cells:
+        X, y = d["X"], d["y"]
+        for fit, tail, valid in d["folds"][:n_folds]:
+            model = XGBRegressor(**dict(XGB_PARAMS, **candidate, early_stopping_rounds=EARLY_STOPPING_ROUNDS))
+            model.fit(X[fit], y[fit], eval_set=[(X[tail], y[tail])], verbose=False)
+            maes.append(float(np.abs(model.predict(X[valid]) - y[valid]).mean()))
+            trees.append(model.best_iteration + 1)
+    return {"mae": float(np.mean(maes)), "n_trees": float(np.mean(trees)), "fits": len(maes)}
+
+def _schedule(n_candidates: int, n_folds: int, eta: int) -> list[int]:
+    """Nb de candidats par palier (palier r: r + 1 plis)."""
+    out = []
+    for _ in range(n_folds):
+        out.append(n_candidates)
+        n_candidates = max(1, n_candidates // eta)
+    return out
+
+def successive_halving(cells: list[dict], candidates: list[dict], n_folds: int, eta: int = 3) -> tuple[dict, dict, list[dict]]:
+    """
+    Palier r: chaque candidat restant est évalué sur les r + 1 plis les plus récents, seul
+    le meilleur 1/eta (MAE) passe au palier suivant.
+    Renvoie (meilleur, son évaluation au dernier palier, historique des évaluations).
+    """
+    history = []
+    alive = list(candidates)
+    for rung, n_keep in enumerate(_schedule(len(candidates), n_folds, eta)):
+        scored = [(evaluate(cells, c, rung + 1), c) for c in alive[:n_keep]]
+        scored.sort(key=lambda s: s[0]["mae"])
+        history.extend(dict(c, rung=rung, **res) for res, c in scored)
+        alive = [c for _, c in scored]
+    res, best = scored[0]
+    return dict(best, n_estimators=int(np.ceil(res["n_trees"]))), res, history
+
+def _tune_unit(key: str, frames: list[pd.DataFrame], train_end: str, n_folds: int, eta: int, max_fits: int, seed: int) -> dict:
+    t0 = time.perf_counter()
+    cells = [_cell_data(f, train_end, n_folds) for f in frames]
+    n_folds = min(len(d["folds"]) for d in cells)
+    candidates = [dict(zip(SEARCH_SPACE, v)) for v in product(*SEARCH_SPACE.values())]
+
+    # budget: moins de candidats de départ (tirés au hasard) tant que le nb de fits le dépasse
+    rng = np.random.default_rng(seed)
+    rng.shuffle(candidates)
+
+    def cost(n: int) -> int:
+        return len(frames) * sum((r + 1) * k for r, k in enumerate(_schedule(n, n_folds, eta)))
+
+    n = len(candidates)
+    while n > 1 and cost(n) > max_fits:
+        n -= 1
+
+    best, score, history = successive_halving(cells, candidates[:n], n_folds, eta)
+    return {
+        "key": key,
+        "params": best,
+        "mae": score["mae"],
+        "fits": int(sum(h["fits"] for h in history)),
+        "seconds": time.perf_counter() - t0,
+    }
+
+def tune(
+    df,
+    train_end: str,
+    cell_ids=None,
+    group_by: str | None = None,
+    cells_per_group: int = 4,
+    n_workers: int = 1,
+    max_fits: int = 40,
+    n_folds: int = 3,
+    eta: int = 3,
+    seed: int = 42,
+) -> dict:
+    """
+    Recherche max_depth / learning_rate (+ n_estimators par early stopping) par cellule,
+    ou par groupe (group_by="zone_type" / "region", sur cells_per_group cellules du groupe).
+    Une recherche (successive halving, max_fits fits au plus) par cellule / groupe, réparties
+    sur n_workers processus.
+    Renvoie {"group_by", "train_end", "params": {clé: params}, "scores": {clé: {mae, fits, seconds}}},
+    à passer à ForecastConfig(tuned_params=...) (voir params_for).
+    """
+    store = as_cell_store(df)
+    if cell_ids is None:
+        cell_ids = store.cell_ids
+    units = {}
+    for c in cell_ids:
+        frame = store.frame(c)
+        key = str(c) if group_by is None else str(frame[group_by].iloc[0])
+        units.setdefault(key, [])
+        if group_by is None or len(units[key]) < cells_per_group:
+            units[key].append(frame)
+
+    args = [(k, f, train_end, n_folds, eta, max_fits, seed) for k, f in units.items()]
+    if n_workers <= 1:
+        results = [_tune_unit(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(_tune_unit, *zip(*args)))
+    return {
+        "group_by": group_by,
+        "train_end": str(train_end),
+        "params": {r["key"]: r["params"] for r in results},
+        "scores": {r["key"]: {k: r[k] for k in ("mae", "fits", "seconds")} for r in results},
+    }
+
+def params_for(tuned: dict | None, meta: dict) -> dict | None:
+    """Hyperparamètres choisis pour une cellule (meta: cell_id, region, zone_type), None sinon."""
+    if not tuned:
+        return None
+    key = meta["cell_id"] if tuned["group_by"] is None else meta[tuned["group_by"]]
+    return tuned["params"].get(str(key))
+
+def tuned_config(path: str = TUNING_PATH, **fields) -> ForecastConfig:
+    """ForecastConfig des runs (run_mvp, service): hyperparamètres de path s'ils ont été cherchés."""
+    tuned = load_tuning(path) if os.path.exists(path) else None
+    return ForecastConfig(tuned_params=tuned, **fields)
+
+def save_tuning(tuned: dict, path: str = TUNING_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(tuned, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def load_tuning(path: str = TUNING_PATH) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def tuning_report(store: CellStore, tuned: dict, train_end: str, cell_ids, horizon_hours: int = 720, backend: str = "compiled") -> pd.DataFrame:
+    """
+    Entraînement (jusqu'à train_end) et forecast des cellules avec XGB_PARAMS puis avec les
+    hyperparamètres choisis: temps d'entraînement, nb d'arbres, MAE de validation, temps de forecast.
+    """
+    rows = []
+    for variant in ("default", "tuned"):
+        models, frames, maes, trees = [], [], [], []
+        t0 = time.perf_counter()
+        for c in cell_ids:
+            frame = store.frame(c)
+            meta = {"cell_id": str(c), "region": str(frame["region"].iloc[0]), "zone_type": str(frame["zone_type"].iloc[0])}
+            params = params_for(tuned, meta) if variant == "tuned" else None
+            model, feats, mae, _ = train_xgb_forecast(store, cell_id=c, train_end=train_end, params=params)
+            models.append(model)
+            frames.append(frame)
+            maes.append(mae)
+            trees.append(model.get_booster().num_boosted_rounds())
+        train_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        forecast_xgb_batch(models, frames, feats, horizon_hours, backend=backend)
+        rows.append({
+            "variant": variant,
+            "train_s": train_s,
+            "forecast_s": time.perf_counter() - t0,
+            "trees_mean": float(np.mean(trees)),
+            "mae_valid_mbps": float(np.mean(maes)),
+        })
+    return pd.DataFrame(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Recherche d'hyperparamètres (plis à origine glissante, early stopping, successive halving).")
+    parser.add_argument("--cells", type=int, default=20)
+    parser.add_argument("--start", default="2025-01-01")
+    parser.add_argument("--end", default="2025-08-01")
+    parser.add_argument("--train-end", default="2025-07-01")
+    parser.add_argument("--group-by", default=None, choices=[None, "zone_type", "region"])
+    parser.add_argument("--cells-per-group", type=int, default=4)
+    parser.add_argument("--max-fits", type=int, default=40, help="budget de fits par cellule / groupe")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default=TUNING_PATH)
+    args = parser.parse_args()
+
+    df = generate_synthetic_network_data(start=args.start, end=args.end, n_cells=args.cells)
+    store = CellStore(add_saturation_label(df, ForecastConfig().saturation_threshold_by_zone))
+
+    t0 = time.perf_counter()
+    tuned = tune(
+        store, args.train_end, group_by=args.group_by, cells_per_group=args.cells_per_group,
+        n_workers=args.workers, max_fits=args.max_fits,
+    )
+    search_s = time.perf_counter() - t0
+    save_tuning(tuned, args.out)
+    print(f"OK ✅ {args.out}  ({len(tuned['params'])} recherches, {search_s:.1f}s)")
+
+    report = tuning_report(store, tuned, args.train_end, store.cell_ids)
+    os.makedirs(OUTDIR, exist_ok=True)
+    report.to_csv(os.path.join(OUTDIR, "tuning.csv"), index=False)
+    d, t = report.set_index("variant").loc["default"], report.set_index("variant").loc["tuned"]
+    print(report.to_string(index=False))
+    print(
+        f"entraînement {d['train_s']:.1f}s -> {t['train_s']:.1f}s ({1 - t['train_s'] / d['train_s']:.0%} de temps gagné), "
+        f"forecast {d['forecast_s']:.2f}s -> {t['forecast_s']:.2f}s, "
+        f"MAE {d['mae_valid_mbps']:.2f} -> {t['mae_valid_mbps']:.2f} Mbps ({t['mae_valid_mbps'] / d['mae_valid_mbps'] - 1:+.1%})"
+    )
+    print(f"OK ✅ {OUTDIR}/tuning.csv")
+
+if __name__ == "__main__":
+    main()
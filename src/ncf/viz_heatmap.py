@@ -1,27 +1,18 @@
-import pandas as pd
 import plotly.express as px
 
-def agg_region(df: pd.DataFrame) -> pd.DataFrame:
-    return (
-        df.groupby("region", as_index=False)
-          .agg(
-              max_p=("p_worst", "max"),
-              mean_p=("p_worst", "mean"),
-              n_cells=("cell_id", "count"),
-              high_cells=("risk_level", lambda s: int((s == "HIGH").sum())),
-              med_cells=("risk_level", lambda s: int((s == "MEDIUM").sum())),
-          )
-    )
+from .generate_reports import load
+from .render import render_figures
+
+COLUMNS = ["region", "max_risk", "mean_risk", "high_cells", "med_cells", "n_cells"]
 
 def main():
-    base = pd.read_csv("reports/capacity_risk_horizons.csv")
-    wi = pd.read_csv("reports/capacity_risk_whatif_users_1p2.csv")
+    base, wi = load()
 
-    base_agg = agg_region(base).rename(columns={
-        "max_p": "max_p_base", "mean_p": "mean_p_base", "high_cells": "high_base", "med_cells": "med_base"
+    base_agg = base[COLUMNS].rename(columns={
+        "max_risk": "max_p_base", "mean_risk": "mean_p_base", "high_cells": "high_base", "med_cells": "med_base"
     })
-    wi_agg = agg_region(wi).rename(columns={
-        "max_p": "max_p_wi", "mean_p": "mean_p_wi", "high_cells": "high_wi", "med_cells": "med_wi"
+    wi_agg = wi[COLUMNS].rename(columns={
+        "max_risk": "max_p_wi", "mean_risk": "mean_p_wi", "high_cells": "high_wi", "med_cells": "med_wi"
     })
 
     merged = base_agg.merge(wi_agg, on=["region", "n_cells"], how="outer").fillna(0)
@@ -39,7 +30,6 @@ def main():
         hover_data=["max_p_base", "max_p_wi", "high_base", "high_wi", "delta_high_cells", "n_cells"]
     )
     fig.update_layout(yaxis_title="delta max p_worst", xaxis_title="region")
-    fig.write_html("reports/capacity_risk_delta_by_region.html", include_plotlyjs="cdn")
 
     # 2) compare heatmap (region x scenario metrics)
     heat = merged.set_index("region")[["max_p_base", "max_p_wi", "delta_max_p", "high_base", "high_wi", "delta_high_cells"]]
@@ -48,11 +38,15 @@ def main():
         title="Capacity Risk — baseline vs what-if (+20% users) comparison",
         aspect="auto"
     )
-    fig2.write_html("reports/capacity_risk_compare_heatmap.html", include_plotlyjs="cdn")
+
+    out = render_figures({
+        "capacity_risk_delta_by_region": fig,
+        "capacity_risk_compare_heatmap": fig2,
+    }, "reports", fmt="html")
 
     print("OK ✅ Comparison visualizations generated:")
-    print(" - reports/capacity_risk_delta_by_region.html")
-    print(" - reports/capacity_risk_compare_heatmap.html")
+    for path in out["rendered"] + out["skipped"]:
+        print(f" - {path}")
 
 if __name__ == "__main__":
     main()
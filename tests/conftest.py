@@ -0,0 +1,22 @@
+import pytest
+from xgboost import XGBRegressor
+
+from src.ncf.cellstore import CellStore
+from src.ncf.model_xgb import NON_FEATURES, make_supervised
+from src.ncf.simulate import generate_synthetic_network_data
+
+@pytest.fixture(scope="session")
+def store() -> CellStore:
+    # 150 jours: le simulateur tire 120 jours d'événements sans remise
+    return CellStore(generate_synthetic_network_data(start="2025-01-01", end="2025-06-01", n_cells=3))
+
+@pytest.fixture(scope="session")
+def cell_models(store):
+    """Un petit modèle par cellule (peu d'arbres: tests rapides), avec la liste des features."""
+    models, feats = [], None
+    for c in store.cell_ids:
+        sup = make_supervised(store.frame(c))
+        feats = [f for f in sup.columns if f not in NON_FEATURES]
+        model = XGBRegressor(n_estimators=25, max_depth=4, learning_rate=0.2, random_state=0)
+        models.append(model.fit(sup[feats], sup["traffic_mbps"]))
+    return models, feats
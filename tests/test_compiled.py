@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from xgboost import XGBRegressor
+
+from src.ncf.compiled import CompiledForest
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 6)).astype(np.float32)
+    y = 3 * X[:, 0] - 2 * X[:, 1] ** 2 + X[:, 2] * X[:, 3] + rng.normal(0, 0.1, 2000)
+    # valeurs manquantes à l'entraînement: les nœuds apprennent leur direction par défaut
+    X[rng.random(X.shape) < 0.1] = np.nan
+    return X, y
+
+def _fit(X, y, seed):
+    return XGBRegressor(n_estimators=40, max_depth=5, random_state=seed, subsample=0.8).fit(X, y)
+
+def test_single_model_matches_booster(data):
+    X, y = data
+    model = _fit(X, y, 0)
+    rows = X[:300].copy()
+    rows[::7] = np.nan  # lignes entièrement manquantes
+    np.testing.assert_array_equal(CompiledForest([model]).predict(rows), model.predict(rows))
+
+def test_one_model_per_row_matches_booster(data):
+    X, y = data
+    models = [_fit(X, y, s) for s in range(3)]
+    rows = X[:3].copy()
+    rows[1, :3] = np.nan
+    forest = CompiledForest(models)
+    expected = np.array([m.predict(rows[i:i + 1])[0] for i, m in enumerate(models)])
+    np.testing.assert_array_equal(forest.predict(rows), expected)
+    # tampons réutilisés: un second appel donne le même résultat
+    np.testing.assert_array_equal(forest.predict(rows), expected)
+
+def test_rejects_wrong_row_count(data):
+    X, y = data
+    forest = CompiledForest([_fit(X, y, 0), _fit(X, y, 1)])
+    with pytest.raises(ValueError):
+        forest.predict(X[:3])
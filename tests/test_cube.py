@@ -0,0 +1,47 @@
+import numpy as np
+
+from src.ncf.config import ForecastConfig
+from src.ncf.cube import ForecastCube, first_exceedances, peak_hours, write_forecast_cube
+from src.ncf.scenarios import Scenario
+
+START = np.datetime64("2025-07-01T00:00:00")
+
+def _records() -> list[dict]:
+    rng = np.random.default_rng(0)
+    recs = [
+        {"cell_id": f"C{i}", "region": "IDF", "zone_type": z, "y_pred": rng.uniform(100, 900, 720), "forecast_start": START}
+        for i, z in enumerate(["urban", "rural"])
+    ]
+    return recs + [{"cell_id": "BAD", "region": "IDF", "zone_type": "urban", "error": "ValueError: too short"}]
+
+SCENARIOS = [Scenario("baseline"), Scenario("rural_x2", zone_multipliers={"rural": 2.0})]
+
+def test_cube_round_trip(tmp_path):
+    records = _records()
+    write_forecast_cube(records, ForecastConfig(), SCENARIOS, root=str(tmp_path), block_cells=1)
+    cube = ForecastCube(str(tmp_path))
+
+    assert cube.shape == (3, 720, 2)
+    assert isinstance(cube.data, np.memmap)
+    np.testing.assert_array_equal(cube.cell("C0")[:, 1], records[0]["y_pred"].astype(np.float32))
+    np.testing.assert_array_equal(cube.scenario("rural_x2")[1], records[1]["y_pred"].astype(np.float32) * 2)
+    assert np.isnan(cube.cell("BAD")).all()
+    assert cube.timestamps("C1")[-1] == START + np.timedelta64(719, "h")
+    np.testing.assert_array_equal(cube.thresholds[:, 1], [800.0, 250.0, 800.0])
+
+def test_block_queries_match_full_arrays(tmp_path):
+    records = _records()
+    cube = write_forecast_cube(records, ForecastConfig(), SCENARIOS, root=str(tmp_path))
+
+    peaks = peak_hours(cube, "baseline", block_cells=2)
+    for i in range(2):
+        h = int(np.argmax(records[i]["y_pred"].astype(np.float32)))
+        assert peaks.loc[i, "peak_timestamp"] == START + np.timedelta64(h, "h")
+        assert peaks.loc[i, "peak_hour_of_day"] == h % 24
+    assert peaks.loc[2, "peak_hour_of_day"] == -1 and np.isnan(peaks.loc[2, "peak_mbps"])
+
+    first = first_exceedances(cube, "rural_x2", block_cells=2)
+    above = records[1]["y_pred"].astype(np.float32) * 2 > 250.0
+    assert first.loc[1, "hours_above"] == above.sum()
+    assert first.loc[1, "first_exceedance"] == START + np.timedelta64(int(above.argmax()), "h")
+    assert first.loc[2, "hours_above"] == 0
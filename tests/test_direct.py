@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from src.ncf.direct import direct_design, direct_feats, forecast_direct_ring, forecast_xgb_direct, train_xgb_direct
+from src.ncf.forecast import DEFAULT_LAGS, LagRingBuffer
+
+PARAMS = {"n_estimators": 10, "max_depth": 3}
+
+@pytest.fixture(scope="module")
+def direct_models(store):
+    cell_ids = store.cell_ids[:2]
+    fitted = [train_xgb_direct(store, cell_id=c, train_end="2025-05-01", horizon_hours=240, params=PARAMS) for c in cell_ids]
+    return cell_ids, [m for m, *_ in fitted], fitted[0][1]
+
+def test_design_reads_no_hour_after_origin(store):
+    df = store.frame(store.cell_ids[0])
+    traffic, users = df["traffic_mbps"].to_numpy(dtype=float), df["users"].to_numpy(dtype=float)
+    ts = df["timestamp"].to_numpy(dtype="datetime64[ns]")
+    origin, leads = 1000, np.arange(1, 721)
+    X = direct_design(traffic, users, ts, np.full(len(leads), origin), leads)
+
+    future = traffic.copy()
+    future[origin + 1:] = -1.0
+    np.testing.assert_array_equal(direct_design(future, users, ts, np.full(len(leads), origin), leads), X)
+    feats = direct_feats()
+    assert X.shape == (720, len(feats))
+    np.testing.assert_array_equal(X[:, feats.index("lag_1")], traffic[origin])
+    np.testing.assert_array_equal(X[:, feats.index("lead")], leads)
+
+def test_ring_forecast_matches_full_history(store, direct_models):
+    cell_ids, models, feats = direct_models
+    frames = store.frames(cell_ids)
+    timestamps, expected = forecast_xgb_direct(models, frames, feats, 240)
+
+    assert expected.shape == (2, 240)
+    assert timestamps[0, 0] == frames[0]["timestamp"].max() + np.timedelta64(1, "h")
+    ring = LagRingBuffer.from_frames(frames, lags=DEFAULT_LAGS)
+    np.testing.assert_array_equal(forecast_direct_ring(models, ring, feats, 240), expected)
+
+def test_direct_forecast_rejects_autoregressive_feats(store, direct_models):
+    cell_ids, models, feats = direct_models
+    with pytest.raises(ValueError, match="direct_feats"):
+        forecast_xgb_direct(models, store.frames(cell_ids), [f for f in feats if f != "lead"], 240)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ncf.cellstore import CellStore
+from src.ncf.config import ForecastConfig
+from src.ncf.fleet import forecast_cell, iter_cell_forecasts
+from src.ncf.simulate import generate_synthetic_network_data
+
+@pytest.fixture(scope="module")
+def fleet_store() -> CellStore:
+    # données au-delà de fleet.TRAIN_END (2025-07-01); la dernière cellule n'a que 100 heures
+    df = generate_synthetic_network_data(start="2025-03-01", end="2025-08-01", n_cells=4)
+    short = df["cell_id"].cat.categories[-1]
+    keep = (df["cell_id"] != short) | (df["timestamp"] < pd.Timestamp("2025-03-01") + pd.Timedelta(hours=100))
+    return CellStore(df[keep])
+
+def _cfg(store):
+    tuned = {"group_by": None, "params": {c: {"n_estimators": 10, "max_depth": 3} for c in store.cell_ids}}
+    return ForecastConfig(tuned_params=tuned)
+
+def _run(store, n_workers):
+    recs = iter_cell_forecasts(store, _cfg(store), n_workers=n_workers, chunk_size=2)
+    return sorted(recs, key=lambda r: r["cell_id"])
+
+@pytest.mark.filterwarnings("ignore:.*Empty dataset")
+def test_serial_and_parallel_runs_match(fleet_store):
+    serial, parallel = _run(fleet_store, 1), _run(fleet_store, 2)
+
+    assert [r["cell_id"] for r in serial] == [r["cell_id"] for r in parallel] == fleet_store.cell_ids
+    errors = [r for r in serial if "error" in r]
+    assert len(errors) == 1 and [r for r in parallel if "error" in r] == errors
+    for s, p in zip(serial, parallel):
+        if "error" in s:
+            continue
+        assert s["mae"] == p["mae"] and s["model_version"] == p["model_version"]
+        np.testing.assert_array_equal(s["y_pred"], p["y_pred"])
+        np.testing.assert_array_equal(s["residuals"], p["residuals"])
+
+    # rollout groupé du paquet == forecast cellule par cellule
+    alone = forecast_cell(fleet_store.frame(serial[0]["cell_id"]), _cfg(fleet_store))
+    np.testing.assert_array_equal(alone["y_pred"], serial[0]["y_pred"])
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from src.ncf.config import ForecastConfig
+from src.ncf.hierarchy import HIERARCHY_COLUMNS, aggregate_residual_cdf, hierarchy_risk, summation_matrix
+from src.ncf.risk import calibrate_residuals_batch
+
+def _residuals(n_cells: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # tailles de fenêtre différentes d'une cellule à l'autre (lignes complétées par NaN)
+    return calibrate_residuals_batch([rng.gamma(2.0, 15.0, rng.integers(100, 200)) - 30 for _ in range(n_cells)])
+
+def _moments(dist):
+    x, cdf = dist
+    pmf = np.diff(cdf, prepend=0.0)
+    mean = pmf @ x
+    return mean, np.sqrt(pmf @ (x - mean) ** 2)
+
+@pytest.mark.parametrize("n_cells", [10, 1500, 20000])
+def test_grid_keeps_aggregate_spread(n_cells):
+    cal = _residuals(n_cells)
+    S = sparse.csr_matrix(np.ones((1, n_cells)))
+    mean, std = _moments(aggregate_residual_cdf(cal, S)[0])
+    assert mean == pytest.approx(np.nanmean(cal, axis=1).sum(), abs=1e-6 * n_cells)
+    assert std == pytest.approx(np.sqrt(np.nanvar(cal, axis=1).sum()), rel=0.01)
+
+def test_aggregate_cdf_matches_monte_carlo_sum():
+    n_cells, n_draws = 1500, 100_000
+    cal = _residuals(n_cells, seed=1)
+    counts = (~np.isnan(cal)).sum(axis=1)
+    S, _ = summation_matrix(np.where(np.arange(n_cells) < 1000, "A", "B"))
+    dists = aggregate_residual_cdf(cal, S)
+
+    rng = np.random.default_rng(2)
+    for g, members in enumerate((np.arange(1000), np.arange(1000, n_cells))):
+        total = np.zeros(n_draws)
+        for i in members:
+            total += cal[i, rng.integers(0, counts[i], n_draws)]
+        x, cdf = dists[g]
+        for q in (0.01, 0.05, 0.5, 0.95, 0.99):
+            z = np.quantile(total, q)
+            p = cdf[np.searchsorted(x, z, side="right") - 1]
+            assert p == pytest.approx(q, abs=0.01)
+
+def test_empty_group_has_no_distribution():
+    cal = np.full((2, 5), np.nan)
+    cal[0] = np.arange(5.0)
+    S, _ = summation_matrix(np.array(["A", "B"]))
+    dists = aggregate_residual_cdf(cal, S)
+    assert dists[1] is None
+    assert dists[0][1][-1] == pytest.approx(1.0)
+
+def test_hierarchy_risk_with_every_cell_in_error():
+    cfg = ForecastConfig()
+    rng = np.random.default_rng(3)
+    ok = {"cell_id": "C0", "region": "IDF", "zone_type": "urban", "y_pred": rng.uniform(100, 700, 720), "residuals": rng.normal(0, 20, 150)}
+    failed = {"cell_id": "C1", "region": "IDF", "zone_type": "rural", "error": "ValueError: too short"}
+
+    assert list(hierarchy_risk([ok, failed], cfg).columns) == list(HIERARCHY_COLUMNS)
+    empty = hierarchy_risk([failed], cfg)
+    assert empty.empty and list(empty.columns) == list(HIERARCHY_COLUMNS)
@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+from src.ncf.ingest import MODEL_COLUMNS, _filter, iter_cell_batches, list_cells, open_dataset, read_cells, write_cell_frames
+
+@pytest.fixture(scope="module")
+def dataset(store, tmp_path_factory):
+    root = str(tmp_path_factory.mktemp("dataset"))
+    write_cell_frames(store.df, root)
+    return root
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[list(MODEL_COLUMNS)].astype({c: str for c in ("cell_id", "region", "zone_type")})
+    df["timestamp"] = df["timestamp"].astype("datetime64[ns]")
+    return df.sort_values(["cell_id", "timestamp"]).reset_index(drop=True)
+
+def test_read_cells_pushes_down_cells_and_window(store, dataset):
+    cell_ids = store.cell_ids[1:]
+    start, end = "2025-03-10 05:00", "2025-04-02"
+    got = read_cells(dataset, cell_ids=cell_ids, start=start, end=end)
+
+    src = store.df
+    mask = src["cell_id"].isin(cell_ids) & (src["timestamp"] >= start) & (src["timestamp"] < end)
+    pd.testing.assert_frame_equal(_sorted(got), _sorted(src[mask]), check_dtype=False)
+    assert isinstance(got["cell_id"].dtype, pd.CategoricalDtype)
+    assert "month" not in got.columns
+
+def test_window_prunes_month_partitions(dataset):
+    ds = open_dataset(dataset)
+    fragments = list(ds.get_fragments(filter=_filter(ds, start="2025-03-10", end="2025-04-02")))
+    paths = {f.path.split("month=")[1].split("/")[0] for f in fragments}
+    assert paths == {"2025-03", "2025-04"}
+
+def test_iter_cell_batches_covers_every_cell_once(store, dataset):
+    assert list_cells(dataset) == sorted(store.cell_ids)
+    batches = list(iter_cell_batches(dataset, batch_cells=2))
+    assert [len(b) for b in batches] == [2, 1]
+    assert sorted(c for b in batches for c in b.cell_ids) == sorted(store.cell_ids)
+    assert sum(len(b.df) for b in batches) == len(store.df)
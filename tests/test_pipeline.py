@@ -0,0 +1,46 @@
+from dataclasses import replace
+
+import pytest
+
+from src.ncf.config import ForecastConfig
+from src.ncf.pipeline import MVP_STAGES, StageCache, pipeline_params, run_pipeline
+from src.ncf.scenarios import Scenario
+
+@pytest.fixture
+def tiny(tmp_path, monkeypatch):
+    # les étapes écrivent sous data/ et reports/ (chemins relatifs)
+    monkeypatch.chdir(tmp_path)
+    cells = [f"CELL_{i:04d}" for i in range(2)]
+    cfg = ForecastConfig(tuned_params={"group_by": None, "params": {c: {"n_estimators": 5, "max_depth": 2} for c in cells}})
+    scenarios = [Scenario("baseline", users_multiplier=1.0), Scenario("users_x1.2", users_multiplier=1.2)]
+    return cfg, dict(n_cells=2, max_cells=2, seed=7, scenarios=scenarios), StageCache(str(tmp_path / "cache"))
+
+def _status(run) -> dict:
+    return dict(zip(run.summary()["stage"], run.summary()["status"]))
+
+def test_second_run_hits_every_stage(tiny):
+    cfg, run_params, cache = tiny
+    first = run_pipeline(MVP_STAGES, pipeline_params(cfg, **run_params), cache)
+    assert set(_status(first).values()) == {"miss"}
+    assert len(first["risk"]) == 4 and (first["risk"]["risk_level"] != "UNKNOWN").all()
+
+    second = run_pipeline(MVP_STAGES, pipeline_params(cfg, **run_params), cache)
+    assert set(_status(second).values()) == {"hit"}
+    assert second["risk"].equals(first["risk"])
+
+def test_threshold_change_only_reruns_risk_and_downstream(tiny):
+    cfg, run_params, cache = tiny
+    run_pipeline(MVP_STAGES, pipeline_params(cfg, **run_params), cache)
+
+    thresholds = {**cfg.saturation_threshold_by_zone, "urban": 500.0}
+    run = run_pipeline(MVP_STAGES, pipeline_params(replace(cfg, saturation_threshold_by_zone=thresholds), **run_params), cache)
+    assert _status(run) == {
+        "ingest": "hit",
+        # labels de saturation recalculés, hors de la clé de l'entraînement et du forecast
+        "features": "recomputed",
+        "train": "hit",
+        "forecast": "hit",
+        "risk": "recomputed",
+        "aggregate": "recomputed",
+        "render": "recomputed",
+    }
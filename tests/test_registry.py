@@ -0,0 +1,28 @@
+import pandas as pd
+
+from src.ncf.fleet import rolling_train_end
+from src.ncf.registry import ModelRegistry
+
+PARAMS = {"n_estimators": 20, "max_depth": 3, "learning_rate": 0.2}
+
+def test_registry_warm_start_when_hours_are_appended(store, tmp_path):
+    cell_id = store.cell_ids[0]
+    full = store.frame(cell_id)
+    cut = full[full["timestamp"] < full["timestamp"].max() - pd.Timedelta(hours=48)]
+    registry = ModelRegistry(str(tmp_path), refresh_rounds=5)
+
+    def run(df):
+        model, _, _, valid_out, status = registry.get_or_train(df, cell_id, rolling_train_end(df, valid_days=14), params=PARAMS)
+        return model, valid_out, status
+
+    assert run(cut)[2] == "miss"
+    assert run(cut)[2] == "hit"
+    assert registry.load_meta(cell_id)["n_rounds"] == 20
+
+    # 48 heures de plus: train_end avance, l'entraînement stocké est un préfixe du nouveau
+    model, valid_out, status = run(full)
+    assert status == "warm"
+    assert registry.load_meta(cell_id)["n_rounds"] == 25
+    assert model.get_booster().num_boosted_rounds() == 25
+    assert valid_out["timestamp"].max() == full["timestamp"].max()
+    assert run(full)[2] == "hit"
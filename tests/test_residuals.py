@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from src.ncf.residuals import ResidualStore
+from src.ncf.risk import calibrate_residuals_batch
+
+def test_append_unsorted_batch_keeps_rows_sorted(tmp_path):
+    store = ResidualStore(str(tmp_path))
+    store.put("C1", "v1", [0.0, 10.0])
+    entry = store.append("C1", "v1", [5.0, 3.0])
+    np.testing.assert_array_equal(entry["sorted"], [0.0, 3.0, 5.0, 10.0])
+    np.testing.assert_array_equal(entry["raw"], [0.0, 10.0, 5.0, 3.0])
+
+@pytest.mark.parametrize("window", [None, 50])
+def test_append_matches_sorted_window(tmp_path, window):
+    rng = np.random.default_rng(0)
+    store = ResidualStore(str(tmp_path), window=window)
+    store.put("C1", "v1", rng.normal(0, 10, 40))
+    for _ in range(20):
+        # valeurs arrondies: doublons entre lots et avec la fenêtre
+        entry = store.append("C1", "v1", np.round(rng.normal(0, 10, rng.integers(1, 8))))
+        np.testing.assert_array_equal(entry["sorted"], np.sort(entry["raw"]))
+
+    # rechargé depuis le disque: même invariant, calibration identique au calcul batch
+    fresh = ResidualStore(str(tmp_path), window=window)
+    raw = fresh.raw("C1", "v1")
+    expected = calibrate_residuals_batch([raw])[0]
+    np.testing.assert_allclose(fresh.calibrated("C1", "v1"), expected[~np.isnan(expected)])
+
+def test_calibrated_refreshes_when_residuals_change(tmp_path):
+    rng = np.random.default_rng(1)
+    store = ResidualStore(str(tmp_path))
+    old, new = rng.normal(0, 10, 200), rng.normal(5, 30, 220)
+
+    first = store.calibrated("C1", "v1", residuals=old)
+    # même version de modèle (registry "hit"), validation recalculée sur de nouvelles heures
+    second = store.calibrated("C1", "v1", residuals=new)
+    expected = calibrate_residuals_batch([new])[0]
+    np.testing.assert_allclose(second, expected[~np.isnan(expected)])
+    assert not np.array_equal(first, second)
+    np.testing.assert_array_equal(ResidualStore(str(tmp_path)).raw("C1", "v1"), new)
+
+    # mêmes résidus: calibration en cache, pas de réécriture
+    assert store.calibrated("C1", "v1", residuals=new) is second
@@ -0,0 +1,30 @@
+import numpy as np
+
+from src.ncf.risk import exact_exceedance_probabilities, sorted_calibrated_residuals
+
+def test_exact_probabilities_match_monte_carlo():
+    rng = np.random.default_rng(0)
+    residuals = sorted_calibrated_residuals(rng.gamma(2.0, 20.0, 500) - 40)
+    H = 48
+    y = 400 + 60 * np.sin(np.arange(H) / 4)
+    threshold = 520.0
+
+    exact = exact_exceedance_probabilities(y, residuals, threshold, horizons=(12, H))
+
+    n_paths = 200_000
+    eps = residuals[rng.integers(0, residuals.size, size=(n_paths, H))]
+    running_max = np.maximum.accumulate(y + eps, axis=1)
+    for h, p in exact.items():
+        mc = np.mean(running_max[:, h - 1] > threshold)
+        # 4 écarts-types de l'estimateur Monte Carlo
+        assert abs(p - mc) <= 4 * np.sqrt(p * (1 - p) / n_paths) + 1e-9
+    assert 0 < exact[12] < exact[H] < 1
+
+def test_exact_probabilities_broadcast_thresholds():
+    rng = np.random.default_rng(1)
+    residuals = np.sort(rng.normal(0, 30, 300))
+    y = np.vstack([np.full(24, 300.0), np.full(24, 500.0)])
+    thr = np.array([350.0, 520.0])
+    both = exact_exceedance_probabilities(y, residuals, thr, horizons=(24,))[24]
+    for i in range(2):
+        assert both[i] == exact_exceedance_probabilities(y[i], residuals, thr[i], horizons=(24,))[24]
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ncf.config import ForecastConfig
+from src.ncf.fleet import score_record
+from src.ncf.scenarios import Scenario, evaluate_scenarios, multiplier_sweep
+
+def _records(n_cells: int = 4, seed: int = 0) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    zones = ["urban", "suburban", "rural"]
+    return [
+        {
+            "cell_id": f"C{i}", "region": "IDF" if i % 2 else "ARA", "zone_type": zones[i % 3],
+            "mae": float(rng.uniform(5, 20)), "model_version": "v",
+            "y_pred": rng.uniform(100, 700, 720), "residuals": rng.normal(0, 40, 300),
+        }
+        for i in range(n_cells)
+    ]
+
+def test_multiplier_sweep_includes_bounds():
+    sweep = multiplier_sweep(0.8, 2.0, 0.05)
+    assert len(sweep) == 25
+    assert sweep[0].users_multiplier == 0.8 and sweep[-1].users_multiplier == 2.0
+    assert sweep[-1].name == "users_x2.00"
+
+@pytest.mark.parametrize("risk_method", ["exact", "mc"])
+def test_scenarios_match_per_cell_risk_rows(risk_method):
+    cfg = ForecastConfig(risk_method=risk_method)
+    records = _records()
+    multipliers = (1.0, 1.2, 1.5)
+    long = evaluate_scenarios(records, cfg, [Scenario(f"x{m}", users_multiplier=m) for m in multipliers])
+
+    assert len(long) == len(records) * len(multipliers)
+    for m in multipliers:
+        got = long[long["scenario"] == f"x{m}"].drop(columns=["scenario"]).set_index("cell_id").sort_index()
+        want = pd.DataFrame([score_record(r, cfg, users_multiplier=m) for r in records]).set_index("cell_id").sort_index()
+        pd.testing.assert_frame_equal(got[want.columns], want, check_dtype=False)
+
+def test_failed_cells_are_reported_in_every_scenario():
+    cfg = ForecastConfig()
+    failed = {"cell_id": "BAD", "region": "IDF", "zone_type": "urban", "error": "ValueError: too short"}
+    long = evaluate_scenarios(_records(2) + [failed], cfg, [Scenario("a"), Scenario("b", threshold_multiplier=2.0)])
+
+    bad = long[long["cell_id"] == "BAD"]
+    assert list(bad["scenario"]) == ["a", "b"]
+    assert (bad["risk_level"] == "UNKNOWN").all()
+    assert list(bad["saturation_threshold_mbps"]) == [800.0, 1600.0]
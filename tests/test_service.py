@@ -0,0 +1,53 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.ncf.cellstore import CellStore
+from src.ncf.config import ForecastConfig
+from src.ncf.direct import forecast_xgb_direct
+from src.ncf.forecast import forecast_xgb_batch
+from src.ncf.service import ForecastService
+
+TRAIN_END = "2025-05-01"
+
+def _forecasts(service, cell_ids):
+    async def run():
+        return await asyncio.gather(*(service.forecast(c) for c in cell_ids))
+    return np.array(asyncio.run(run()))
+
+def test_service_uses_tuned_params(store):
+    cell_ids = store.cell_ids[:2]
+    tuned = {"group_by": None, "params": {c: {"n_estimators": 7, "max_depth": 3} for c in cell_ids}}
+    cfg = ForecastConfig(tuned_params=tuned)
+    service = ForecastService.from_history(store, cfg, cell_ids=cell_ids, train_end=TRAIN_END)
+
+    models = [service.cells[c]["model"] for c in cell_ids]
+    assert [m.get_booster().num_boosted_rounds() for m in models] == [7, 7]
+    _, expected = forecast_xgb_batch(models, store.frames(cell_ids), service.cells[cell_ids[0]]["feats"], cfg.horizon_days_long * 24)
+    np.testing.assert_allclose(_forecasts(service, cell_ids), expected, rtol=1e-6)
+
+def test_service_direct_strategy_matches_batch_forecast(store):
+    cell_ids = store.cell_ids[:1]
+    cfg = ForecastConfig(forecast_strategy="direct")
+    service = ForecastService.from_history(store, cfg, cell_ids=cell_ids, train_end=TRAIN_END)
+
+    cell = service.cells[cell_ids[0]]
+    assert "lead" in cell["feats"]
+    _, expected = forecast_xgb_direct([cell["model"]], store.frames(cell_ids), cell["feats"], cfg.horizon_days_long * 24)
+    np.testing.assert_array_equal(_forecasts(service, cell_ids), expected)
+
+@pytest.mark.filterwarnings("ignore:.*Empty dataset")
+def test_service_skips_cells_that_fail_to_train(store):
+    good, short = store.cell_ids[:2]
+    df = store.df
+    # 100 heures d'historique: aucune ligne supervisée (lag_168) => entraînement impossible
+    keep = (df["cell_id"] != short) | (df["timestamp"] < df["timestamp"].min() + np.timedelta64(100, "h"))
+    tuned = {"group_by": None, "params": {c: {"n_estimators": 7, "max_depth": 3} for c in (good, short)}}
+    service = ForecastService.from_history(CellStore(df[keep]), ForecastConfig(tuned_params=tuned), cell_ids=[good, short], train_end=TRAIN_END)
+
+    assert list(service.cells) == [good] and list(service.failed) == [short]
+    assert asyncio.run(service.dispatch("GET", "/health", b""))[1]["failed"] == 1
+    assert _forecasts(service, [good]).shape == (1, 720)
+    with pytest.raises(KeyError, match="training failed"):
+        asyncio.run(service.dispatch("GET", f"/forecast?cell_id={short}", b""))
@@ -0,0 +1,16 @@
+from src.ncf import tuning
+
+def test_successive_halving_reports_winner_score(monkeypatch):
+    # MAE fixée par candidat: le dernier palier garde plusieurs candidats (schedule [12, 4])
+    def evaluate(cells, candidate, n_folds):
+        return {"mae": float(candidate["max_depth"]), "n_trees": 10.0, "fits": n_folds}
+
+    monkeypatch.setattr(tuning, "evaluate", evaluate)
+    candidates = [{"max_depth": d, "learning_rate": 0.1} for d in (7, 3, 11, 5, 9, 4, 12, 6, 8, 10, 2, 1)]
+    assert tuning._schedule(len(candidates), 2, 3) == [12, 4]
+
+    best, score, history = tuning.successive_halving([], candidates, n_folds=2)
+    assert best["max_depth"] == 1
+    assert score["mae"] == 1.0
+    assert best["n_estimators"] == 10
+    assert [h["max_depth"] for h in history if h["rung"] == 1] == [1, 2, 3, 4]